@@ -0,0 +1,335 @@
+"""
+性能基准测试
+构造不同规模的合成数据集，测量文件列表各项操作的耗时
+
+默认在内存中构造条目，只测量界面和索引（包括文件表每个文件占用的内存）；--on-disk 时在临时目录中生成 TXT + PNG 配对的数据集，
+测量从磁盘加载、点击、排序、保存和重复检测（首次与使用缓存再次检测）的耗时，
+以及把数据集打包为 zip 后直接打开（建立成员索引与使用缓存的索引）和随机读取单个标注的耗时，
+为整个数据集创建快照（首次与没有变化时再次创建）、修改一批文件后与快照比较的耗时和历史数据库的大小。--metrics 输出运行期间各计时点记录的耗时分位数
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import struct
+import tempfile
+import time
+import tracemalloc
+import zipfile
+import zlib
+
+from dataset_scan import DatasetScanner, iter_txt_files
+from dataset_store import DatasetStore
+from perf_metrics import metrics
+from tag_search import TagIndex
+from txt_manager_app import TxtManager
+
+SORT_BENCH_KEYS = ['natural_asc', 'mtime_desc', 'size_desc', 'tags_desc']
+
+
+def build_manager(count: int) -> TxtManager:
+    """创建界面并填充 count 个合成文件"""
+    # 缓存足够大，使点击耗时不受磁盘读取影响
+    manager = TxtManager(cache_bytes=1 << 30, index_path=None, history_path=None)
+    manager.create()
+    entries = []
+    for i in range(count):
+        content = f'1girl, solo, tag_{i % 97}, tag_{i % 89}'
+        entries.append({
+            'path': f'/dataset/{i:06d}.txt',
+            'name': f'{i:06d}.txt',
+            'size': len(content),
+            'created_time': float(i),
+            'content': content
+        })
+    manager.store.add_entries(entries)
+    manager._update_file_list()
+    return manager
+
+
+def bench_click(manager: TxtManager, clicks: int) -> float:
+    """随机点击文件，返回单次点击的平均耗时（毫秒）"""
+    rows = manager.ui_refs['file_cards']
+    indices = [random.randrange(len(manager.txt_files)) for _ in range(clicks)]
+    start = time.perf_counter()
+    for index in indices:
+        # 模拟用户滚动到目标行并点击
+        rows._render_window(index - rows.OVERSCAN)
+        rows._on_row_click(index - rows.first_index)
+    return (time.perf_counter() - start) * 1000 / clicks
+
+
+def bench_search(manager: TxtManager, queries) -> float:
+    """执行标签搜索并过滤列表，返回单次查询的平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for query in queries:
+        manager.search_query = query
+        manager._update_file_list()
+    manager.search_query = ''
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def bench_insert_remove(manager: TxtManager, count: int) -> float:
+    """在按名称排序时逐个加入并移除文件，返回单次加入或移除的平均耗时（毫秒）"""
+    manager.txt_files, manager.file_positions = manager.store.ordering('natural_asc')
+    entries = [{
+        'path': f'/dataset/new_{i:06d}.txt',
+        'name': f'new_{i:06d}.txt',
+        'size': 0,
+        'created_time': float(-i),
+    } for i in range(count)]
+    start = time.perf_counter()
+    for entry in entries:
+        manager.store.add_entries([entry])
+    for entry in entries:
+        manager.store.remove_files([entry['path']])
+    return (time.perf_counter() - start) * 1000 / (2 * count)
+
+
+def bench_complete(count: int, queries: int) -> float:
+    """
+    标签补全：count 个文件、每个文件带 3 个独有标签（标签表约为 3 * count 个），
+    每次查询前修改一个文件的标签，返回包括增量更新在内的单次补全平均耗时（毫秒）
+    """
+    index = TagIndex()
+    for i in range(count):
+        index.update(f'/dataset/{i:06d}.txt', f'1girl, solo, tag_{i % 97}, artist_{i}, character_{i * 7}, id {i}')
+    index.complete('')  # 首次查询建立标签表
+    prefixes = ['a', 'ar', 'artist_1', 'c', 'character_12', 't', 'tag_', 's', 'i', 'n']
+    start = time.perf_counter()
+    for i in range(queries):
+        index.update(f'/dataset/{i % count:06d}.txt', f'1girl, solo, new_{i}, tag_{i % 89}')
+        index.complete(prefixes[i % len(prefixes)])
+    return (time.perf_counter() - start) * 1000 / queries
+
+
+def bench_file_table(count: int, lookups: int) -> tuple:
+    """
+    文件表：加入 count 个带配对图片的条目（不含内容），
+    返回 (每个文件占用的内存（字节）, 按路径读取一个文件的大小、修改时间和配对图片的平均耗时（微秒）)
+    """
+    entries = [{
+        'path': f'/dataset/{i // 1000:04d}/{i:06d}.txt',
+        'name': f'{i:06d}.txt',
+        'size': 40 + i % 50,
+        'mtime': 1.7e9 + i,
+        'created_time': 1.7e9 + i,
+        'image_path': f'/dataset/{i // 1000:04d}/{i:06d}.png',
+    } for i in range(count)]
+    store = DatasetStore(index_path=None, history_path=None)
+    tracemalloc.start()
+    try:
+        store.add_entries(entries)
+        memory = tracemalloc.get_traced_memory()[0] / count
+    finally:
+        tracemalloc.stop()
+    table = store.file_table
+    paths = [random.choice(entries)['path'] for _ in range(lookups)]
+    start = time.perf_counter()
+    for path in paths:
+        table.size(path)
+        table.mtime(path)
+        table.image_path(path)
+    return memory, (time.perf_counter() - start) * 1e6 / lookups
+
+
+def make_png(width: int, height: int) -> bytes:
+    """生成灰度 PNG（不依赖 Pillow）"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    rows = b''.join(b'\x00' + bytes((x * 255 // width for x in range(width))) for _ in range(height))
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows))
+            + chunk(b'IEND', b''))
+
+
+def generate_dataset(root: str, count: int, per_dir: int = 1000):
+    """在 root 下生成 count 对 TXT + PNG，每个子目录 per_dir 对"""
+    images = [make_png(size, size * 3 // 4) for size in (64, 96, 128, 192, 256)]
+    vocabulary = [f'tag_{i}' for i in range(500)]
+    rng = random.Random(count)
+    for i in range(count):
+        directory = os.path.join(root, f'{i // per_dir:04d}')
+        if i % per_dir == 0:
+            os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f'img{i}')
+        tags = ['1girl', 'solo'] + rng.sample(vocabulary, rng.randint(3, 30))
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            f.write(', '.join(tags))
+        with open(base + '.png', 'wb') as f:
+            f.write(images[i % len(images)])
+
+
+def bench_load(manager: TxtManager, root: str) -> float:
+    """按界面加载文件夹的方式扫描数据集并加入列表，返回耗时（秒）"""
+    store = manager.store
+    scanner = DatasetScanner(iter_txt_files(root), reader=store.scan_reader(None))
+    start = time.perf_counter()
+    # 同步执行时回调在当前线程中调用
+    scanner.run(lambda entries, errors, done, discovered: store.add_entries(entries))
+    manager._update_file_list()
+    return time.perf_counter() - start
+
+
+def bench_sort(manager: TxtManager, keys) -> float:
+    """依次切换到每种排序（首次使用时建立排序索引）并刷新列表，返回单次切换的平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for key in keys:
+        manager.sort_by = key
+        manager.txt_files, manager.file_positions = manager.store.ordering(key)
+        manager._update_file_list()
+    return (time.perf_counter() - start) * 1000 / len(keys)
+
+
+async def bench_save(manager: TxtManager, count: int) -> float:
+    """修改随机的文件并一次保存，返回单个文件的平均耗时（毫秒）"""
+    paths = random.sample(list(manager.txt_files), min(count, len(manager.txt_files)))
+    for file_path in paths:
+        content = manager._read_content(file_path) or ''
+        manager.file_contents.set_dirty(file_path, content + ', edited')
+    start = time.perf_counter()
+    _, errors = await manager._save_files(paths)
+    elapsed = time.perf_counter() - start
+    if errors:
+        print(f'保存失败 {len(errors)} 个: {errors[0][1]}')
+    return elapsed * 1000 / len(paths)
+
+
+async def bench_duplicates(manager: TxtManager) -> float:
+    """在后台完成一次重复检测，返回耗时（秒）"""
+    store = manager.store
+    start = time.perf_counter()
+    store.find_duplicates()
+    while store.duplicates.running:
+        await asyncio.sleep(0.01)
+    return time.perf_counter() - start
+
+
+async def bench_archive(root: str, reads: int) -> tuple:
+    """
+    把数据集打包为 zip 后直接打开：首次打开建立成员索引，再次打开使用缓存的索引
+
+    Returns:
+        (首次打开耗时（秒）, 再次打开耗时（秒）, 随机读取单个标注的平均耗时（毫秒）)
+    """
+    archive_path = root.rstrip(os.sep) + '.zip'
+    with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for file_path in iter_txt_files(root):
+            archive.write(file_path, os.path.relpath(file_path, root))
+            archive.write(os.path.splitext(file_path)[0] + '.png', os.path.relpath(file_path, root)[:-4] + '.png')
+    try:
+        timings = []
+        for _ in range(2):
+            store = DatasetStore(index_path=None, history_path=None)
+            start = time.perf_counter()
+            await store.load_archive(archive_path)
+            timings.append(time.perf_counter() - start)
+        paths = random.sample(list(store.files), min(reads, len(store.files)))
+        start = time.perf_counter()
+        for file_path in paths:
+            store.read_caption(file_path)
+        read = (time.perf_counter() - start) * 1000 / len(paths)
+        store.clear()
+        return timings[0], timings[1], read
+    finally:
+        for path in (archive_path, archive_path + '.index'):
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+async def bench_history(manager: TxtManager, changes: int) -> tuple:
+    """
+    版本历史：为整个数据集创建快照（首次只有保存过的文件已有记录），没有变化时再创建一次，
+    然后修改 changes 个文件，与快照比较
+
+    Returns:
+        (首次快照耗时（秒）, 再次快照耗时（秒）, 比较耗时（毫秒）, 历史数据库大小（MB）)
+    """
+    store = manager.store
+    start = time.perf_counter()
+    await store.create_snapshot('bench')
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    revision = await store.create_snapshot('bench')
+    second = time.perf_counter() - start
+    paths = random.sample(list(store.files), min(changes, len(store.files)))
+    store.record_history(((file_path, f'changed, {i}') for i, file_path in enumerate(paths)), 'bulk_edit')
+    start = time.perf_counter()
+    await store.history_diff(revision)
+    diff = (time.perf_counter() - start) * 1000
+    # 关闭连接时合并预写日志，得到数据库文件的实际大小
+    store.history.close()
+    return first, second, diff, os.path.getsize(store.history.db_path) / (1 << 20)
+
+
+def run_in_memory(sizes, clicks: int):
+    queries = ['1girl, tag_3', 'tag_1* | tag_2*, -solo', '/^tag_[0-9]$/']
+    print(f'{"文件数":>10} {"单次点击(ms)":>14} {"单次搜索(ms)":>14} {"单次增删(ms)":>14} {"单次补全(ms)":>14}'
+          f' {"每文件内存(B)":>14} {"单次查表(us)":>14}')
+    for size in sizes:
+        manager = build_manager(size)
+        click = bench_click(manager, clicks)
+        search = bench_search(manager, queries)
+        insert_remove = bench_insert_remove(manager, min(size, 1000))
+        complete = bench_complete(size, clicks)
+        memory, lookup = bench_file_table(size, clicks)
+        print(f'{size:>10} {click:>14.3f} {search:>14.3f} {insert_remove:>14.3f} {complete:>14.3f}'
+              f' {memory:>14.0f} {lookup:>14.3f}')
+
+
+async def run_on_disk(sizes, clicks: int, saves: int):
+    print(f'{"文件数":>10} {"生成(s)":>10} {"加载(s)":>10} {"单次点击(ms)":>14} {"单次排序(ms)":>14} {"单个保存(ms)":>14}'
+          f' {"查重(s)":>10} {"再次查重(s)":>12} {"打开压缩包(s)":>14} {"再次打开(s)":>12} {"包内读取(ms)":>14}'
+          f' {"快照(s)":>10} {"再次快照(s)":>12} {"版本比较(ms)":>14} {"历史库(MB)":>12}')
+    for size in sizes:
+        root = tempfile.mkdtemp(prefix='label_tool_bench_')
+        try:
+            start = time.perf_counter()
+            generate_dataset(root, size)
+            generate = time.perf_counter() - start
+            # 版本历史放在临时目录中，保存耗时包括记录历史
+            manager = TxtManager(cache_bytes=1 << 30, index_path=None,
+                                 history_path=os.path.join(root, 'history.sqlite3'))
+            manager.create()
+            load = bench_load(manager, root)
+            click = bench_click(manager, clicks)
+            sort = bench_sort(manager, SORT_BENCH_KEYS)
+            save = await bench_save(manager, saves)
+            # 第二次检测只重新计算保存过的文件，其余复用缓存的哈希
+            duplicates_cold = await bench_duplicates(manager)
+            duplicates_warm = await bench_duplicates(manager)
+            archive_cold, archive_warm, archive_read = await bench_archive(root, clicks)
+            snapshot_cold, snapshot_warm, history_diff, history_size = await bench_history(manager, saves)
+            print(f'{size:>10} {generate:>10.2f} {load:>10.2f} {click:>14.3f} {sort:>14.3f} {save:>14.3f}'
+                  f' {duplicates_cold:>10.2f} {duplicates_warm:>12.2f}'
+                  f' {archive_cold:>14.2f} {archive_warm:>12.2f} {archive_read:>14.3f}'
+                  f' {snapshot_cold:>10.2f} {snapshot_warm:>12.2f} {history_diff:>14.3f} {history_size:>12.2f}')
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='文件列表性能基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='数据集规模')
+    parser.add_argument('--clicks', type=int, default=500, help='每个规模的点击次数')
+    parser.add_argument('--on-disk', action='store_true', help='在临时目录中生成 TXT + PNG 配对的数据集进行测试')
+    parser.add_argument('--saves', type=int, default=200, help='--on-disk 时每个规模保存的文件数')
+    parser.add_argument('--metrics', action='store_true', help='结束后输出各计时点记录的耗时（JSON）')
+    args = parser.parse_args()
+
+    if args.on_disk:
+        await run_on_disk(args.sizes, args.clicks, args.saves)
+    else:
+        run_in_memory(args.sizes, args.clicks)
+    if args.metrics:
+        print(json.dumps(metrics.snapshot(), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    # 整个基准测试在同一个事件循环中运行：界面代码（例如图片预览）需要取得当前的事件循环
+    asyncio.run(main())
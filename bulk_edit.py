@@ -0,0 +1,231 @@
+"""
+批量编辑
+对整个数据集（或搜索结果）执行查找替换和标签改写，先生成修改预览，再在线程池中原子写入
+"""
+
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from dataset_scan import atomic_write_text, read_txt_content
+from tag_search import split_tags
+
+# 支持的操作类型
+OPERATIONS = ('replace', 'regex_replace', 'rename_tag', 'remove_tags', 'insert_tags', 'dedupe_tags', 'reorder_tags')
+
+
+def _map_tag_lines(content: str, fn: Callable[[List[str]], List[str]], first_line_only: bool = False) -> str:
+    """对每一行（逗号分隔的标签）应用 fn，标签未变化的行保持原样，改写的行保留原来的行尾（\r\n 中的 \r）"""
+    lines = content.split('\n')
+    for i, line in enumerate(lines):
+        ending = '\r' if line.endswith('\r') else ''
+        tags = [tag.strip() for tag in line[:len(line) - len(ending)].split(',')]
+        tags = [tag for tag in tags if tag]
+        if not tags:
+            continue
+        new_tags = fn(tags)
+        if new_tags != tags:
+            lines[i] = ', '.join(new_tags) + ending
+        if first_line_only:
+            return '\n'.join(lines)
+    if first_line_only:
+        # 没有任何标签行时，直接写入新标签
+        new_tags = fn([])
+        if new_tags:
+            return ', '.join(new_tags) + content
+    return '\n'.join(lines)
+
+
+def _parse_tags(text: str) -> List[str]:
+    return [tag.strip() for tag in text.split(',') if tag.strip()]
+
+
+def build_operation(kind: str, find: str = '', replace: str = '', position: str = 'start') -> Callable[[str], str]:
+    """
+    构造一个文本变换函数
+
+    Args:
+        kind: 操作类型，见 OPERATIONS
+        find: 查找的文本 / 正则 / 标签（多个标签用逗号分隔）
+        replace: 替换文本 / 新标签名
+        position: insert_tags 的插入位置，'start' 或 'end'
+
+    Raises:
+        ValueError: 操作类型未知、参数缺失或正则无效
+    """
+    if kind == 'replace':
+        if not find:
+            raise ValueError('find is required')
+        return lambda content: content.replace(find, replace)
+
+    if kind == 'regex_replace':
+        try:
+            pattern = re.compile(find)
+        except re.error as e:
+            raise ValueError(str(e)) from e
+        return lambda content: pattern.sub(replace, content)
+
+    if kind == 'rename_tag':
+        old_key = find.strip().lower()
+        new_tag = replace.strip()
+        if not old_key or not new_tag:
+            raise ValueError('both tags are required')
+        return lambda content: _map_tag_lines(
+            content, lambda tags: [new_tag if tag.lower() == old_key else tag for tag in tags]
+        )
+
+    if kind == 'remove_tags':
+        keys = {tag.lower() for tag in _parse_tags(find)}
+        if not keys:
+            raise ValueError('tags are required')
+        return lambda content: _map_tag_lines(content, lambda tags: [tag for tag in tags if tag.lower() not in keys])
+
+    if kind == 'insert_tags':
+        new_tags = _parse_tags(find)
+        if not new_tags:
+            raise ValueError('tags are required')
+
+        def insert(tags):
+            present = {tag.lower() for tag in tags}
+            missing = [tag for tag in new_tags if tag.lower() not in present]
+            return missing + tags if position == 'start' else tags + missing
+
+        return lambda content: _map_tag_lines(content, insert, first_line_only=True)
+
+    if kind == 'dedupe_tags':
+        def dedupe(tags):
+            seen = set()
+            result = []
+            for tag in tags:
+                if tag.lower() not in seen:
+                    seen.add(tag.lower())
+                    result.append(tag)
+            return result
+
+        return lambda content: _map_tag_lines(content, dedupe)
+
+    if kind == 'reorder_tags':
+        # 给定标签时把它们按给定顺序移到最前，否则按字母排序
+        priority = {tag.lower(): i for i, tag in enumerate(_parse_tags(find))}
+        if priority:
+            return lambda content: _map_tag_lines(
+                content, lambda tags: sorted(tags, key=lambda tag: priority.get(tag.lower(), len(priority)))
+            )
+        return lambda content: _map_tag_lines(content, lambda tags: sorted(tags, key=str.lower))
+
+    raise ValueError(f'unknown operation: {kind}')
+
+
+class BulkEditPlan:
+    """批量编辑的预览结果（尚未写入磁盘）"""
+
+    def __init__(self):
+        self.scanned = 0
+        self.changes: List[Tuple[str, str, str]] = []  # (路径, 原内容, 新内容)
+        self.errors: List[Tuple[str, str]] = []  # (路径, 错误信息)
+
+    def tag_delta(self) -> Tuple[Counter, Counter]:
+        """统计所有修改中新增和移除的标签（标签 -> 文件数）"""
+        added: Counter = Counter()
+        removed: Counter = Counter()
+        for _, old, new in self.changes:
+            old_tags = set(split_tags(old))
+            new_tags = set(split_tags(new))
+            added.update(new_tags - old_tags)
+            removed.update(old_tags - new_tags)
+        return added, removed
+
+
+class BulkEditor:
+    """批量编辑执行器"""
+
+    def __init__(self, operations: Sequence[Callable[[str], str]], max_workers: Optional[int] = None,
+                 chunk_size: int = 256):
+        """
+        初始化批量编辑
+
+        Args:
+            operations: 依次应用的文本变换函数（由 build_operation 构造）
+            max_workers: 线程池大小
+            chunk_size: 每个任务处理的文件数
+        """
+        self.operations = list(operations)
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        self.chunk_size = chunk_size
+
+    def transform(self, content: str) -> str:
+        """对单个文本依次应用所有变换"""
+        for operation in self.operations:
+            content = operation(content)
+        return content
+
+    def plan(self, paths: Iterable[str], overrides: Optional[Dict[str, str]] = None) -> BulkEditPlan:
+        """
+        计算修改预览（不写入）
+
+        Args:
+            paths: 要处理的文件
+            overrides: 使用内存中的内容代替磁盘内容的文件（例如未保存的修改）
+        """
+        overrides = overrides or {}
+
+        def run_chunk(chunk):
+            changes, errors = [], []
+            for file_path in chunk:
+                try:
+                    old = overrides[file_path] if file_path in overrides else read_txt_content(file_path)
+                    new = self.transform(old)
+                except Exception as e:
+                    errors.append((file_path, str(e)))
+                    continue
+                if new != old:
+                    changes.append((file_path, old, new))
+            return len(chunk), changes, errors
+
+        plan = BulkEditPlan()
+        for scanned, changes, errors in self._map_chunks(run_chunk, list(paths)):
+            plan.scanned += scanned
+            plan.changes.extend(changes)
+            plan.errors.extend(errors)
+        return plan
+
+    def apply(self, plan: BulkEditPlan, overrides: Optional[Dict[str, str]] = None) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+        """
+        原子写入预览中的修改
+
+        写入前会确认磁盘内容与预览时一致，期间被其他程序修改的文件会被跳过并记为错误。
+
+        Args:
+            plan: plan() 返回的预览
+            overrides: 生成预览时使用的内存内容，这些文件不做磁盘一致性检查
+
+        Returns:
+            (已写入的 [(路径, 新内容)], 错误 [(路径, 错误信息)])
+        """
+        overrides = overrides or {}
+
+        def run_chunk(chunk):
+            written, errors = [], []
+            for file_path, old, new in chunk:
+                try:
+                    if file_path not in overrides and read_txt_content(file_path) != old:
+                        errors.append((file_path, 'modified since preview'))
+                        continue
+                    atomic_write_text(file_path, new)
+                    written.append((file_path, new))
+                except Exception as e:
+                    errors.append((file_path, str(e)))
+            return written, errors
+
+        all_written, all_errors = [], []
+        for written, errors in self._map_chunks(run_chunk, plan.changes):
+            all_written.extend(written)
+            all_errors.extend(errors)
+        return all_written, all_errors
+
+    def _map_chunks(self, fn, items: list):
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            yield from pool.map(fn, chunks)
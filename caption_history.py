@@ -0,0 +1,286 @@
+"""
+标注版本历史
+使用 SQLite 按内容寻址记录标注的历史版本：每个不同的内容只保存一份（按哈希去重、压缩），
+每次保存、批量编辑和手动创建的快照是一个版本（revision），版本中只记录内容发生变化的文件，
+存储空间与实际修改量相当
+
+某个版本时一个文件的内容为它在该版本及之前最后一次变化的内容（按 (文件, 版本) 主键查找），
+比较两个版本时只需遍历两者之间记录的变化，耗时与变化的文件数成正比，与数据集大小无关
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.expanduser('~'), '.youkengi_label_tool', 'history.sqlite3')
+
+# 版本类型：保存前发现磁盘上的内容与历史不一致时补记的原内容、保存、批量编辑、回滚、手动快照
+KINDS = ('baseline', 'save', 'bulk_edit', 'rollback', 'snapshot')
+BATCH = 500  # 每条 SQL 语句处理的文件数
+
+_REVISION_FIELDS = ('revision', 'time', 'kind', 'label', 'files', 'total')
+
+
+def _chunks(items: Iterable, size: int):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _placeholders(count: int) -> str:
+    return ', '.join('?' * count)
+
+
+class CaptionHistory:
+    """标注版本历史（线程安全）"""
+
+    def __init__(self, db_path: str = DEFAULT_HISTORY_PATH):
+        """
+        打开或创建历史数据库
+
+        Args:
+            db_path: 数据库文件路径
+        """
+        self.db_path = db_path
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            # 按内容哈希（16 字节 BLAKE2b）去重的标注内容，compressed 为 1 时 data 为 zlib 压缩后的 UTF-8 文本
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS blobs (
+                    id INTEGER PRIMARY KEY,
+                    hash BLOB NOT NULL UNIQUE,
+                    compressed INTEGER NOT NULL,
+                    data BLOB NOT NULL
+                )
+            ''')
+            # head 为文件最新版本的内容，记录时只需与它比较
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS paths (
+                    id INTEGER PRIMARY KEY,
+                    path TEXT NOT NULL UNIQUE,
+                    head INTEGER
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS revisions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    time REAL NOT NULL,
+                    kind TEXT NOT NULL,
+                    label TEXT,
+                    files INTEGER NOT NULL DEFAULT 0,
+                    total INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS changes (
+                    path_id INTEGER NOT NULL,
+                    revision INTEGER NOT NULL,
+                    blob_id INTEGER NOT NULL,
+                    PRIMARY KEY (path_id, revision)
+                ) WITHOUT ROWID
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS changes_revision ON changes (revision, path_id)')
+
+    # ---------- 记录 ----------
+
+    def record(self, items: Iterable[Tuple[str, str]], kind: str, label: Optional[str] = None,
+               always: bool = False) -> Optional[int]:
+        """
+        记录一批文件的当前内容，只有与最新版本不同的文件会写入
+
+        items 在持有锁时逐个读取（可以是从磁盘逐个读取的生成器），同一时间只有一次记录，
+        避免并发的保存和快照交错写入同一个文件的版本
+
+        Args:
+            items: [(路径, 内容)]
+            kind: 版本类型，见 KINDS
+            label: 版本说明
+            always: 没有文件变化时也创建版本（快照）
+
+        Returns:
+            新版本号；没有文件变化且 always 为 False 时返回 None
+        """
+        with self._lock, self._conn:
+            conn = self._conn
+            revision = None
+            changed = total = 0
+            for chunk in _chunks(items, BATCH):
+                total += len(chunk)
+                digests = {}
+                for file_path, content in chunk:
+                    data = content.encode('utf-8')
+                    digests[file_path] = (hashlib.blake2b(data, digest_size=16).digest(), data)
+                paths = list(digests)
+                heads = dict(conn.execute(
+                    f'SELECT p.path, b.hash FROM paths p JOIN blobs b ON b.id = p.head '
+                    f'WHERE p.path IN ({_placeholders(len(paths))})', paths
+                ).fetchall())
+                paths = [file_path for file_path in paths if heads.get(file_path) != digests[file_path][0]]
+                if not paths:
+                    continue
+                if revision is None:
+                    revision = conn.execute(
+                        'INSERT INTO revisions (time, kind, label) VALUES (?, ?, ?)', (time.time(), kind, label)
+                    ).lastrowid
+                blob_rows = {}
+                for file_path in paths:
+                    digest, data = digests[file_path]
+                    if digest not in blob_rows:
+                        packed = zlib.compress(data)
+                        blob_rows[digest] = (digest, 1, packed) if len(packed) < len(data) else (digest, 0, data)
+                conn.executemany(
+                    'INSERT OR IGNORE INTO blobs (hash, compressed, data) VALUES (?, ?, ?)', blob_rows.values()
+                )
+                blob_ids = dict(conn.execute(
+                    f'SELECT hash, id FROM blobs WHERE hash IN ({_placeholders(len(blob_rows))})', list(blob_rows)
+                ).fetchall())
+                conn.executemany('INSERT OR IGNORE INTO paths (path) VALUES (?)', [(path,) for path in paths])
+                path_ids = dict(conn.execute(
+                    f'SELECT path, id FROM paths WHERE path IN ({_placeholders(len(paths))})', paths
+                ).fetchall())
+                rows = [(path_ids[path], blob_ids[digests[path][0]]) for path in paths]
+                conn.executemany(
+                    'INSERT OR REPLACE INTO changes (path_id, revision, blob_id) VALUES (?, ?, ?)',
+                    [(path_id, revision, blob_id) for path_id, blob_id in rows]
+                )
+                conn.executemany('UPDATE paths SET head = ? WHERE id = ?', [(blob_id, path_id) for path_id, blob_id in rows])
+                changed += len(paths)
+            if revision is None and always:
+                revision = conn.execute(
+                    'INSERT INTO revisions (time, kind, label) VALUES (?, ?, ?)', (time.time(), kind, label)
+                ).lastrowid
+            if revision is not None:
+                conn.execute('UPDATE revisions SET files = ?, total = ? WHERE id = ?', (changed, total, revision))
+        return revision
+
+    # ---------- 查询 ----------
+
+    def revisions(self, kinds: Optional[Iterable[str]] = None, limit: int = 200) -> List[dict]:
+        """
+        列出版本（最新在前）
+
+        Args:
+            kinds: 只列出这些类型的版本，None 表示全部
+            limit: 最多返回的版本数
+
+        Returns:
+            [{'revision', 'time', 'kind', 'label', 'files'（变化的文件数）, 'total'（记录时提交的文件数）}]
+        """
+        sql = f'SELECT {", ".join(("id",) + _REVISION_FIELDS[1:])} FROM revisions'
+        params: list = []
+        if kinds is not None:
+            kinds = list(kinds)
+            sql += f' WHERE kind IN ({_placeholders(len(kinds))})'
+            params.extend(kinds)
+        sql += ' ORDER BY id DESC LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(zip(_REVISION_FIELDS, row)) for row in rows]
+
+    def latest_revision(self) -> int:
+        """最新的版本号，没有版本时返回 0"""
+        with self._lock:
+            row = self._conn.execute('SELECT MAX(id) FROM revisions').fetchone()
+        return row[0] or 0
+
+    def file_revisions(self, file_path: str, limit: int = 100) -> List[dict]:
+        """列出一个文件发生变化的版本（最新在前），字段同 revisions"""
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT {", ".join("r." + field for field in ("id",) + _REVISION_FIELDS[1:])} '
+                'FROM changes c JOIN revisions r ON r.id = c.revision '
+                'WHERE c.path_id = (SELECT id FROM paths WHERE path = ?) ORDER BY c.revision DESC LIMIT ?',
+                (file_path, limit)
+            ).fetchall()
+        return [dict(zip(_REVISION_FIELDS, row)) for row in rows]
+
+    def contents_at(self, paths: Iterable[str], revision: Optional[int] = None) -> Dict[str, Optional[str]]:
+        """
+        一批文件在某个版本时的内容
+
+        Args:
+            paths: 文件路径
+            revision: 版本号，None 表示最新版本
+
+        Returns:
+            路径 -> 内容；该版本时尚未记录的文件为 None
+        """
+        paths = list(paths)
+        result: Dict[str, Optional[str]] = {}
+        with self._lock:
+            for chunk in _chunks(paths, BATCH):
+                if revision is None:
+                    rows = self._conn.execute(
+                        f'SELECT path, head FROM paths WHERE path IN ({_placeholders(len(chunk))})', chunk
+                    ).fetchall()
+                else:
+                    rows = self._conn.execute(
+                        'SELECT path, (SELECT c.blob_id FROM changes c WHERE c.path_id = p.id AND c.revision <= ? '
+                        f'ORDER BY c.revision DESC LIMIT 1) FROM paths p WHERE path IN ({_placeholders(len(chunk))})',
+                        [revision] + chunk
+                    ).fetchall()
+                blobs = self._read_blobs({blob_id for _, blob_id in rows if blob_id is not None})
+                result.update((path, blobs.get(blob_id)) for path, blob_id in rows)
+        for file_path in paths:
+            result.setdefault(file_path, None)
+        return result
+
+    def diff(self, old: int, new: Optional[int] = None, paths=None) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        """
+        比较两个版本：只遍历两个版本之间记录的变化，耗时与变化的文件数成正比
+
+        Args:
+            old: 较早（作为基准）的版本号，0 表示还没有任何记录时
+            new: 另一个版本号，None 表示最新版本；早于 old 时得到反向的差异
+            paths: 只比较其中的文件（支持 in 的容器），None 表示全部
+
+        Returns:
+            按路径排序的 [(路径, old 时的内容, new 时的内容)]，某个版本时尚未记录的文件内容为 None；
+            两个版本之间改动后又改回的文件不包括在内
+        """
+        with self._lock:
+            if new is None:
+                new = self._conn.execute('SELECT MAX(id) FROM revisions').fetchone()[0] or 0
+            low, high = min(old, new), max(old, new)
+            state = 'SELECT c.blob_id FROM changes c WHERE c.path_id = p.id AND c.revision <= ? ' \
+                    'ORDER BY c.revision DESC LIMIT 1'
+            rows = self._conn.execute(
+                f'SELECT p.path, ({state}), ({state}) FROM paths p '
+                'WHERE p.id IN (SELECT path_id FROM changes WHERE revision > ? AND revision <= ?)',
+                (old, new, low, high)
+            ).fetchall()
+            rows = [row for row in rows if row[1] != row[2] and (paths is None or row[0] in paths)]
+            blobs = self._read_blobs({blob_id for row in rows for blob_id in row[1:] if blob_id is not None})
+        rows.sort()
+        return [(path, blobs.get(old_id), blobs.get(new_id)) for path, old_id, new_id in rows]
+
+    def _read_blobs(self, blob_ids) -> Dict[int, str]:
+        """按 id 读取内容（调用方持有锁）"""
+        blob_ids = list(blob_ids)
+        result = {}
+        for chunk in _chunks(blob_ids, BATCH):
+            for blob_id, compressed, data in self._conn.execute(
+                f'SELECT id, compressed, data FROM blobs WHERE id IN ({_placeholders(len(chunk))})', chunk
+            ):
+                result[blob_id] = (zlib.decompress(data) if compressed else bytes(data)).decode('utf-8')
+        return result
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1 @@
+"""pytest 配置：测试直接导入仓库根目录下的模块"""
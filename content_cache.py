@@ -0,0 +1,106 @@
+"""
+文本内容缓存
+按字节预算保存最近访问的文件内容（LRU），未保存的修改固定在缓存中，直到保存为止
+"""
+
+import sys
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024  # 默认缓存上限 64MB
+
+
+class ContentCache:
+    """带字节预算的 LRU 文本缓存"""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES, on_dirty_change: Optional[Callable[[str], None]] = None):
+        """
+        初始化缓存
+
+        Args:
+            max_bytes: 已保存（干净）内容占用的最大字节数，未保存的修改不计入淘汰
+            on_dirty_change: 文件变为未保存或不再是未保存时的回调（参数为文件路径）
+        """
+        self.max_bytes = max_bytes
+        self.on_dirty_change = on_dirty_change
+        self.clean_bytes = 0
+        self._clean: OrderedDict = OrderedDict()  # 路径 -> (内容, 占用字节数)
+        self._dirty: dict = {}  # 路径 -> 未保存的内容
+
+    def get(self, file_path: str) -> Optional[str]:
+        """获取缓存内容，未命中时返回 None"""
+        if file_path in self._dirty:
+            return self._dirty[file_path]
+        entry = self._clean.get(file_path)
+        if entry is None:
+            return None
+        self._clean.move_to_end(file_path)
+        return entry[0]
+
+    def put(self, file_path: str, content: str):
+        """缓存从磁盘读取的内容（已有未保存修改时保持修改不变）"""
+        if file_path in self._dirty:
+            return
+        self._discard_clean(file_path)
+        size = sys.getsizeof(content)
+        if size > self.max_bytes:
+            return
+        self._clean[file_path] = (content, size)
+        self.clean_bytes += size
+        self._evict()
+
+    def set_dirty(self, file_path: str, content: str):
+        """记录未保存的修改，在保存前不会被淘汰"""
+        self._discard_clean(file_path)
+        changed = file_path not in self._dirty
+        self._dirty[file_path] = content
+        if changed and self.on_dirty_change is not None:
+            self.on_dirty_change(file_path)
+
+    def mark_clean(self, file_path: str):
+        """文件保存后，把内容移回可淘汰的 LRU 区"""
+        content = self._dirty.pop(file_path, None)
+        if content is not None:
+            self.put(file_path, content)
+            if self.on_dirty_change is not None:
+                self.on_dirty_change(file_path)
+
+    def is_dirty(self, file_path: str) -> bool:
+        return file_path in self._dirty
+
+    def dirty_paths(self) -> List[str]:
+        """返回所有有未保存修改的文件路径"""
+        return list(self._dirty)
+
+    @property
+    def dirty_count(self) -> int:
+        return len(self._dirty)
+
+    def discard(self, file_path: str):
+        """移除缓存条目（包括未保存的修改）"""
+        self._discard_clean(file_path)
+        if self._dirty.pop(file_path, None) is not None and self.on_dirty_change is not None:
+            self.on_dirty_change(file_path)
+
+    def clear(self):
+        """清空缓存"""
+        self._clean.clear()
+        self._dirty.clear()
+        self.clean_bytes = 0
+
+    def __contains__(self, file_path: str) -> bool:
+        return file_path in self._dirty or file_path in self._clean
+
+    def __len__(self) -> int:
+        return len(self._dirty) + len(self._clean)
+
+    def _discard_clean(self, file_path: str):
+        entry = self._clean.pop(file_path, None)
+        if entry is not None:
+            self.clean_bytes -= entry[1]
+
+    def _evict(self):
+        """淘汰最久未访问的条目，直到不超过字节预算"""
+        while self.clean_bytes > self.max_bytes and self._clean:
+            _, (_, size) = self._clean.popitem(last=False)
+            self.clean_bytes -= size
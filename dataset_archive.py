@@ -0,0 +1,381 @@
+"""
+压缩包数据集
+不解压直接打开 zip / tar 压缩包中的数据集：首次打开时建立成员索引（成员名、偏移、大小）并缓存到压缩包旁的
+“压缩包名.index” 文件，之后只按偏移读取被选中的标注和图片
+
+压缩包本身不修改，修改后的标注写入压缩包旁的覆盖文件 “压缩包名.edits.json”，读取时优先使用其中的内容；
+需要合并后的数据集时可以导出清单
+
+支持 zip（存储或 deflate 压缩）和未压缩的 tar；压缩的 tar 无法随机读取，需要先解压为 tar 或重新打包为 zip
+"""
+
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import struct
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from dataset_scan import IMAGE_EXTENSIONS
+from save_pipeline import SaveConflict
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_EXTENSIONS = ('.zip', '.tar')
+ARCHIVE_CHUNK = 2048  # 加载时每块的条目数
+INDEX_VERSION = 1
+DEFAULT_EXTRACT_DIR = os.path.join(os.path.expanduser('~'), '.youkengi_label_tool', 'archive_images')
+
+_ZIP_LOCAL_HEADER = struct.Struct('<4s22xHH')  # 本地文件头：签名 ... 文件名长度, 扩展字段长度
+_UNSUPPORTED = -1  # 成员的压缩方式：加密或无法按偏移解压
+
+# 成员索引中每个成员的字段：(偏移, 存储大小, 原始大小, 压缩方式, 修改时间)
+Member = Tuple[int, int, int, int, float]
+
+
+def is_archive(path: str) -> bool:
+    """是否为支持的压缩包（按扩展名判断）"""
+    return path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def _content_hash(content: str) -> int:
+    return int.from_bytes(hashlib.blake2b(content.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _atomic_write(path: str, data: bytes):
+    """先写入同目录下的临时文件再替换"""
+    directory = os.path.dirname(path)
+    fd, temp_path = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _zip_members(path: str) -> Dict[str, Member]:
+    """读取 zip 的中央目录；偏移为本地文件头的偏移，数据偏移在读取时由文件头算出"""
+    members = {}
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            method = info.compress_type
+            if info.flag_bits & 0x1 or method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                method = _UNSUPPORTED
+            members[info.filename] = (
+                info.header_offset, info.compress_size, info.file_size, method,
+                time.mktime(info.date_time + (0, 0, -1)),
+            )
+    return members
+
+
+def _tar_members(path: str) -> Dict[str, Member]:
+    """顺序读取 tar 的成员头，偏移为数据的偏移"""
+    members = {}
+    try:
+        archive = tarfile.open(path, 'r:')
+    except tarfile.ReadError:
+        raise ValueError(f'compressed or invalid tar archive, unpack it or repack it as zip: {path}')
+    with archive:
+        for info in archive:
+            if info.isfile():
+                members[info.name] = (info.offset_data, info.size, info.size, zipfile.ZIP_STORED, float(info.mtime))
+    return members
+
+
+class DatasetArchive:
+    """
+    作为数据集来源的压缩包（线程安全）
+
+    压缩包中的成员 “a/b.txt” 在列表中的路径为 “压缩包路径/a/b.txt”，与 TXT 同名的图片成员作为配对图片，
+    由 DatasetStore 按路径前缀把读写交给压缩包。与清单相同，每个标注记录最近一次读取时的哈希，
+    写回时覆盖文件中的内容已被其他程序修改的标注作为冲突
+    """
+
+    def __init__(self, path: str, extract_dir: str = DEFAULT_EXTRACT_DIR):
+        """
+        打开压缩包（不读取内容，加载时调用 iter_entries）
+
+        Args:
+            path: 压缩包路径
+            extract_dir: 预览和接口需要图片文件时，被选中的图片成员解出到的缓存目录
+        """
+        self.path = os.path.abspath(path)
+        if not is_archive(self.path):
+            raise ValueError(f'unsupported archive format: {path}')
+        self.format = 'zip' if self.path.lower().endswith('.zip') else 'tar'
+        self.prefix = os.path.join(self.path, '')  # 压缩包中各成员的路径前缀
+        self.index_path = self.path + '.index'
+        self.overlay_path = self.path + '.edits.json'
+        self.extract_dir = extract_dir
+        self._lock = threading.RLock()
+        self._members: Dict[str, Member] = {}
+        self._images: Dict[str, str] = {}  # TXT 成员 -> 配对图片成员
+        self._overlay: Dict[str, str] = {}  # 成员 -> 修改后的标注
+        self._overlay_stat: Optional[Tuple[int, float]] = None
+        self._hashes: Dict[str, int] = {}  # 成员 -> 最近一次读取时标注的哈希
+        self._reader = None
+        self._stat: Optional[Tuple[int, float]] = None  # 成员索引对应的压缩包 (大小, 修改时间)
+
+    # ---------- 成员索引 ----------
+
+    def _load_index(self):
+        """读取或建立成员索引（持有锁时调用）"""
+        file_stat = os.stat(self.path)
+        stat = (file_stat.st_size, file_stat.st_mtime)
+        members = self._read_index_file(stat)
+        if members is None:
+            members = _zip_members(self.path) if self.format == 'zip' else _tar_members(self.path)
+            self._write_index_file(stat, members)
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        self._members = members
+        self._stat = stat
+        images = {}
+        for name in members:
+            base, ext = posixpath.splitext(name)
+            if ext.lower() in IMAGE_EXTENSIONS:
+                # 与 find_paired_image 相同，按扩展名的顺序优先
+                current = images.get(base)
+                if current is None or IMAGE_EXTENSIONS.index(ext.lower()) < IMAGE_EXTENSIONS.index(
+                        posixpath.splitext(current)[1].lower()):
+                    images[base] = name
+        self._images = {
+            name: images[posixpath.splitext(name)[0]] for name in members
+            if name.lower().endswith('.txt') and posixpath.splitext(name)[0] in images
+        }
+
+    def _read_index_file(self, stat: Tuple[int, float]) -> Optional[Dict[str, Member]]:
+        """读取缓存的成员索引，压缩包已变化或缓存无效时返回 None"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get('version') != INDEX_VERSION \
+                or (data.get('size'), data.get('mtime')) != stat:
+            return None
+        return {name: tuple(member) for name, *member in data.get('members', [])}
+
+    def _write_index_file(self, stat: Tuple[int, float], members: Dict[str, Member]):
+        """缓存成员索引（压缩包所在目录不可写时跳过，下次打开重新建立）"""
+        data = {
+            'version': INDEX_VERSION, 'size': stat[0], 'mtime': stat[1],
+            'members': [[name, *member] for name, member in members.items()],
+        }
+        try:
+            _atomic_write(self.index_path, json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        except OSError as e:
+            logger.warning('成员索引缓存写入失败: %s', e)
+
+    def _ensure_current(self):
+        """压缩包在加载后被替换时重新建立成员索引，覆盖文件被修改时重新读取（持有锁时调用）"""
+        file_stat = os.stat(self.path)
+        if (file_stat.st_size, file_stat.st_mtime) != self._stat:
+            self._load_index()
+        self._load_overlay()
+
+    def _load_overlay(self):
+        """读取覆盖文件（未变化时跳过）"""
+        try:
+            file_stat = os.stat(self.overlay_path)
+        except FileNotFoundError:
+            self._overlay, self._overlay_stat = {}, None
+            return
+        stat = (file_stat.st_size, file_stat.st_mtime)
+        if stat == self._overlay_stat:
+            return
+        with open(self.overlay_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self._overlay = {
+            name: content for name, content in data.items() if isinstance(content, str)
+        } if isinstance(data, dict) else {}
+        self._overlay_stat = stat
+
+    # ---------- 读取 ----------
+
+    def member_of(self, file_path: str) -> str:
+        """列表中的路径 -> 成员名，不属于该压缩包或成员不存在时抛出 KeyError"""
+        if not file_path.startswith(self.prefix):
+            raise KeyError(file_path)
+        name = file_path[len(self.prefix):]
+        if name not in self._members:
+            raise KeyError(file_path)
+        return name
+
+    def _read_member(self, name: str) -> bytes:
+        """按偏移读取一个成员的数据（持有锁时调用）"""
+        offset, stored_size, size, method, _ = self._members[name]
+        if method == _UNSUPPORTED:
+            raise ValueError(f'encrypted or unsupported compression: {name}')
+        if self._reader is None:
+            self._reader = open(self.path, 'rb')
+        reader = self._reader
+        if self.format == 'zip':
+            reader.seek(offset)
+            signature, name_length, extra_length = _ZIP_LOCAL_HEADER.unpack(reader.read(_ZIP_LOCAL_HEADER.size))
+            if signature != b'PK\x03\x04':
+                raise ValueError(f'bad zip local header: {name}')
+            reader.seek(offset + _ZIP_LOCAL_HEADER.size + name_length + extra_length)
+        else:
+            reader.seek(offset)
+        data = reader.read(stored_size)
+        if method == zipfile.ZIP_DEFLATED:
+            data = zlib.decompress(data, -15)
+        if len(data) != size:
+            raise ValueError(f'truncated archive member: {name}')
+        return data
+
+    def _read_text(self, name: str) -> str:
+        """成员的当前标注：覆盖文件中有修改时使用修改后的内容（持有锁时调用）"""
+        content = self._overlay.get(name)
+        if content is None:
+            content = self._read_member(name).decode('utf-8')
+        return content
+
+    def _entry(self, name: str) -> dict:
+        """TXT 成员 -> 数据集条目（与扫描 TXT 得到的条目字段相同，不包含内容）"""
+        _, _, size, _, mtime = self._members[name]
+        edited = self._overlay.get(name)
+        image = self._images.get(name)
+        return {
+            'path': self.prefix + name,
+            'name': posixpath.basename(name),
+            'size': size if edited is None else len(edited.encode('utf-8')),
+            'mtime': mtime if edited is None else self._overlay_stat[1],
+            'created_time': mtime,
+            'image_path': self.prefix + image if image else '',
+            'source_path': name,
+        }
+
+    def iter_entries(self, chunk_size: int = ARCHIVE_CHUNK) -> Iterator[Tuple[List[dict], float]]:
+        """
+        读取成员索引并逐块返回 TXT 成员的条目（阻塞，应在后台线程中调用），不读取标注
+
+        覆盖文件中已修改的标注直接包含在条目中
+
+        Yields:
+            (一块数据集条目, 已处理的比例)
+        """
+        with self._lock:
+            self._load_index()
+            self._load_overlay()
+            names = [name for name in self._members if name.lower().endswith('.txt')]
+            overlay = dict(self._overlay)
+        for start in range(0, len(names), chunk_size):
+            with self._lock:
+                entries = [self._entry(name) for name in names[start:start + chunk_size]]
+            for entry in entries:
+                content = overlay.get(entry['source_path'])
+                if content is not None:
+                    entry['content'] = content
+                    self._hashes[entry['source_path']] = _content_hash(content)
+            yield entries, min(start + chunk_size, len(names)) / len(names)
+        if not names:
+            yield [], 1.0
+
+    def read(self, file_path: str) -> str:
+        """按偏移读取一个标注"""
+        return self.entry(file_path)['content']
+
+    def entry(self, file_path: str) -> dict:
+        """读取一个 TXT 成员，返回数据集条目（包括内容），并以读到的标注作为之后写回时比较的基准"""
+        with self._lock:
+            self._ensure_current()
+            name = self.member_of(file_path)
+            entry = self._entry(name)
+            entry['content'] = self._read_text(name)
+            self._hashes[name] = _content_hash(entry['content'])
+            return entry
+
+    def extract(self, image_path: str) -> Optional[str]:
+        """
+        把图片成员解出到缓存目录（已解出时直接返回），供缩略图和接口按文件读取
+
+        Returns:
+            缓存中的图片路径；成员不存在或无法读取时返回 None
+        """
+        with self._lock:
+            try:
+                self._ensure_current()
+                name = self.member_of(image_path)
+            except (OSError, KeyError):
+                return None
+            key = hashlib.sha1(f'{self.path}\0{self._stat}\0{name}'.encode('utf-8')).hexdigest()
+            target = os.path.join(self.extract_dir, key[:2], key + posixpath.splitext(name)[1].lower())
+            if os.path.exists(target):
+                return target
+            try:
+                data = self._read_member(name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                _atomic_write(target, data)
+            except (OSError, ValueError, zlib.error) as e:
+                logger.warning('图片解出失败: %s', e)
+                return None
+            return target
+
+    # ---------- 写回 ----------
+
+    def write(self, contents: Dict[str, str], force: bool = False) -> Dict[str, str]:
+        """
+        把修改后的标注写入覆盖文件（阻塞，应在后台线程中调用），与压缩包中相同的内容从覆盖文件中移除
+
+        Args:
+            contents: 列表中的路径 -> 新的标注
+            force: 覆盖文件中的标注在读取后被其他程序修改时仍然覆盖
+
+        Returns:
+            没有写入的冲突标注：路径 -> 冲突原因（'modified' / 'deleted'）
+        """
+        with self._lock:
+            if not os.path.exists(self.path):
+                raise SaveConflict('deleted')
+            self._ensure_current()
+            overlay = dict(self._overlay)
+            conflicts = {}
+            for file_path, content in contents.items():
+                try:
+                    name = self.member_of(file_path)
+                except KeyError:
+                    conflicts[file_path] = 'deleted'
+                    continue
+                current = self._read_text(name)
+                if not force and name in self._hashes and _content_hash(current) != self._hashes[name]:
+                    conflicts[file_path] = 'modified'
+                    continue
+                if content == self._read_member(name).decode('utf-8'):
+                    overlay.pop(name, None)
+                else:
+                    overlay[name] = content
+                self._hashes[name] = _content_hash(content)
+            if overlay != self._overlay:
+                if overlay:
+                    _atomic_write(self.overlay_path, json.dumps(overlay, ensure_ascii=False, indent=0).encode('utf-8'))
+                else:
+                    os.unlink(self.overlay_path)
+                self._overlay = overlay
+                self._overlay_stat = None
+                self._load_overlay()
+            return conflicts
+
+    def close(self):
+        with self._lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
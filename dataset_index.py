@@ -0,0 +1,275 @@
+"""
+数据集持久化索引
+使用 SQLite 按路径记录文件的大小、修改时间、创建时间、内容哈希、配对图片和文本内容，
+再次打开同一数据集时只需按修改时间和大小校验，未变化的文件不再读取；
+重复检测的哈希也按路径记录在这里，再次检测时只计算变化的文件
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from dataset_scan import find_paired_image
+from duplicates import HASH_FIELDS
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser('~'), '.youkengi_label_tool', 'index.sqlite3')
+
+# 打开数据集时只读取元数据，标注内容按需分批读取
+_META_FIELDS = ('path', 'name', 'size', 'mtime', 'created_time', 'content_hash', 'image_path')
+_FIELDS = _META_FIELDS + ('content',)
+
+
+def _prefix_range(root: str) -> Tuple[str, str]:
+    """返回目录下所有路径所在的字符串区间 [下界, 上界)，可以利用主键索引做前缀范围查询"""
+    prefix = os.path.join(os.path.abspath(root), '')
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def content_hash(data: bytes) -> str:
+    """计算文件内容哈希"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def index_txt_file(file_path: str, known: Optional[Dict[str, dict]] = None) -> dict:
+    """
+    读取单个 TXT 文件并生成索引条目
+
+    Args:
+        file_path: 文件路径
+        known: 已索引的条目（路径 -> 条目），大小和修改时间都未变化时直接复用，不读取内容
+
+    Returns:
+        索引条目；复用已有条目时带有 'unchanged': True，只有配对图片变化时为不含内容的条目
+    """
+    file_stat = os.stat(file_path)
+    if known is not None:
+        entry = known.get(file_path)
+        if entry is not None and entry['size'] == file_stat.st_size and entry['mtime'] == file_stat.st_mtime:
+            # 配对图片可能被添加、删除或改名，总是重新查找（只需 stat）
+            image_path = find_paired_image(file_path)
+            if image_path == entry['image_path']:
+                return dict(entry, unchanged=True)
+            return dict(entry, image_path=image_path)
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    return {
+        'path': file_path,
+        'name': os.path.basename(file_path),
+        'size': file_stat.st_size,
+        'mtime': file_stat.st_mtime,
+        'created_time': file_stat.st_ctime,
+        'content_hash': content_hash(data),
+        'image_path': find_paired_image(file_path),
+        'content': data.decode('utf-8'),
+    }
+
+
+class DatasetIndex:
+    """SQLite 数据集索引（线程安全）"""
+
+    def __init__(self, db_path: str = DEFAULT_INDEX_PATH):
+        """
+        打开或创建索引数据库
+
+        Args:
+            db_path: 数据库文件路径
+        """
+        self.db_path = db_path
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    created_time REAL NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    image_path TEXT,
+                    content TEXT NOT NULL
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS reviews (
+                    path TEXT PRIMARY KEY,
+                    reviewed_time REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS hashes (
+                    path TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    caption_hash TEXT,
+                    signature BLOB,
+                    image_path TEXT,
+                    image_mtime REAL,
+                    image_size INTEGER,
+                    image_hash TEXT,
+                    phash TEXT
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS datasets (
+                    root TEXT PRIMARY KEY,
+                    opened_time REAL NOT NULL
+                )
+            ''')
+
+    def entries_under(self, root: str) -> Dict[str, dict]:
+        """返回某个目录下所有已索引的条目（路径 -> 条目，不含内容）"""
+        prefix, upper = _prefix_range(root)
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT {", ".join(_META_FIELDS)} FROM files WHERE path >= ? AND path < ?', (prefix, upper)
+            ).fetchall()
+        return {row[0]: dict(zip(_META_FIELDS, row)) for row in rows}
+
+    def lookup(self, paths: Iterable[str]) -> Dict[str, dict]:
+        """按路径批量查询已索引的条目（不含内容）"""
+        result = {}
+        paths = list(paths)
+        with self._lock:
+            for start in range(0, len(paths), 500):
+                chunk = paths[start:start + 500]
+                rows = self._conn.execute(
+                    f'SELECT {", ".join(_META_FIELDS)} FROM files WHERE path IN ({", ".join("?" * len(chunk))})', chunk
+                ).fetchall()
+                result.update((row[0], dict(zip(_META_FIELDS, row))) for row in rows)
+        return result
+
+    def iter_contents(self, paths: Iterable[str], batch: int = 500):
+        """
+        按路径分批读取已索引的标注内容，每次只持有一批
+
+        Args:
+            paths: 文件路径
+            batch: 每批的文件数
+
+        Yields:
+            [(路径, 内容)]，未索引的文件不包括在内
+        """
+        paths = list(paths)
+        for start in range(0, len(paths), batch):
+            chunk = paths[start:start + batch]
+            with self._lock:
+                rows = self._conn.execute(
+                    f'SELECT path, content FROM files WHERE path IN ({", ".join("?" * len(chunk))})', chunk
+                ).fetchall()
+            if rows:
+                yield rows
+
+    def upsert(self, entries: Iterable[dict]):
+        """写入或更新条目；不含内容的条目只更新已有记录的元数据"""
+        rows, updates = [], []
+        for entry in entries:
+            if 'content' in entry:
+                rows.append(tuple(entry[field] for field in _FIELDS))
+            else:
+                updates.append(tuple(entry[field] for field in _META_FIELDS[1:]) + (entry['path'],))
+        if not rows and not updates:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f'INSERT OR REPLACE INTO files ({", ".join(_FIELDS)}) VALUES ({", ".join("?" * len(_FIELDS))})', rows
+            )
+            self._conn.executemany(
+                f'UPDATE files SET {", ".join(field + " = ?" for field in _META_FIELDS[1:])} WHERE path = ?', updates
+            )
+
+    def remove(self, paths: Iterable[str]):
+        """删除条目"""
+        rows = [(path,) for path in paths]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany('DELETE FROM files WHERE path = ?', rows)
+            self._conn.executemany('DELETE FROM hashes WHERE path = ?', rows)
+
+    def lookup_hashes(self, paths: Iterable[str]) -> Dict[str, dict]:
+        """按路径批量查询重复检测的哈希记录"""
+        result = {}
+        paths = list(paths)
+        with self._lock:
+            for start in range(0, len(paths), 500):
+                chunk = paths[start:start + 500]
+                rows = self._conn.execute(
+                    f'SELECT {", ".join(HASH_FIELDS)} FROM hashes WHERE path IN ({", ".join("?" * len(chunk))})', chunk
+                ).fetchall()
+                result.update((row[0], dict(zip(HASH_FIELDS, row))) for row in rows)
+        return result
+
+    def upsert_hashes(self, records: Iterable[dict]):
+        """写入或更新重复检测的哈希记录"""
+        rows = [tuple(record[field] for field in HASH_FIELDS) for record in records]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f'INSERT OR REPLACE INTO hashes ({", ".join(HASH_FIELDS)}) VALUES ({", ".join("?" * len(HASH_FIELDS))})',
+                rows
+            )
+
+    def set_reviewed(self, paths: Iterable[str], reviewed: bool = True):
+        """设置文件的已审阅标记"""
+        if reviewed:
+            now = time.time()
+            rows = [(path, now) for path in paths]
+            sql = 'INSERT OR REPLACE INTO reviews (path, reviewed_time) VALUES (?, ?)'
+        else:
+            rows = [(path,) for path in paths]
+            sql = 'DELETE FROM reviews WHERE path = ?'
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(sql, rows)
+
+    def reviewed_under(self, root: str) -> Set[str]:
+        """返回某个目录下所有已审阅的文件"""
+        prefix, upper = _prefix_range(root)
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT path FROM reviews WHERE path >= ? AND path < ?', (prefix, upper)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def reviewed_in(self, paths: Iterable[str]) -> Set[str]:
+        """返回给定文件中已审阅的文件"""
+        result = set()
+        paths = list(paths)
+        with self._lock:
+            for start in range(0, len(paths), 500):
+                chunk = paths[start:start + 500]
+                rows = self._conn.execute(
+                    f'SELECT path FROM reviews WHERE path IN ({", ".join("?" * len(chunk))})', chunk
+                ).fetchall()
+                result.update(row[0] for row in rows)
+        return result
+
+    def record_dataset(self, root: str):
+        """记录最近打开的数据集目录"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO datasets (root, opened_time) VALUES (?, ?)', (os.path.abspath(root), time.time())
+            )
+
+    def recent_datasets(self, limit: int = 10) -> List[str]:
+        """返回最近打开的数据集目录（最新在前）"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT root FROM datasets ORDER BY opened_time DESC LIMIT ?', (limit,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,258 @@
+"""
+数据集检查（命令行）
+不启动界面，在多进程中检查数据集的 TXT 标注和配对图片，以 JSON 输出问题列表，并可自动修复安全的问题
+
+用法：
+    python dataset_lint.py <数据集目录> [--fix] [--max-chars N] [--jobs N] [--ignore 类型 ...] [--output 文件]
+
+检查项：
+    missing_image       TXT 没有同名图片
+    orphan_image        图片没有同名 TXT
+    ambiguous_image     同名图片不止一张
+    unsupported_image   配对图片的格式不在界面可预览的格式中（.jpg / .png）
+    empty_caption       标注为空
+    non_utf8            不是 UTF-8 编码
+    utf8_bom            带有 UTF-8 BOM（可修复）
+    duplicate_tags      同一行中有重复的标签（可修复）
+    oversized_caption   标注超过字符数上限
+
+退出码：0 没有问题（或已全部修复），1 存在问题，2 参数错误
+"""
+
+import argparse
+import functools
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from bulk_edit import build_operation
+from dataset_scan import IMAGE_EXTENSIONS, atomic_write_text
+
+# 检查配对时识别的图片格式（比界面预览支持的格式更多）
+LINT_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif', '.tif', '.tiff', '.jxl', '.avif')
+ISSUE_TYPES = (
+    'missing_image', 'orphan_image', 'ambiguous_image', 'unsupported_image',
+    'empty_caption', 'non_utf8', 'utf8_bom', 'duplicate_tags', 'oversized_caption'
+)
+FIXABLE_TYPES = ('utf8_bom', 'duplicate_tags')
+DEFAULT_MAX_CHARS = 2000
+CHUNK_SIZE = 512  # 每个任务检查的文件数
+
+_UTF8_BOM = b'\xef\xbb\xbf'
+
+
+def iter_directories(root: str, recursive: bool = True) -> Iterator[Tuple[str, List[str]]]:
+    """遍历目录，返回 (目录, 其中的文件名列表)"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        names = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                stack.append(entry.path)
+                        elif entry.is_file():
+                            names.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        yield directory, names
+
+
+def check_pairs(directory: str, names: List[str]) -> Tuple[List[str], List[dict]]:
+    """
+    检查一个目录中 TXT 与图片的配对（只比较文件名，不访问磁盘）
+
+    Returns:
+        (TXT 文件路径列表, 问题列表)
+    """
+    txt_stems = {}
+    images: Dict[str, List[str]] = {}
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        ext = ext.lower()
+        if ext == '.txt':
+            txt_stems[stem] = name
+        elif ext in LINT_IMAGE_EXTENSIONS:
+            images.setdefault(stem, []).append(name)
+
+    issues = []
+    for stem, name in txt_stems.items():
+        path = os.path.join(directory, name)
+        paired = images.get(stem)
+        if not paired:
+            issues.append({'type': 'missing_image', 'path': path})
+            continue
+        if len(paired) > 1:
+            issues.append({'type': 'ambiguous_image', 'path': path, 'detail': sorted(paired)})
+        # 界面按扩展名原样拼接路径查找图片，大小写不同或其他格式都无法预览
+        if not any(os.path.splitext(image)[1] in IMAGE_EXTENSIONS for image in paired):
+            issues.append({'type': 'unsupported_image', 'path': path, 'detail': sorted(paired)})
+    for stem, paired in images.items():
+        if stem not in txt_stems:
+            issues.extend({'type': 'orphan_image', 'path': os.path.join(directory, name)} for name in paired)
+    return [os.path.join(directory, name) for name in txt_stems.values()], issues
+
+
+def _duplicate_tags(content: str) -> List[str]:
+    """返回每一行中重复出现的标签（不区分大小写）"""
+    duplicates = []
+    for line in content.split('\n'):
+        counts = Counter(tag.strip().lower() for tag in line.split(',') if tag.strip())
+        duplicates.extend(tag for tag, count in counts.items() if count > 1)
+    return list(dict.fromkeys(duplicates))
+
+
+def check_caption(file_path: str, max_chars: int = DEFAULT_MAX_CHARS, fix: bool = False) -> Tuple[List[dict], List[str]]:
+    """
+    检查单个 TXT 文件
+
+    Args:
+        file_path: 文件路径
+        max_chars: 标注的字符数上限
+        fix: 是否修复可以安全修复的问题（去除 BOM、删除重复标签）
+
+    Returns:
+        (未修复的问题列表, 已修复的问题类型列表)
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        return [{'type': 'read_error', 'path': file_path, 'detail': str(e)}], []
+    issues = []
+    has_bom = data.startswith(_UTF8_BOM)
+    if has_bom:
+        data = data[len(_UTF8_BOM):]
+        issues.append({'type': 'utf8_bom', 'path': file_path})
+    try:
+        content = data.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # 编码无法可靠推断，不做修复
+        return [{'type': 'non_utf8', 'path': file_path, 'detail': str(e)}], []
+
+    if not content.strip():
+        issues.append({'type': 'empty_caption', 'path': file_path})
+    if len(content) > max_chars:
+        issues.append({'type': 'oversized_caption', 'path': file_path, 'detail': len(content)})
+    duplicates = _duplicate_tags(content)
+    if duplicates:
+        issues.append({'type': 'duplicate_tags', 'path': file_path, 'detail': duplicates})
+
+    fixed = []
+    if fix and (has_bom or duplicates):
+        new_content = build_operation('dedupe_tags')(content) if duplicates else content
+        try:
+            # 按原样写入换行符，修复不改变行尾
+            atomic_write_text(file_path, new_content, newline='')
+        except OSError as e:
+            issues.append({'type': 'fix_failed', 'path': file_path, 'detail': str(e)})
+        else:
+            fixed = [issue['type'] for issue in issues if issue['type'] in FIXABLE_TYPES]
+            issues = [issue for issue in issues if issue['type'] not in FIXABLE_TYPES]
+    return issues, fixed
+
+
+def _check_chunk(paths: List[str], max_chars: int, fix: bool) -> Tuple[List[dict], List[str]]:
+    """在工作进程中检查一批文件"""
+    issues, fixed = [], []
+    for file_path in paths:
+        file_issues, file_fixed = check_caption(file_path, max_chars, fix)
+        issues.extend(file_issues)
+        fixed.extend(file_fixed)
+    return issues, fixed
+
+
+def lint_dataset(root: str, max_chars: int = DEFAULT_MAX_CHARS, fix: bool = False, recursive: bool = True,
+                 jobs: Optional[int] = None, ignore=()) -> dict:
+    """
+    检查整个数据集
+
+    配对检查在主进程中按目录列表完成，TXT 内容按批分发到进程池
+
+    Args:
+        root: 数据集目录
+        max_chars: 标注的字符数上限
+        fix: 是否自动修复
+        recursive: 是否检查子目录
+        jobs: 进程数，默认为 CPU 核数
+        ignore: 不报告的问题类型
+
+    Returns:
+        检查报告（可直接序列化为 JSON）
+    """
+    start = time.perf_counter()
+    root = os.path.abspath(root)
+    txt_files: List[str] = []
+    issues: List[dict] = []
+    image_count = 0
+    for directory, names in iter_directories(root, recursive):
+        paths, pair_issues = check_pairs(directory, names)
+        txt_files.extend(paths)
+        issues.extend(pair_issues)
+        image_count += sum(1 for name in names if os.path.splitext(name)[1].lower() in LINT_IMAGE_EXTENSIONS)
+
+    fixed: Counter = Counter()
+    chunks = [txt_files[i:i + CHUNK_SIZE] for i in range(0, len(txt_files), CHUNK_SIZE)]
+    check = functools.partial(_check_chunk, max_chars=max_chars, fix=fix)
+    if len(chunks) > 1 and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(check, chunks))
+    else:
+        results = [check(chunk) for chunk in chunks]
+    for chunk_issues, chunk_fixed in results:
+        issues.extend(chunk_issues)
+        fixed.update(chunk_fixed)
+
+    ignore = set(ignore)
+    issues = [issue for issue in issues if issue['type'] not in ignore]
+    issues.sort(key=lambda issue: (issue['path'], issue['type']))
+    return {
+        'root': root,
+        'txt_files': len(txt_files),
+        'images': image_count,
+        'summary': dict(sorted(Counter(issue['type'] for issue in issues).items())),
+        'fixed': dict(sorted(fixed.items())),
+        'issues': issues,
+        'elapsed': round(time.perf_counter() - start, 3),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='检查数据集中的 TXT 标注和配对图片，以 JSON 输出结果')
+    parser.add_argument('root', help='数据集目录')
+    parser.add_argument('--fix', action='store_true', help='自动修复安全的问题（去除 BOM、删除重复标签）')
+    parser.add_argument('--max-chars', type=int, default=DEFAULT_MAX_CHARS, help='标注的字符数上限')
+    parser.add_argument('--jobs', type=int, default=None, help='进程数，默认为 CPU 核数')
+    parser.add_argument('--no-recursive', action='store_true', help='不检查子目录')
+    parser.add_argument('--ignore', nargs='+', choices=ISSUE_TYPES, default=[], help='不报告的问题类型')
+    parser.add_argument('--output', help='把报告写入文件，默认输出到标准输出')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        print(f'错误: 目录不存在: {args.root}', file=sys.stderr)
+        return 2
+    if args.jobs is not None and args.jobs < 1:
+        print('错误: --jobs 必须大于 0', file=sys.stderr)
+        return 2
+
+    report = lint_dataset(args.root, args.max_chars, args.fix, not args.no_recursive, args.jobs, args.ignore)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 1 if report['issues'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
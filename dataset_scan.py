@@ -0,0 +1,194 @@
+"""
+数据集扫描
+使用 os.scandir 遍历数据集目录，并在线程池中并行读取 TXT 文件的元数据，按批次返回结果
+"""
+
+import os
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+IMAGE_EXTENSIONS = ['.jpg', '.png']  # 与 TXT 同名的配对图片格式
+
+
+def iter_txt_files(root: str, recursive: bool = True) -> Iterator[str]:
+    """
+    遍历目录下的所有 TXT 文件
+
+    Args:
+        root: 数据集根目录
+        recursive: 是否递归子目录
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                stack.append(entry.path)
+                        elif entry.name.lower().endswith('.txt') and entry.is_file():
+                            yield entry.path
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
+def find_paired_image(file_path: str) -> Optional[str]:
+    """查找与 TXT 文件同名的图片，不存在时返回 None"""
+    base_path = os.path.splitext(file_path)[0]
+    for ext in IMAGE_EXTENSIONS:
+        image_path = base_path + ext
+        if os.path.exists(image_path):
+            return image_path
+    return None
+
+
+def read_txt_content(file_path: str) -> str:
+    """读取 TXT 文件内容"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def atomic_write_text(file_path: str, content: str, newline: Optional[str] = None):
+    """
+    先写入同目录下的临时文件再替换目标文件，写入中途崩溃不会截断原文件
+
+    Args:
+        file_path: 文件路径
+        content: 文本内容
+        newline: 同 open 的 newline 参数，为 '' 时按原样写入换行符（不转换为系统换行符）
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline=newline) as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        # 保留原文件的权限（mkstemp 创建的文件只有所有者可读写）
+        try:
+            mode = os.stat(file_path).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def stat_txt_file(file_path: str) -> dict:
+    """读取单个 TXT 文件的元数据（不读取内容）"""
+    file_stat = os.stat(file_path)
+    return {
+        'path': file_path,
+        'name': os.path.basename(file_path),
+        'size': file_stat.st_size,
+        'mtime': file_stat.st_mtime,
+        'created_time': file_stat.st_ctime,
+    }
+
+
+def read_txt_file(file_path: str) -> dict:
+    """读取单个 TXT 文件的元数据和内容"""
+    entry = stat_txt_file(file_path)
+    entry['content'] = read_txt_content(file_path)
+    return entry
+
+
+def _read_chunk(reader: Callable[[str], dict], paths: List[str]) -> Tuple[List[dict], List[Tuple[str, str]]]:
+    """在工作线程中读取一批文件，返回 (成功条目, [(路径, 错误信息)])"""
+    entries = []
+    errors = []
+    for file_path in paths:
+        try:
+            entries.append(reader(file_path))
+        except Exception as e:
+            errors.append((file_path, str(e)))
+    return entries, errors
+
+
+class DatasetScanner:
+    """
+    数据集扫描器
+
+    一边发现文件一边把分块提交给线程池读取，读完一块就通过回调交给调用方，
+    调用方可以随时取消。
+    """
+
+    def __init__(self, paths: Iterable[str], batch_size: int = 256, max_workers: Optional[int] = None,
+                 reader: Callable[[str], dict] = stat_txt_file):
+        """
+        初始化扫描器
+
+        Args:
+            paths: 待读取的文件路径（可以是 iter_txt_files 返回的生成器）
+            batch_size: 每批读取的文件数
+            max_workers: 线程池大小，默认根据 CPU 数量决定
+            reader: 读取单个文件的函数，默认只读取元数据
+        """
+        self.paths = paths
+        self.reader = reader
+        self.batch_size = batch_size
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """请求取消扫描"""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def run(self, on_batch: Callable[[List[dict], List[Tuple[str, str]], int, int], None]):
+        """
+        执行扫描（阻塞，应在后台线程中调用）
+
+        Args:
+            on_batch: 每读完一批时调用，参数为 (条目, 错误, 已处理数, 已发现数)
+        """
+        done = 0
+        discovered = 0
+        pending = set()
+
+        def collect(futures):
+            nonlocal done
+            for future in futures:
+                entries, errors = future.result()
+                done += len(entries) + len(errors)
+                on_batch(entries, errors, done, discovered)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            chunk = []
+            for file_path in self.paths:
+                if self.cancelled:
+                    break
+                chunk.append(file_path)
+                discovered += 1
+                if len(chunk) >= self.batch_size:
+                    pending.add(pool.submit(_read_chunk, self.reader, chunk))
+                    chunk = []
+                    # 限制排队中的批次数量，避免一次性占用过多内存
+                    if len(pending) >= self.max_workers * 2:
+                        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(finished)
+                    else:
+                        finished = {f for f in pending if f.done()}
+                        pending -= finished
+                        collect(finished)
+            if chunk and not self.cancelled:
+                pending.add(pool.submit(_read_chunk, self.reader, chunk))
+            while pending and not self.cancelled:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,1140 @@
+"""
+共享数据集
+同一进程中的所有页面（审阅者）共用一份文件列表、文本缓存、搜索索引、保存队列和文件监视，
+内存占用不随审阅者数量增长；有未保存修改的文件按会话加锁，审阅任务按批租借给各个审阅者，互不重叠
+
+数据变化后通过事件通知所有已连接的会话，会话只负责自己的界面（选中文件、搜索结果、排序方式）
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from caption_history import DEFAULT_HISTORY_PATH, CaptionHistory
+from content_cache import DEFAULT_CACHE_BYTES, ContentCache
+from dataset_archive import ARCHIVE_CHUNK, DatasetArchive
+from dataset_index import DEFAULT_INDEX_PATH, DatasetIndex, index_txt_file
+from dataset_scan import DatasetScanner, find_paired_image, read_txt_content, stat_txt_file
+from duplicates import DEFAULT_IMAGE_DISTANCE, DEFAULT_SIMILARITY, HASH_BATCH, DuplicateDetector, find_clusters
+from file_table import FileInfoView, FileTable
+from fs_watch import FileWatcher
+from manifest import MANIFEST_CHUNK, Manifest, ManifestWriter
+from perf_metrics import metrics
+from save_pipeline import SaveConflict, SavePipeline
+from sort_index import FilePositions, SortedFiles, SortIndex, natural_key
+from tag_search import TagIndex
+from tag_stats import TagStatistics
+from thumbnails import read_image_size
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_TTL = 30 * 60  # 租借的批次无操作多少秒后收回
+IMAGE_SIZE_BATCH = 1024  # 每轮读取尺寸的图片数
+
+# 排序方式 -> (排序索引, 是否倒序)；同一个排序索引的正序和倒序共用一份数据
+SORT_KEYS = {
+    'load': ('load', False),
+    'time_desc': ('time', True),
+    'time_asc': ('time', False),
+    'name_asc': ('name', False),
+    'name_desc': ('name', True),
+    'natural_asc': ('natural', False),
+    'natural_desc': ('natural', True),
+    'mtime_desc': ('mtime', True),
+    'mtime_asc': ('mtime', False),
+    'size_desc': ('size', True),
+    'size_asc': ('size', False),
+    'tags_desc': ('tags', True),
+    'tags_asc': ('tags', False),
+    'resolution_desc': ('resolution', True),
+    'resolution_asc': ('resolution', False),
+    'unreviewed_first': ('reviewed', False),
+    'unsaved_first': ('dirty', False),
+}
+# 排序键取自文件信息的排序索引，文件信息更新时需要重新计算
+INFO_SORT_INDEXES = ('time', 'name', 'natural', 'mtime', 'size')
+
+
+class LeaseTable:
+    """审阅任务租借表：把文件分批租借给审阅者，租期内不会再分给其他人"""
+
+    def __init__(self, ttl: float = DEFAULT_LEASE_TTL):
+        """
+        初始化租借表
+
+        Args:
+            ttl: 审阅者无操作多少秒后收回其批次
+        """
+        self.ttl = ttl
+        self._owners: Dict[str, str] = {}  # 文件路径 -> 审阅者
+        self._batches: Dict[str, Set[str]] = {}  # 审阅者 -> 租借的文件
+        self._expires: Dict[str, float] = {}  # 审阅者 -> 到期时间
+
+    def acquire(self, owner: str, candidates: Iterable[str], count: int) -> List[str]:
+        """从候选文件中为审阅者租借最多 count 个未被他人租借的文件"""
+        self.expire()
+        batch = self._batches.setdefault(owner, set())
+        granted = []
+        for file_path in candidates:
+            if len(granted) >= count:
+                break
+            if file_path in self._owners:
+                continue
+            self._owners[file_path] = owner
+            batch.add(file_path)
+            granted.append(file_path)
+        self._expires[owner] = time.monotonic() + self.ttl
+        return granted
+
+    def renew(self, owner: str):
+        """审阅者有操作时延长租期"""
+        if owner in self._batches:
+            self._expires[owner] = time.monotonic() + self.ttl
+
+    def release(self, owner: str, paths: Optional[Iterable[str]] = None):
+        """归还审阅者的部分或全部文件"""
+        batch = self._batches.get(owner)
+        if batch is None:
+            return
+        for file_path in list(batch) if paths is None else paths:
+            if file_path in batch:
+                batch.discard(file_path)
+                del self._owners[file_path]
+        if not batch:
+            self._batches.pop(owner, None)
+            self._expires.pop(owner, None)
+
+    def expire(self) -> List[str]:
+        """收回已到期的批次，返回被收回的审阅者"""
+        now = time.monotonic()
+        expired = [owner for owner, expires in self._expires.items() if expires <= now]
+        for owner in expired:
+            self.release(owner)
+        return expired
+
+    def batch_of(self, owner: str) -> Set[str]:
+        """审阅者当前租借的文件（调用方不得修改）"""
+        return self._batches.get(owner, set())
+
+    def owner_of(self, file_path: str) -> Optional[str]:
+        return self._owners.get(file_path)
+
+    def discard(self, paths: Iterable[str]):
+        """文件从列表移除时同时移出租借表"""
+        for file_path in paths:
+            owner = self._owners.get(file_path)
+            if owner is not None:
+                self.release(owner, [file_path])
+
+    def clear(self):
+        self._owners.clear()
+        self._batches.clear()
+        self._expires.clear()
+
+
+class DatasetStore:
+    """进程内共享的数据集状态"""
+
+    def __init__(self, cache_bytes: int = DEFAULT_CACHE_BYTES, index_path: Optional[str] = DEFAULT_INDEX_PATH,
+                 lease_ttl: float = DEFAULT_LEASE_TTL, history_path: Optional[str] = DEFAULT_HISTORY_PATH):
+        """
+        初始化共享数据集
+
+        Args:
+            cache_bytes: 文本内容缓存的字节上限
+            index_path: 持久化索引数据库路径，为 None 时不使用索引
+            lease_ttl: 审阅批次的租期（秒）
+            history_path: 标注版本历史数据库路径，为 None 时不记录历史
+        """
+        self.file_contents = ContentCache(cache_bytes, on_dirty_change=self._on_dirty_change)  # 按需读取的文件内容缓存
+        self.file_table = FileTable()  # 已加载文件的列式信息表（大小、时间、文件名、配对图片等）
+        self.file_set = self.file_table  # 已加载文件路径索引，用于 O(1) 去重（支持 in / len / 遍历）
+        self.file_info = FileInfoView(self.file_table)  # 路径 -> 文件信息字典的只读视图
+        self.tag_stats = TagStatistics()  # 标签统计，随标签索引增量更新
+        self.tag_index = TagIndex(self.tag_stats, on_change=self._on_tags_change)  # 标签倒排索引，用于搜索
+        self.reviewed: set = set()  # 已审阅的文件（仅包含已加载的文件）
+        # 排序索引 -> 按该排序键有序的文件，首次使用某种排序时创建，之后随数据变化增量维护
+        self._sort_indexes: Dict[str, SortIndex] = {}
+        self._reorder_pending = False
+        self._image_size_pending: set = set()  # 等待读取尺寸的文件
+        self._image_size_running = False
+        self.duplicates = DuplicateDetector()  # 重复检测的哈希缓存和分组结果
+        self.files, self.file_positions = self._sort_index('load').view()  # 按加载顺序排列的文件和位置映射
+        self.saver = SavePipeline(self.file_contents)  # 异步原子保存
+        self.locks: Dict[str, str] = {}  # 有未保存修改的文件 -> 正在编辑它的会话
+        self.leases = LeaseTable(lease_ttl)  # 审阅批次
+        self.scanner: Optional[DatasetScanner] = None  # 正在进行的加载任务
+        self.watcher: Optional[FileWatcher] = None  # 监视已加载文件所在目录，首次加载时创建
+        self.dataset_roots: set = set()  # 以文件夹方式加载的数据集目录，其中新建的文件会自动加入列表
+        self.sources: Dict[str, Union[Manifest, DatasetArchive]] = {}  # 路径前缀 -> 不以独立文件保存标注的数据来源（清单、压缩包）
+        self.sessions: list = []  # 已连接的会话，数据变化时通知它们
+        self._external_pending: set = set()  # 等待处理的外部变化
+        self._external_full: bool = False  # 是否需要校验全部文件（监视事件丢失时）
+        self._external_running: bool = False
+        self._external_deferred: set = set()  # 正在保存的文件上的变化，保存完成后再处理
+        self._tasks: set = set()
+        self.index: Optional[DatasetIndex] = None  # 持久化索引，用于快速重新打开数据集
+        if index_path:
+            try:
+                self.index = DatasetIndex(index_path)
+            except Exception as e:
+                logger.warning('索引数据库打开失败: %s', e)
+        self.history: Optional[CaptionHistory] = None  # 标注版本历史，每次保存和快照都记录在这里
+        if history_path:
+            try:
+                self.history = CaptionHistory(history_path)
+            except Exception as e:
+                logger.warning('历史数据库打开失败: %s', e)
+
+    # ---------- 会话 ----------
+
+    def attach(self, session):
+        """会话连接：开始接收数据变化通知"""
+        if session not in self.sessions:
+            self.sessions.append(session)
+        if self.watcher is not None:
+            self.watcher.resume()
+
+    def detach(self, session):
+        """会话断开：不再通知，并释放它持有的编辑锁（未保存的修改保留在缓存中，租借的批次到期后收回）"""
+        if session in self.sessions:
+            self.sessions.remove(session)
+        released = [file_path for file_path, owner in self.locks.items() if owner == session.session_id]
+        for file_path in released:
+            del self.locks[file_path]
+        if released:
+            self.emit('_on_store_files_updated', released, None)
+        # 没有页面连接时暂停文件监视
+        if not self.sessions and self.watcher is not None:
+            self.watcher.stop()
+
+    def status(self) -> dict:
+        """数据集的当前规模（调试面板和 /api/metrics 使用）"""
+        return {
+            'files': len(self.file_set),
+            'cached': len(self.file_contents),
+            'cache_bytes': self.file_contents.clean_bytes,
+            'dirty': self.file_contents.dirty_count,
+            'conflicts': len(self.saver.conflicts),
+            'locks': len(self.locks),
+            'sessions': len(self.sessions),
+            'tagged': len(self.tag_index),
+            'sort_indexes': sorted(self._sort_indexes),
+        }
+
+    def emit(self, handler: str, *args):
+        """通知所有会话（某个会话处理失败不影响其他会话）"""
+        for session in list(self.sessions):
+            try:
+                getattr(session, handler)(*args)
+            except Exception as e:
+                logger.exception('会话更新失败: %s', e)
+
+    # ---------- 文件列表 ----------
+
+    def ordering(self, sort_by: str) -> Tuple[SortedFiles, FilePositions]:
+        """
+        返回按某种方式排序的文件列表和位置映射（只读视图）
+
+        同一排序索引的所有会话共用一份数据，文件加入、移除或排序键变化时索引增量更新，视图始终反映最新顺序；
+        未知的排序方式按加载顺序
+        """
+        name, reverse = SORT_KEYS.get(sort_by, SORT_KEYS['load'])
+        return self._sort_index(name).view(reverse)
+
+    def _sort_index(self, name: str) -> SortIndex:
+        index = self._sort_indexes.get(name)
+        if index is None:
+            index = SortIndex(self._sort_key(name))
+            with metrics.measure('sort_index_build'):
+                index.add_many(self.file_table)
+            self._sort_indexes[name] = index
+            if name == 'resolution':
+                self._request_image_sizes(self.file_table)
+        return index
+
+    def _sort_key(self, name: str):
+        """返回排序索引的排序键函数（只在文件加入或相关数据变化时调用一次）"""
+        table = self.file_table
+        if name == 'load':
+            return table.load_order
+        if name == 'time':
+            return table.created_time
+        if name == 'mtime':
+            return table.mtime
+        if name == 'size':
+            return table.size
+        if name == 'name':
+            return table.name
+        if name == 'natural':
+            return lambda file_path: natural_key(table.name(file_path))
+        if name == 'tags':
+            # 尚未读取内容的文件排在没有标签的文件之前
+            return lambda file_path: len(self.tag_index.tags_of(file_path)) if file_path in self.tag_index else -1
+        if name == 'reviewed':
+            return lambda file_path: file_path in self.reviewed
+        if name == 'dirty':
+            return lambda file_path: not self.file_contents.is_dirty(file_path)
+        if name == 'resolution':
+            # 尚未读取尺寸为 -1，没有配对图片为 0
+            return table.resolution
+        raise KeyError(name)
+
+    def _reindex(self, paths, names):
+        """排序键依赖的数据变化后更新相应文件的位置，顺序有变化时通知各会话刷新列表"""
+        moved = 0
+        for name in names:
+            index = self._sort_indexes.get(name)
+            if index is not None:
+                moved += index.update_many(paths)
+        if moved and not self._reorder_pending:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # 不在事件循环中（命令行和测试），调用方自行刷新
+                return
+            # 同一轮事件中的多次变化合并为一次通知
+            self._reorder_pending = True
+            loop.call_soon(self._notify_reordered)
+
+    def _notify_reordered(self):
+        self._reorder_pending = False
+        self.emit('_on_store_files_changed')
+
+    def _on_tags_change(self, file_path: str):
+        self._reindex((file_path,), ('tags',))
+
+    def _on_dirty_change(self, file_path: str):
+        self._reindex((file_path,), ('dirty',))
+
+    def add_entries(self, entries) -> int:
+        """把扫描或索引得到的条目加入文件列表，已存在的文件更新其信息，返回新增数量"""
+        added, updated = [], []
+        for entry in entries:
+            file_path = entry['path']
+            # 索引中未变化的条目打开数据集时已经加入
+            if entry.get('unchanged') and file_path in self.file_set:
+                continue
+            if self.file_table.add(file_path):
+                added.append(file_path)
+            else:
+                updated.append(file_path)
+            # 存储文件信息，包括大小和时间，索引条目还包括配对图片
+            self.file_table.set_info(file_path, entry)
+            if 'content' in entry:
+                self.file_contents.put(file_path, entry['content'])
+                self.tag_index.update(file_path, entry['content'])
+        # 文件信息和标签都写入后再计算排序键
+        for index in self._sort_indexes.values():
+            index.add_many(added)
+        self._reindex(updated, INFO_SORT_INDEXES)
+        if 'resolution' in self._sort_indexes:
+            self._request_image_sizes(added)
+        return len(added)
+
+    def remove_files(self, paths):
+        """从列表中移除一批文件"""
+        paths = {file_path for file_path in paths if file_path in self.file_set}
+        if not paths:
+            return
+        for index in self._sort_indexes.values():
+            index.discard_many(paths)
+        for file_path in paths:
+            self.file_table.discard(file_path)
+            self.saver.discard(file_path)
+            self.reviewed.discard(file_path)
+            self.file_contents.discard(file_path)
+            self.tag_index.remove(file_path)
+            self.locks.pop(file_path, None)
+            self._image_size_pending.discard(file_path)
+        self.duplicates.discard(paths)
+        self.leases.discard(paths)
+
+    def clear(self):
+        """清空数据集"""
+        if self.scanner is not None:
+            self.scanner.cancel()
+        if self.watcher is not None:
+            self.watcher.clear()
+        # 排序索引只清空不删除，各会话持有的视图继续有效
+        for index in self._sort_indexes.values():
+            index.clear()
+        self._image_size_pending.clear()
+        self.duplicates.clear()
+        self.file_table.clear()
+        self.saver.clear()
+        self.reviewed.clear()
+        self.tag_index.clear()
+        self.file_contents.clear()
+        self.locks.clear()
+        self.leases.clear()
+        self.dataset_roots.clear()
+        for source in self.sources.values():
+            source.close()
+        self.sources.clear()
+        self._external_pending.clear()
+        self._external_deferred.clear()
+        self._external_full = False
+
+    async def load_indexed_tags(self, paths):
+        """
+        从索引中分批读取标注内容，只用于建立标签索引，不放入内容缓存
+
+        Args:
+            paths: 已加入列表的文件；已有未保存修改的文件跳过
+        """
+        if self.index is None:
+            return
+        loop = asyncio.get_event_loop()
+        batches = self.index.iter_contents(paths)
+        while True:
+            rows = await loop.run_in_executor(None, next, batches, None)
+            if rows is None:
+                break
+            for file_path, content in rows:
+                if file_path in self.file_set and not self.file_contents.is_dirty(file_path):
+                    self.tag_index.update(file_path, content)
+
+    def scan_reader(self, known: Optional[dict]):
+        """返回扫描时读取单个文件的函数：有索引时读取并校验完整条目，否则只读取元数据"""
+        if self.index is None:
+            return stat_txt_file
+        return functools.partial(index_txt_file, known=known)
+
+    def source_of(self, file_path: str) -> Optional[Union[Manifest, DatasetArchive]]:
+        """返回文件所属的数据来源（清单或压缩包），独立的 TXT 文件返回 None"""
+        for prefix, source in self.sources.items():
+            if file_path.startswith(prefix):
+                return source
+        return None
+
+    def read_caption(self, file_path: str) -> str:
+        """从磁盘或所属的清单、压缩包读取标注（不经过缓存，可在后台线程调用）"""
+        source = self.source_of(file_path)
+        if source is not None:
+            return source.read(file_path)
+        return read_txt_content(file_path)
+
+    def refresh_entries(self, paths) -> List[dict]:
+        """重新读取文件条目并写入索引（不访问界面，可在后台线程调用）；清单和压缩包中的条目总是包含内容，不写入索引"""
+        reader = index_txt_file if self.index else stat_txt_file
+        entries, indexed = [], []
+        for file_path in paths:
+            source = self.source_of(file_path)
+            try:
+                if source is not None:
+                    entries.append(source.entry(file_path))
+                else:
+                    entry = reader(file_path)
+                    entries.append(entry)
+                    indexed.append(entry)
+            except Exception as e:
+                logger.warning('索引更新失败: %s', e)
+        if self.index:
+            self.index.upsert(indexed)
+        return entries
+
+    def apply_entries(self, entries: List[dict]):
+        """用刷新后的条目更新文件信息"""
+        paths = []
+        for entry in entries:
+            if entry['path'] in self.file_set:
+                self.file_table.set_info(entry['path'], entry)
+                paths.append(entry['path'])
+        self._reindex(paths, INFO_SORT_INDEXES)
+
+    def read_changed_entries(self, paths) -> List[dict]:
+        """重新读取被修改的文件，条目中总是包含内容（可在后台线程调用）"""
+        entries = self.refresh_entries(paths)
+        for entry in entries:
+            if 'content' not in entry:
+                try:
+                    entry['content'] = read_txt_content(entry['path'])
+                except Exception as e:
+                    logger.warning('读取文件失败: %s', e)
+        return entries
+
+    async def save_files(self, paths, origin=None, force: bool = False, kind: str = 'save') -> Tuple[list, list]:
+        """
+        在后台原子写入一批文件，并同步搜索索引、文件信息、编辑锁和所有页面
+
+        写入前按文件信息中的大小和修改时间确认磁盘上的文件未被其他程序修改，
+        不一致的文件不会写入，而是标记为冲突（force 为 True 时直接覆盖）；
+        写入前后的内容都记录到版本历史中
+
+        Args:
+            paths: 要保存的文件
+            origin: 发起保存的页面，None 表示来自接口或后台
+            force: 忽略冲突，直接覆盖
+            kind: 版本历史中的版本类型
+
+        Returns:
+            (已保存的 [(路径, 内容)], 失败的 [(路径, 错误信息)])，冲突的错误信息为冲突原因
+        """
+        paths = list(paths)
+        expected = {}
+        file_paths, sourced = [], {}
+        for file_path in paths:
+            source = self.source_of(file_path)
+            if source is not None:
+                sourced.setdefault(source, []).append(file_path)
+                continue
+            file_paths.append(file_path)
+            info = self.file_info.get(file_path)
+            if info and 'size' in info and 'mtime' in info:
+                expected[file_path] = (info['size'], info['mtime'])
+        loop = asyncio.get_event_loop()
+        if self.history:
+            # 首次保存或被其他程序修改过的文件，先记录磁盘上的原内容，之后可以回滚到它
+            await loop.run_in_executor(None, self.record_baseline, paths)
+        saved, errors = await self.saver.save(file_paths, expected=expected, force=force)
+        for source, source_paths in sourced.items():
+            source_saved, source_errors = await self._save_to_source(source, source_paths, force)
+            saved.extend(source_saved)
+            errors.extend(source_errors)
+        for file_path, content in saved:
+            self.tag_index.update(file_path, content)
+            # 立即记录写入后的大小和修改时间，避免把自己的写入当作外部修改
+            if file_path in expected and file_path in self.file_set:
+                self.file_table.update_info(file_path, *expected[file_path])
+        if self.history and saved:
+            await loop.run_in_executor(None, self.record_history, saved, kind)
+        entries = await loop.run_in_executor(None, self.refresh_entries, [file_path for file_path, _ in saved])
+        self.apply_entries(entries)
+        self.unlock_saved(file_path for file_path, _ in saved)
+        self.emit('_on_store_files_updated', paths, origin)
+        # 保存期间推迟处理的外部变化
+        self.resume_deferred_changes()
+        return saved, errors
+
+    async def _save_to_source(self, source: Union[Manifest, DatasetArchive], paths, force: bool) -> Tuple[list, list]:
+        """
+        把一批修改一次写回所属的清单或压缩包的覆盖文件（整个文件只重写一次）
+
+        磁盘上的标注在读取后被其他程序修改时，该标注标记为冲突而不写入（force 为 True 时直接覆盖）
+        """
+        saver = self.saver
+        contents, errors = {}, []
+        for file_path in paths:
+            if force:
+                saver.conflicts.pop(file_path, None)
+            elif file_path in saver.conflicts:
+                errors.append((file_path, saver.conflicts[file_path]))
+                continue
+            content = self.file_contents.get(file_path)
+            if content is not None:
+                contents[file_path] = content
+        if not contents:
+            return [], errors
+        saver.saving.update(contents)
+        try:
+            conflicts = await asyncio.get_event_loop().run_in_executor(saver.executor, source.write, contents, force)
+        except SaveConflict as e:
+            for file_path in contents:
+                saver.conflicts[file_path] = e.reason
+            return [], errors + [(file_path, e.reason) for file_path in contents]
+        except Exception as e:
+            for file_path in contents:
+                saver.errors[file_path] = str(e)
+            return [], errors + [(file_path, str(e)) for file_path in contents]
+        finally:
+            saver.saving.difference_update(contents)
+        saved = []
+        for file_path, content in contents.items():
+            if file_path in conflicts:
+                saver.conflicts[file_path] = conflicts[file_path]
+                errors.append((file_path, conflicts[file_path]))
+                continue
+            saver.errors.pop(file_path, None)
+            # 写入期间内容未再修改时才标记为已保存
+            if self.file_contents.get(file_path) == content:
+                self.file_contents.mark_clean(file_path)
+            saved.append((file_path, content))
+        return saved, errors
+
+    # ---------- 版本历史 ----------
+
+    def record_history(self, items, kind: str, label: Optional[str] = None, always: bool = False) -> Optional[int]:
+        """把一批 (路径, 内容) 记录到版本历史（可在后台线程调用，记录失败不影响保存），返回新版本号"""
+        if self.history is None:
+            return None
+        try:
+            return self.history.record(items, kind, label, always)
+        except Exception as e:
+            logger.warning('历史记录失败: %s', e)
+            return None
+
+    def record_baseline(self, paths) -> Optional[int]:
+        """记录磁盘上的当前内容，与最新版本相同的文件不会重复记录（可在后台线程调用）"""
+        return self.record_history(self._iter_captions(paths), 'baseline')
+
+    def _iter_captions(self, paths):
+        """逐个读取磁盘上的标注，读取失败（例如已被删除）的文件跳过"""
+        for file_path in paths:
+            try:
+                yield file_path, self.read_caption(file_path)
+            except Exception:
+                continue
+
+    async def create_snapshot(self, label: str = '') -> Optional[int]:
+        """
+        为已加载的所有文件创建快照（磁盘上的内容，不包括未保存的修改）
+
+        与最新版本相同的文件不占用空间，只有首次记录或在历史之外被修改的文件会写入
+
+        Returns:
+            快照的版本号，没有历史数据库或记录失败时返回 None
+        """
+        paths = list(self.files)
+        with metrics.measure('history_snapshot'):
+            return await asyncio.get_event_loop().run_in_executor(None, functools.partial(
+                self.record_history, self._iter_captions(paths), 'snapshot', label or None, always=True
+            ))
+
+    async def history_diff(self, old: int, new: Optional[int] = None) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        """比较两个版本中已加载的文件（见 CaptionHistory.diff），new 为 None 时与最新版本比较"""
+        with metrics.measure('history_diff'):
+            return await asyncio.get_event_loop().run_in_executor(None, self.history.diff, old, new, self.file_set)
+
+    async def rollback(self, revision: int, paths=None, owner: Optional[str] = None) -> Tuple[list, list, list]:
+        """
+        把文件恢复为某个版本时的内容并保存；回滚也作为一个版本记录，可以再回滚回来
+
+        Args:
+            revision: 目标版本号
+            paths: 要恢复的文件，None 表示该版本之后发生过变化的所有已加载文件
+            owner: 发起回滚的会话，被其他会话锁定编辑的文件不会恢复
+
+        Returns:
+            (已保存的 [(路径, 内容)], 失败的 [(路径, 错误信息)], 跳过的 [(路径, 原因)])，
+            跳过的原因为 'missing'（该版本时没有记录）或 'locked'
+        """
+        loop = asyncio.get_event_loop()
+        if paths is None:
+            changes = await loop.run_in_executor(None, self.history.diff, revision, None, self.file_set)
+            targets = {file_path: content for file_path, content, _ in changes}
+        else:
+            paths = [file_path for file_path in paths if file_path in self.file_set]
+            targets = await loop.run_in_executor(None, self.history.contents_at, paths, revision)
+        pending, skipped = [], []
+        for file_path, content in targets.items():
+            if file_path not in self.file_set:
+                continue
+            holder = self.locks.get(file_path)
+            if content is None:
+                skipped.append((file_path, 'missing'))
+            elif holder is not None and holder != owner:
+                skipped.append((file_path, 'locked'))
+            else:
+                if owner is not None:
+                    self.lock(file_path, owner)
+                self.file_contents.set_dirty(file_path, content)
+                self.tag_index.update(file_path, content)
+                pending.append(file_path)
+        if not pending:
+            return [], [], skipped
+        # origin 为 None：包括发起回滚的页面在内，所有页面都刷新编辑框
+        saved, errors = await self.save_files(pending, kind='rollback')
+        return saved, errors, skipped
+
+    # ---------- 清单 ----------
+
+    async def load_manifest(self, path: str, on_progress=None) -> int:
+        """
+        从 JSONL 或 Parquet 清单加载数据集：逐块读取并加入列表，每一行对应列表中的一个文件
+
+        再次加载同一个清单时刷新其中的行（有未保存修改的行保留修改）
+
+        Args:
+            path: 清单路径
+            on_progress: 每加入一块后调用，参数为 (已加载行数, 已读取的比例)
+
+        Returns:
+            加载的行数
+        """
+        with metrics.measure('manifest_load'):
+            return await self._load_source(Manifest(path), MANIFEST_CHUNK, on_progress)
+
+    async def load_archive(self, path: str, on_progress=None) -> int:
+        """
+        不解压直接从 zip / tar 压缩包加载数据集：读取（或建立）成员索引后逐块加入列表，标注在使用时才读取
+
+        Args:
+            path: 压缩包路径
+            on_progress: 每加入一块后调用，参数为 (已加载文件数, 已处理的比例)
+
+        Returns:
+            加载的文件数
+        """
+        with metrics.measure('archive_load'):
+            return await self._load_source(DatasetArchive(path), ARCHIVE_CHUNK, on_progress)
+
+    async def _load_source(self, source: Union[Manifest, DatasetArchive], chunk_size: int, on_progress) -> int:
+        """逐块加载清单或压缩包中的条目，并移除上次加载后已不存在的条目"""
+        loop = asyncio.get_event_loop()
+        previous = self.sources.get(source.prefix)
+        if previous is not None:
+            previous.close()
+        self.sources[source.prefix] = source
+        chunks = source.iter_entries(chunk_size)
+        loaded = []
+        while True:
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+            if chunk is None:
+                break
+            entries, fraction = chunk
+            self.add_entries(entries)
+            loaded.extend(entry['path'] for entry in entries)
+            if on_progress is not None:
+                on_progress(len(loaded), fraction)
+            self.emit('_on_store_files_changed')
+        # 再次加载时移除已不存在的条目
+        seen = set(loaded)
+        stale = [file_path for file_path in self.file_set if file_path.startswith(source.prefix) and file_path not in seen]
+        if stale:
+            self.remove_files(stale)
+            self.emit('_on_store_files_changed')
+        if self.index:
+            self.add_reviewed(await loop.run_in_executor(None, self.index.reviewed_in, loaded))
+            self.emit('_on_store_files_changed')
+        return len(loaded)
+
+    def resolve_image(self, image_path: str) -> Optional[str]:
+        """
+        返回可以按文件读取的图片路径（可在后台线程调用）：压缩包中的图片先解出到缓存目录
+
+        Returns:
+            图片文件路径；压缩包中的图片无法读取时返回 None
+        """
+        source = self.source_of(image_path)
+        if isinstance(source, DatasetArchive):
+            return source.extract(image_path)
+        return image_path
+
+    def _read_export_rows(self, items) -> Tuple[List[dict], List[Tuple[str, str]]]:
+        """
+        读取一批待导出文件的标注和配对图片（可在后台线程调用）
+
+        Args:
+            items: [(路径, 缓存中的内容或 None, 已知的配对图片或 None, 原始路径)]
+
+        Returns:
+            (清单行, [(路径, 错误信息)])
+        """
+        rows, errors = [], []
+        for file_path, content, image_path, source_path in items:
+            try:
+                if content is None:
+                    content = self.read_caption(file_path)
+                if image_path is None:
+                    image_path = find_paired_image(file_path) or ''
+            except Exception as e:
+                errors.append((file_path, str(e)))
+                continue
+            rows.append({'path': source_path, 'image': image_path or None, 'caption': content})
+        return rows, errors
+
+    async def export_manifest(self, path: str, paths, fmt: Optional[str] = None,
+                              on_progress=None) -> Tuple[int, List[Tuple[str, str]]]:
+        """
+        把文件按给定顺序导出为清单（包括未保存的修改），逐块读取和写入，不在内存中构造整个清单
+
+        Args:
+            path: 清单路径
+            paths: 要导出的文件
+            fmt: 'jsonl' 或 'parquet'，None 时按扩展名判断
+            on_progress: 每写入一块后调用，参数为 (已处理数, 总数)
+
+        Returns:
+            (写入的行数, 读取失败的 [(路径, 错误信息)])
+        """
+        loop = asyncio.get_event_loop()
+        paths = list(paths)
+        writer = await loop.run_in_executor(None, ManifestWriter, path, fmt)
+        errors = []
+        try:
+            with metrics.measure('manifest_export'):
+                for start in range(0, len(paths), MANIFEST_CHUNK):
+                    items = []
+                    for file_path in paths[start:start + MANIFEST_CHUNK]:
+                        if file_path not in self.file_set:
+                            continue
+                        items.append((
+                            file_path,
+                            self.file_contents.get(file_path),
+                            self.file_table.image_path(file_path),
+                            self.file_table.source_path(file_path) if self.source_of(file_path) else file_path,
+                        ))
+                    rows, chunk_errors = await loop.run_in_executor(None, self._read_export_rows, items)
+                    errors.extend(chunk_errors)
+                    await loop.run_in_executor(None, writer.write, rows)
+                    if on_progress is not None:
+                        on_progress(min(start + MANIFEST_CHUNK, len(paths)), len(paths))
+                await loop.run_in_executor(None, writer.close)
+        except BaseException:
+            await loop.run_in_executor(None, writer.abort)
+            raise
+        return writer.rows, errors
+
+    # ---------- 审阅与编辑锁 ----------
+
+    def set_reviewed(self, paths, reviewed: bool):
+        """设置已审阅标记并持久化"""
+        paths = list(paths)
+        if reviewed:
+            self.reviewed.update(paths)
+        else:
+            self.reviewed.difference_update(paths)
+        self._reindex(paths, ('reviewed',))
+        if self.index:
+            self.index.set_reviewed(paths, reviewed)
+
+    def add_reviewed(self, paths):
+        """恢复索引中记录的已审阅标记（不写回索引）"""
+        paths = [file_path for file_path in paths if file_path in self.file_set]
+        self.reviewed.update(paths)
+        self._reindex(paths, ('reviewed',))
+
+    def lock(self, file_path: str, owner: str) -> bool:
+        """为会话锁定文件以便编辑，已被其他会话锁定时返回 False"""
+        holder = self.locks.get(file_path)
+        if holder is not None and holder != owner:
+            return False
+        self.locks[file_path] = owner
+        return True
+
+    def unlock_saved(self, paths):
+        """已保存（没有未保存修改）的文件解除锁定"""
+        for file_path in paths:
+            if not self.file_contents.is_dirty(file_path):
+                self.locks.pop(file_path, None)
+
+    def lease_batch(self, owner: str, count: int) -> List[str]:
+        """归还审阅者当前的批次，并按加载顺序租借下一批未审阅的文件"""
+        self.leases.release(owner)
+        return self.leases.acquire(
+            owner, (file_path for file_path in self.files if file_path not in self.reviewed), count
+        )
+
+    # ---------- 图片尺寸 ----------
+
+    def _request_image_sizes(self, paths):
+        """在后台读取配对图片的尺寸（按分辨率排序时才需要）"""
+        self._image_size_pending.update(
+            file_path for file_path in paths if not self.file_table.has_resolution(file_path)
+        )
+        if not self._image_size_pending or self._image_size_running:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._image_size_running = True
+        task = loop.create_task(self._process_image_sizes())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _read_image_sizes(self, items) -> Dict[str, Optional[Tuple[int, int]]]:
+        """读取一批图片的尺寸（可在后台线程调用），items 为 [(TXT 路径, 已知的图片路径或 None)]"""
+        sizes = {}
+        for file_path, image_path in items:
+            if image_path is None:
+                image_path = find_paired_image(file_path)
+            if image_path:
+                image_path = self.resolve_image(image_path)
+            sizes[file_path] = read_image_size(image_path) if image_path else None
+        return sizes
+
+    async def _process_image_sizes(self):
+        """分批读取等待中的图片尺寸，每批读完后更新分辨率排序"""
+        loop = asyncio.get_event_loop()
+        try:
+            while self._image_size_pending:
+                paths = [self._image_size_pending.pop()
+                         for _ in range(min(IMAGE_SIZE_BATCH, len(self._image_size_pending)))]
+                # 索引中已记录配对图片时不再查找（'' 表示没有图片）
+                items = [
+                    (file_path, self.file_table.image_path(file_path)) for file_path in paths if file_path in self.file_set
+                ]
+                chunks = [items[i::8] for i in range(min(8, len(items)))]
+                results = await asyncio.gather(
+                    *(loop.run_in_executor(None, self._read_image_sizes, chunk) for chunk in chunks)
+                )
+                sizes = {
+                    file_path: size for result in results for file_path, size in result.items()
+                    if file_path in self.file_set
+                }
+                for file_path, size in sizes.items():
+                    self.file_table.set_resolution(file_path, size)
+                self._reindex(sizes, ('resolution',))
+        except Exception as e:
+            logger.warning('读取图片尺寸失败: %s', e)
+        finally:
+            self._image_size_running = False
+
+    # ---------- 重复检测 ----------
+
+    def find_duplicates(self, similarity: float = DEFAULT_SIMILARITY,
+                        image_distance: int = DEFAULT_IMAGE_DISTANCE) -> bool:
+        """
+        在后台检测重复和近似重复的文件，完成后结果在 duplicates.clusters 中
+
+        Args:
+            similarity: 近似标注的 Jaccard 相似度下限
+            image_distance: 近似图片的感知哈希汉明距离上限
+
+        Returns:
+            是否开始了新的检测（已有检测在进行时返回 False）
+        """
+        if self.duplicates.running:
+            return False
+        self.duplicates.running = True
+        self.duplicates.version += 1
+        task = asyncio.get_event_loop().create_task(self._process_duplicates(similarity, image_distance))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _process_duplicates(self, similarity: float, image_distance: int):
+        """分批计算哈希（未变化的文件复用缓存），全部完成后分组"""
+        loop = asyncio.get_event_loop()
+        detector = self.duplicates
+        generation = detector.generation
+        try:
+            with metrics.measure('duplicates'):
+                paths = list(self.files)
+                detector.progress = (0, len(paths))
+                for start in range(0, len(paths), HASH_BATCH):
+                    items = []
+                    for file_path in paths[start:start + HASH_BATCH]:
+                        # 清单中的行没有独立的文件，不参与检测
+                        if file_path not in self.file_set or self.source_of(file_path) is not None:
+                            continue
+                        # 有未保存修改的文件按修改后的内容计算
+                        content = self.file_contents.get(file_path) if self.file_contents.is_dirty(file_path) else None
+                        items.append((file_path, content, self.file_table.image_path(file_path)))
+                    known = {}
+                    if self.index:
+                        known = await loop.run_in_executor(
+                            None, self.index.lookup_hashes,
+                            [file_path for file_path, _, _ in items if file_path not in detector.records]
+                        )
+                    records = await loop.run_in_executor(None, detector.hash_batch, items, known)
+                    if detector.generation != generation:
+                        return
+                    changed = []
+                    for record in records:
+                        file_path = record['path']
+                        if file_path not in self.file_set:
+                            continue
+                        previous = detector.records.get(file_path) or known.get(file_path)
+                        if not record.get('dirty') and record != previous:
+                            changed.append(record)
+                        detector.records[file_path] = record
+                    if self.index and changed:
+                        await loop.run_in_executor(None, self.index.upsert_hashes, changed)
+                    detector.progress = (min(start + HASH_BATCH, len(paths)), len(paths))
+                    detector.version += 1
+                records = {file_path: record for file_path, record in detector.records.items() if file_path in self.file_set}
+                order = {file_path: self.file_table.load_order(file_path) for file_path in records}
+                clusters = await loop.run_in_executor(
+                    None, find_clusters, records, order, similarity, image_distance
+                )
+            if detector.generation != generation:
+                return
+            detector.clusters = clusters
+            self.emit('_on_store_notice', 'dup_done', (len(clusters),), 'info')
+        except Exception as e:
+            logger.exception('重复检测失败: %s', e)
+            self.emit('_on_store_notice', 'dup_failed', (e,), 'negative')
+        finally:
+            detector.running = False
+            detector.version += 1
+
+    def remove_duplicates(self, clusters) -> Tuple[List[str], List[str]]:
+        """
+        从列表中移除重复组中除第一个文件以外的文件（不删除磁盘上的文件）
+
+        Returns:
+            (已移除的文件, 因有未保存修改而保留的文件)
+        """
+        removed, kept = [], []
+        for cluster in clusters:
+            members = [file_path for file_path in cluster['paths'] if file_path in self.file_set]
+            for file_path in members[1:]:
+                (kept if self.file_contents.is_dirty(file_path) else removed).append(file_path)
+        removed = list(dict.fromkeys(removed))
+        if removed:
+            self.remove_files(removed)
+            self.emit('_on_store_files_changed')
+        return removed, kept
+
+    # ---------- 外部修改 ----------
+
+    def watch_directories(self, directories):
+        """监视已加载文件所在的目录（首次调用时创建监视器）"""
+        if not directories:
+            return
+        if self.watcher is None:
+            loop = asyncio.get_event_loop()
+            self.watcher = FileWatcher(
+                on_change=lambda paths: loop.call_soon_threadsafe(self.on_external_change, paths)
+            )
+        self.watcher.watch(directories)
+
+    def on_external_change(self, paths):
+        """合并监视到的变化（paths 为 None 表示需要校验全部文件），在后台依次处理"""
+        if paths is None:
+            self._external_full = True
+        else:
+            self._external_pending |= paths
+        if not self._external_running:
+            self._external_running = True
+            task = asyncio.get_event_loop().create_task(self._process_external_changes())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def resume_deferred_changes(self):
+        """保存完成后处理保存期间推迟的外部变化"""
+        deferred = self._external_deferred - self.saver.saving
+        if deferred:
+            self._external_deferred -= deferred
+            self.on_external_change(deferred)
+
+    async def _process_external_changes(self):
+        """处理积累的外部变化，处理期间新到的变化在下一轮处理"""
+        try:
+            while self._external_pending or self._external_full:
+                paths, full = self._external_pending, self._external_full
+                self._external_pending, self._external_full = set(), False
+                await self._apply_external_changes(paths, full)
+        except Exception as e:
+            logger.exception('外部修改处理失败: %s', e)
+        finally:
+            self._external_running = False
+
+    def _is_in_dataset(self, file_path: str) -> bool:
+        """文件是否位于以文件夹方式加载的数据集中"""
+        return any(file_path.startswith(root) for root in self.dataset_roots)
+
+    @staticmethod
+    def _check_external_changes(paths, expected: dict, directories) -> Tuple[list, list, list]:
+        """
+        对比磁盘上的文件与已知的大小和修改时间（可在后台线程调用）
+
+        Args:
+            paths: 发生变化的文件
+            expected: 已加载的文件 -> (大小, 修改时间)
+            directories: 需要完整校验时列出其中所有 TXT 文件的目录
+
+        Returns:
+            (已修改的文件, 已删除的文件, 新建的文件)
+        """
+        paths = set(paths)
+        for directory in directories:
+            try:
+                with os.scandir(directory) as it:
+                    paths.update(entry.path for entry in it if entry.name.lower().endswith('.txt'))
+            except OSError:
+                pass
+        changed, deleted, created = [], [], []
+        for file_path in paths:
+            try:
+                file_stat = os.stat(file_path)
+            except FileNotFoundError:
+                if file_path in expected:
+                    deleted.append(file_path)
+                continue
+            except OSError:
+                continue
+            if file_path not in expected:
+                created.append(file_path)
+            elif expected[file_path] != (file_stat.st_size, file_stat.st_mtime):
+                changed.append(file_path)
+        return changed, deleted, created
+
+    def _read_new_entries(self, reader, paths) -> List[dict]:
+        """读取外部新建的文件并写入索引（可在后台线程调用）"""
+        entries = []
+        for file_path in paths:
+            try:
+                entries.append(reader(file_path))
+            except Exception as e:
+                logger.warning('读取文件失败: %s', e)
+        if self.index:
+            self.index.upsert(entries)
+        return entries
+
+    async def _apply_external_changes(self, paths, full: bool):
+        """
+        按变化的文件增量更新列表、文件信息、缓存和搜索索引
+
+        没有未保存修改的文件直接重新加载或移除；有未保存修改的文件标记为冲突，保存时由用户确认
+        """
+        loop = asyncio.get_event_loop()
+        if full:
+            paths = set(paths).union(self.file_set)
+        # 正在保存的文件等保存完成后再处理，避免把自己的写入当作外部修改
+        saving = {file_path for file_path in paths if file_path in self.saver.saving}
+        self._external_deferred |= saving
+        paths = [file_path for file_path in paths if file_path not in saving]
+        expected = {}
+        for file_path in paths:
+            info = self.file_info.get(file_path) if file_path in self.file_set else None
+            if info is not None:
+                expected[file_path] = (info.get('size'), info.get('mtime'))
+        directories = self.watcher.directories if full and self.watcher is not None else ()
+        changed, deleted, created = await loop.run_in_executor(
+            None, self._check_external_changes, paths, expected, directories
+        )
+        # 检查期间文件可能已被移除
+        changed = [file_path for file_path in changed if file_path in self.file_set]
+        deleted = [file_path for file_path in deleted if file_path in self.file_set]
+        created = [file_path for file_path in created if file_path not in self.file_set and self._is_in_dataset(file_path)]
+
+        conflicts = []
+        reload, remove = [], []
+        for file_path in changed:
+            if self.file_contents.is_dirty(file_path):
+                conflicts.append(file_path)
+                self.saver.mark_conflict(file_path, 'modified')
+            else:
+                reload.append(file_path)
+        for file_path in deleted:
+            if self.file_contents.is_dirty(file_path):
+                conflicts.append(file_path)
+                self.saver.mark_conflict(file_path, 'deleted')
+            else:
+                remove.append(file_path)
+
+        reloaded = []
+        if reload:
+            entries = await loop.run_in_executor(None, self.read_changed_entries, reload)
+            self.apply_entries(entries)
+            for entry in entries:
+                file_path = entry['path']
+                # 重新读取期间开始编辑的文件保留编辑内容，保存时再检查冲突
+                if 'content' not in entry or file_path not in self.file_set or self.file_contents.is_dirty(file_path):
+                    continue
+                self.file_contents.put(file_path, entry['content'])
+                self.tag_index.update(file_path, entry['content'])
+                reloaded.append(file_path)
+        if remove:
+            self.remove_files(remove)
+            if self.index:
+                await loop.run_in_executor(None, self.index.remove, remove)
+        if created:
+            entries = await loop.run_in_executor(None, self._read_new_entries, self.scan_reader(None), created)
+            self.add_entries(entries)
+
+        if remove or created:
+            self.emit('_on_store_files_changed')
+        if reloaded or conflicts:
+            self.emit('_on_store_files_updated', reloaded + conflicts, None)
+        if reload or remove or created:
+            self.emit('_on_store_notice', 'external_summary', (len(reload), len(created), len(remove)), 'info')
+        if conflicts:
+            self.emit('_on_store_notice', 'external_conflict', (len(conflicts),), 'warning')
@@ -0,0 +1,352 @@
+"""
+重复检测
+为已加载的 TXT 和配对图片计算哈希，找出重复和近似重复的文件并分组：
+
+    caption_exact   标注完全相同（首尾空白不计）
+    caption_near    标注近似相同：按片段的 MinHash 签名经 LSH 分桶找出候选，再按估计的 Jaccard 相似度确认
+    image_exact     配对图片的文件内容完全相同
+    image_near      配对图片的感知哈希（dHash）汉明距离不超过阈值
+
+哈希结果按 路径 + 修改时间 + 大小 缓存（内存中，有持久化索引时同时写入索引），再次检测时只处理新增或变化的文件
+
+感知哈希依赖 Pillow；未安装时只比较图片的文件内容
+"""
+
+import functools
+import hashlib
+import logging
+import os
+import re
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dataset_scan import find_paired_image, read_txt_content
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 为可选依赖
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64  # MinHash 签名长度（32 位整数的个数）
+LSH_BANDS = 16  # LSH 分段数，每段 NUM_PERM // LSH_BANDS 个值（相似度约 0.5 以上的文本大概率成为候选）
+SHINGLE_SIZE = 3  # 长片段按几个词一组切分
+DEFAULT_SIMILARITY = 0.8  # 近似标注的 Jaccard 相似度下限
+DEFAULT_IMAGE_DISTANCE = 6  # 近似图片的感知哈希汉明距离上限
+HASH_BATCH = 512  # 每批计算的文件数
+
+CLUSTER_KINDS = ('caption_exact', 'caption_near', 'image_exact', 'image_near')
+HASH_FIELDS = (
+    'path', 'mtime', 'size', 'caption_hash', 'signature',
+    'image_path', 'image_mtime', 'image_size', 'image_hash', 'phash'
+)
+
+_WORDS = re.compile(r'\w+')
+_SEGMENTS = re.compile(r'[,\n]')
+
+
+def caption_features(content: str) -> set:
+    """
+    标注的特征集合
+
+    按逗号和换行切分为片段：短片段（标签）整体作为一个特征，顺序不影响相似度；
+    长片段（句子）按 SHINGLE_SIZE 个词一组滑动切分
+    """
+    features = set()
+    for segment in _SEGMENTS.split(content.lower()):
+        words = _WORDS.findall(segment)
+        if len(words) <= SHINGLE_SIZE:
+            if words:
+                features.add(' '.join(words))
+            continue
+        features.update(' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1))
+    return features
+
+
+@functools.lru_cache(maxsize=1 << 15)
+def _feature_hashes(feature: str) -> array:
+    """
+    用一次 SHAKE-128 为特征生成 NUM_PERM 个 32 位哈希值（相当于 NUM_PERM 个独立的哈希函数）
+
+    标签在数据集中大量重复，结果按特征缓存
+    """
+    values = array('I')
+    values.frombytes(hashlib.shake_128(feature.encode('utf-8')).digest(NUM_PERM * 4))
+    return values
+
+
+def minhash(features: Iterable[str]) -> Optional[bytes]:
+    """计算特征集合的 MinHash 签名，没有特征时返回 None（逐位取最小值在 zip / min 中完成）"""
+    columns = [_feature_hashes(feature) for feature in features]
+    if not columns:
+        return None
+    return array('I', map(min, zip(*columns))).tobytes()
+
+
+def signature_similarity(a: bytes, b: bytes) -> float:
+    """两个 MinHash 签名估计的 Jaccard 相似度"""
+    values_a, values_b = memoryview(a).cast('I'), memoryview(b).cast('I')
+    return sum(x == y for x, y in zip(values_a, values_b)) / NUM_PERM
+
+
+def caption_hash(content: str) -> str:
+    """标注的精确哈希（首尾空白不计）"""
+    return hashlib.blake2b(content.strip().encode('utf-8'), digest_size=16).hexdigest()
+
+
+def file_hash(file_path: str) -> str:
+    """文件内容哈希（分块读取）"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def image_dhash(image_path: str) -> Optional[str]:
+    """
+    计算图片的差异哈希（dHash）：缩小为 9 × 8 的灰度图，逐行比较相邻像素的亮度
+
+    Returns:
+        16 位十六进制字符串；无法读取或未安装 Pillow 时返回 None
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(image_path) as image:
+            # JPEG 可以在解码时直接缩小
+            image.draft('L', (64, 64))
+            pixels = list(image.convert('L').resize((9, 8), Image.BILINEAR).getdata())
+    except Exception:
+        return None
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] < pixels[row * 9 + col + 1])
+    return f'{bits:016x}'
+
+
+def hash_pair(file_path: str, cached: Optional[dict] = None, content: Optional[str] = None,
+              image_path: Optional[str] = None) -> dict:
+    """
+    计算单个 TXT 及其配对图片的哈希（可在后台线程调用）
+
+    Args:
+        file_path: TXT 文件路径
+        cached: 之前的结果，TXT 或图片的修改时间和大小都未变化时复用对应部分
+        content: 未保存的修改内容，传入时按此内容计算标注哈希（结果不应写入缓存）
+        image_path: 已知的配对图片（'' 表示没有图片），None 时按文件名查找
+
+    Returns:
+        哈希记录，字段见 HASH_FIELDS；TXT 无法读取时抛出 OSError
+    """
+    file_stat = os.stat(file_path)
+    record = dict.fromkeys(HASH_FIELDS)
+    record.update(path=file_path, mtime=file_stat.st_mtime, size=file_stat.st_size)
+    if content is None and cached and (cached['mtime'], cached['size']) == (file_stat.st_mtime, file_stat.st_size):
+        record['caption_hash'], record['signature'] = cached['caption_hash'], cached['signature']
+    else:
+        if content is None:
+            content = read_txt_content(file_path)
+        record['caption_hash'] = caption_hash(content) if content.strip() else None
+        record['signature'] = minhash(caption_features(content))
+
+    if image_path is None:
+        image_path = find_paired_image(file_path) or ''
+    record['image_path'] = image_path
+    if image_path:
+        try:
+            image_stat = os.stat(image_path)
+        except OSError:
+            record['image_path'] = ''
+            return record
+        record.update(image_mtime=image_stat.st_mtime, image_size=image_stat.st_size)
+        if cached and (cached['image_path'], cached['image_mtime'], cached['image_size']) == (
+                image_path, image_stat.st_mtime, image_stat.st_size):
+            record['image_hash'], record['phash'] = cached['image_hash'], cached['phash']
+        else:
+            try:
+                record['image_hash'] = file_hash(image_path)
+            except OSError:
+                pass
+            record['phash'] = image_dhash(image_path)
+    return record
+
+
+class _DisjointSet:
+    """并查集，用于把两两相似的文件合并为组"""
+
+    def __init__(self):
+        self._parent: Dict[str, str] = {}
+
+    def find(self, item: str) -> str:
+        parent = self._parent.setdefault(item, item)
+        while parent != item:
+            # 路径减半
+            self._parent[item] = self._parent[parent]
+            item, parent = parent, self._parent[parent]
+        return item
+
+    def union(self, a: str, b: str):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self._parent[root_b] = root_a
+
+    def groups(self) -> List[List[str]]:
+        groups: Dict[str, List[str]] = {}
+        for item in self._parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return [members for members in groups.values() if len(members) > 1]
+
+
+def _exact_groups(records: Iterable[dict], field: str) -> Dict[str, List[str]]:
+    """按某个哈希字段分组，返回 哈希 -> 文件列表（忽略空值）"""
+    groups: Dict[str, List[str]] = {}
+    for record in records:
+        value = record.get(field)
+        if value:
+            groups.setdefault(value, []).append(record['path'])
+    return groups
+
+
+def _banded(representatives: Dict[str, str], bands, similar) -> _DisjointSet:
+    """
+    把代表文件按分段放入桶中，同一个桶中相似的文件合并为一组
+
+    每个桶只与桶中第一个文件比较，大量相似文件落入同一个桶时比较次数不会按平方增长
+
+    Args:
+        representatives: 精确哈希 -> 代表文件（内容完全相同的文件只比较一次）
+        bands: 代表文件 -> 分段键列表
+        similar: (文件, 文件) -> 是否相似
+    """
+    merged = _DisjointSet()
+    buckets: Dict[tuple, str] = {}
+    for file_path in representatives.values():
+        for band, key in enumerate(bands(file_path)):
+            first = buckets.setdefault((band, key), file_path)
+            if first != file_path and merged.find(first) != merged.find(file_path) and similar(first, file_path):
+                merged.union(first, file_path)
+    return merged
+
+
+def find_clusters(records: Dict[str, dict], order: Optional[Dict[str, int]] = None,
+                  similarity: float = DEFAULT_SIMILARITY, image_distance: int = DEFAULT_IMAGE_DISTANCE) -> List[dict]:
+    """
+    把哈希记录分为重复组
+
+    Args:
+        records: 文件路径 -> 哈希记录
+        order: 文件路径 -> 序号，组内文件按此排序（第一个视为保留的文件）
+        similarity: 近似标注的 Jaccard 相似度下限
+        image_distance: 近似图片的感知哈希汉明距离上限
+
+    Returns:
+        [{'kind': 组类型, 'paths': 文件列表, 'score': 近似组中与第一个文件的最低相似度或最大距离}]，
+        组按文件数从多到少排列；近似组包含其中完全相同的文件，只有内容不完全相同时才单独列出
+    """
+    order = order or {}
+    clusters = []
+
+    def add(kind, paths, score=None):
+        paths = sorted(paths, key=lambda file_path: (order.get(file_path, len(order)), file_path))
+        clusters.append({'kind': kind, 'paths': paths, 'score': score})
+
+    # 标注
+    caption_groups = _exact_groups(records.values(), 'caption_hash')
+    for paths in caption_groups.values():
+        if len(paths) > 1:
+            add('caption_exact', paths)
+    signed = {
+        value: paths[0] for value, paths in caption_groups.items() if records[paths[0]]['signature'] is not None
+    }
+    rows = (NUM_PERM // LSH_BANDS) * 4  # 每段的字节数
+
+    def caption_bands(file_path):
+        signature = records[file_path]['signature']
+        return [signature[i:i + rows] for i in range(0, len(signature), rows)]
+
+    def caption_similar(a, b):
+        return signature_similarity(records[a]['signature'], records[b]['signature']) >= similarity
+
+    for members in _banded(signed, caption_bands, caption_similar).groups():
+        first = min(members, key=lambda file_path: (order.get(file_path, len(order)), file_path))
+        score = min(signature_similarity(records[first]['signature'], records[m]['signature']) for m in members)
+        add('caption_near', [p for m in members for p in caption_groups[records[m]['caption_hash']]], round(score, 3))
+
+    # 图片
+    image_groups = _exact_groups(records.values(), 'image_hash')
+    for paths in image_groups.values():
+        if len(paths) > 1:
+            add('image_exact', paths)
+    hashed = {value: paths[0] for value, paths in image_groups.items() if records[paths[0]]['phash']}
+
+    # 8 段，每段 8 位：汉明距离不超过 7 的两个哈希至少有一段完全相同
+    def image_bands(file_path):
+        phash = records[file_path]['phash']
+        return [phash[i:i + 2] for i in range(0, 16, 2)]
+
+    def image_similar(a, b):
+        return _hamming(records[a]['phash'], records[b]['phash']) <= image_distance
+
+    for members in _banded(hashed, image_bands, image_similar).groups():
+        first = min(members, key=lambda file_path: (order.get(file_path, len(order)), file_path))
+        score = max(_hamming(records[first]['phash'], records[m]['phash']) for m in members)
+        add('image_near', [p for m in members for p in image_groups[records[m]['image_hash']]], score)
+
+    clusters.sort(key=lambda cluster: (-len(cluster['paths']), CLUSTER_KINDS.index(cluster['kind'])))
+    return clusters
+
+
+def _hamming(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+class DuplicateDetector:
+    """重复检测的哈希缓存和最近一次的分组结果"""
+
+    def __init__(self):
+        self.records: Dict[str, dict] = {}  # 文件路径 -> 哈希记录
+        self.clusters: List[dict] = []  # 最近一次检测的分组
+        self.progress: Tuple[int, int] = (0, 0)  # (已处理, 总数)
+        self.running = False
+        self.generation = 0  # 清空时递增，进行中的检测据此放弃结果
+        self.version = 0  # 进度或结果变化时递增，界面据此判断是否需要刷新
+
+    def hash_batch(self, items, known: Optional[Dict[str, dict]] = None) -> List[dict]:
+        """
+        计算一批文件的哈希（可在后台线程调用）
+
+        Args:
+            items: [(TXT 路径, 未保存的修改内容或 None, 已知的配对图片或 None)]
+            known: 持久化索引中的哈希记录，内存中没有时作为缓存
+
+        Returns:
+            计算得到的记录（读取失败的文件不包含在内）
+        """
+        records = []
+        for file_path, content, image_path in items:
+            cached = self.records.get(file_path) or (known or {}).get(file_path)
+            if cached is not None and cached.get('dirty'):
+                cached = None
+            try:
+                record = hash_pair(file_path, cached, content, image_path)
+            except Exception as e:
+                logger.warning('计算哈希失败: %s', e)
+                continue
+            if content is not None:
+                record['dirty'] = True
+            records.append(record)
+        return records
+
+    def discard(self, paths):
+        for file_path in paths:
+            self.records.pop(file_path, None)
+
+    def clear(self):
+        self.records.clear()
+        self.clusters = []
+        self.progress = (0, 0)
+        self.generation += 1
+        self.version += 1
@@ -0,0 +1,210 @@
+"""
+文件表
+按列存储已加载文件的信息：每个文件分配一个整数 id，数值列（大小、时间、加载序号、图片像素数）存放在 array 中，
+文本列（路径、文件名、配对图片、原始路径）存放在按 id 排列的列表中，另有 路径 -> id 的哈希索引
+
+与每个文件一个字典相比，每个文件只占用几个数组元素：文件名与路径的文件名相同、配对图片与 TXT 同名时不单独保存，
+移除的文件留下的 id 由之后加入的文件复用，各列保持紧凑
+"""
+
+import math
+import os
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from dataset_scan import IMAGE_EXTENSIONS
+
+INFO_FIELDS = ('name', 'size', 'mtime', 'created_time', 'image_path', 'source_path')  # 文件信息中保存的字段
+
+_MISSING = math.nan  # 时间列中表示没有记录
+_UNKNOWN = -1  # 大小、图片像素数列中表示没有记录
+_PAIRED = {ext: ext for ext in IMAGE_EXTENSIONS}  # 与 TXT 同名的配对图片只保存扩展名（共用同一个字符串）
+
+
+class FileTable:
+    """已加载文件的列式信息表，同时作为已加载文件的集合（支持 in、len 和遍历）"""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}  # 路径 -> id
+        self.paths: List[Optional[str]] = []  # id -> 路径，已移除的为 None
+        self.names: List[Optional[str]] = []  # id -> 文件名，与路径中的文件名相同时为 None
+        self.image_paths: List[Optional[str]] = []  # id -> 配对图片：None 未知，'' 没有，扩展名表示与 TXT 同名
+        self.source_paths: List[Optional[str]] = []  # id -> 清单或压缩包中的原始路径
+        self.sizes = array('q')
+        self.mtimes = array('d')
+        self.created_times = array('d')
+        self.load_orders = array('q')  # 加入列表的顺序
+        self.resolutions = array('q')  # 配对图片的像素数：-1 未读取，0 没有图片
+        self._free: List[int] = []  # 可复用的 id
+        self._load_counter = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, file_path) -> bool:
+        return file_path in self.ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.ids)
+
+    def add(self, file_path: str) -> bool:
+        """加入文件（信息为空），已存在时返回 False"""
+        if file_path in self.ids:
+            return False
+        if self._free:
+            file_id = self._free.pop()
+            self.paths[file_id] = file_path
+            self.load_orders[file_id] = self._load_counter
+        else:
+            file_id = len(self.paths)
+            self.paths.append(file_path)
+            self.names.append(None)
+            self.image_paths.append(None)
+            self.source_paths.append(None)
+            self.sizes.append(_UNKNOWN)
+            self.mtimes.append(_MISSING)
+            self.created_times.append(_MISSING)
+            self.load_orders.append(self._load_counter)
+            self.resolutions.append(_UNKNOWN)
+        self.ids[file_path] = file_id
+        self._load_counter += 1
+        self._reset(file_id)
+        return True
+
+    def discard(self, file_path: str):
+        """移除文件，其 id 留给之后加入的文件"""
+        file_id = self.ids.pop(file_path, None)
+        if file_id is None:
+            return
+        self.paths[file_id] = None
+        self._reset(file_id)
+        self._free.append(file_id)
+
+    def clear(self):
+        self.__init__()
+
+    def _reset(self, file_id: int):
+        self.names[file_id] = None
+        self.image_paths[file_id] = None
+        self.source_paths[file_id] = None
+        self.sizes[file_id] = _UNKNOWN
+        self.mtimes[file_id] = _MISSING
+        self.created_times[file_id] = _MISSING
+        self.resolutions[file_id] = _UNKNOWN
+
+    # ---------- 文件信息 ----------
+
+    def set_info(self, file_path: str, entry: dict):
+        """用扫描或索引得到的条目替换文件信息（只保存 INFO_FIELDS 中的字段）"""
+        file_id = self.ids[file_path]
+        name = entry.get('name')
+        self.names[file_id] = None if name is None or name == os.path.basename(file_path) else name
+        self.sizes[file_id] = entry['size'] if entry.get('size') is not None else _UNKNOWN
+        self.mtimes[file_id] = entry['mtime'] if entry.get('mtime') is not None else _MISSING
+        self.created_times[file_id] = entry['created_time'] if entry.get('created_time') is not None else _MISSING
+        self.source_paths[file_id] = entry.get('source_path')
+        if 'image_path' in entry:
+            self._set_image_path(file_id, file_path, entry['image_path'] or '')
+        else:
+            self.image_paths[file_id] = None
+
+    def update_info(self, file_path: str, size: int, mtime: float):
+        """更新文件的大小和修改时间（保存后）"""
+        file_id = self.ids[file_path]
+        self.sizes[file_id] = size
+        self.mtimes[file_id] = mtime
+
+    def _set_image_path(self, file_id: int, file_path: str, image_path: str):
+        stem, ext = os.path.splitext(image_path)
+        if ext in _PAIRED and stem == os.path.splitext(file_path)[0]:
+            image_path = _PAIRED[ext]
+        self.image_paths[file_id] = image_path
+
+    def info(self, file_path: str) -> Optional[dict]:
+        """文件信息（与加入时的条目字段相同，没有记录的字段不包含在内），文件未加载时返回 None"""
+        file_id = self.ids.get(file_path)
+        if file_id is None:
+            return None
+        info = {'name': self.name(file_path)}
+        if self.sizes[file_id] != _UNKNOWN:
+            info['size'] = self.sizes[file_id]
+        if not math.isnan(self.mtimes[file_id]):
+            info['mtime'] = self.mtimes[file_id]
+        if not math.isnan(self.created_times[file_id]):
+            info['created_time'] = self.created_times[file_id]
+        if self.image_paths[file_id] is not None:
+            info['image_path'] = self.image_path(file_path)
+        if self.source_paths[file_id] is not None:
+            info['source_path'] = self.source_paths[file_id]
+        return info
+
+    # ---------- 单列读取（排序键等热点路径使用） ----------
+
+    def name(self, file_path: str) -> str:
+        name = self.names[self.ids[file_path]]
+        return os.path.basename(file_path) if name is None else name
+
+    def size(self, file_path: str) -> int:
+        size = self.sizes[self.ids[file_path]]
+        return 0 if size == _UNKNOWN else size
+
+    def mtime(self, file_path: str) -> float:
+        mtime = self.mtimes[self.ids[file_path]]
+        return 0 if math.isnan(mtime) else mtime
+
+    def created_time(self, file_path: str) -> float:
+        created_time = self.created_times[self.ids[file_path]]
+        return 0 if math.isnan(created_time) else created_time
+
+    def load_order(self, file_path: str) -> int:
+        return self.load_orders[self.ids[file_path]]
+
+    def image_path(self, file_path: str) -> Optional[str]:
+        """配对图片：None 表示未知（需要查找），'' 表示没有图片"""
+        image_path = self.image_paths[self.ids[file_path]]
+        if image_path is not None and image_path in _PAIRED:
+            return os.path.splitext(file_path)[0] + image_path
+        return image_path
+
+    def source_path(self, file_path: str) -> Optional[str]:
+        return self.source_paths[self.ids[file_path]]
+
+    # ---------- 图片尺寸 ----------
+
+    def has_resolution(self, file_path: str) -> bool:
+        """是否已读取配对图片的尺寸"""
+        return self.resolutions[self.ids[file_path]] != _UNKNOWN
+
+    def resolution(self, file_path: str) -> int:
+        """配对图片的像素数：-1 尚未读取，0 没有图片"""
+        return self.resolutions[self.ids[file_path]]
+
+    def set_resolution(self, file_path: str, size: Optional[Tuple[int, int]]):
+        self.resolutions[self.ids[file_path]] = size[0] * size[1] if size else 0
+
+
+class FileInfoView(Mapping):
+    """
+    以 路径 -> 信息字典 的只读映射查看文件表（每次访问生成新的字典，修改它不会写回文件表）
+
+    供接口等非热点代码使用，热点路径应直接读取文件表的列
+    """
+
+    def __init__(self, table: FileTable):
+        self._table = table
+
+    def __getitem__(self, file_path: str) -> dict:
+        info = self._table.info(file_path)
+        if info is None:
+            raise KeyError(file_path)
+        return info
+
+    def __contains__(self, file_path) -> bool:
+        return file_path in self._table
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table)
@@ -0,0 +1,228 @@
+"""
+文件监视
+监视已加载文件所在目录中 TXT 文件的变化，Linux 下使用 inotify，其他平台或 inotify 不可用时轮询，
+变化的文件路径合并后分批回调
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# inotify 事件掩码
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_inotify():
+    """加载 libc 中的 inotify 函数，不可用时返回 None"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class FileWatcher:
+    """
+    目录监视器
+
+    回调在监视线程中执行，参数为发生变化（修改、新建、删除、重命名）的文件路径集合；
+    事件丢失（inotify 队列溢出）时参数为 None，调用方应自行校验全部文件。
+    """
+
+    def __init__(self, on_change: Callable[[Optional[Set[str]]], None], suffix: str = '.txt',
+                 poll_interval: float = 5.0, debounce: float = 0.3):
+        """
+        初始化监视器
+
+        Args:
+            on_change: 变化回调
+            suffix: 只报告该扩展名的文件
+            poll_interval: 轮询间隔（秒）
+            debounce: 合并连续事件的等待时间（秒）
+        """
+        self.on_change = on_change
+        self.suffix = suffix.lower()
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self._libc = _load_inotify()
+        self._fd = -1
+        if self._libc is not None:
+            self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        self._watch_dirs: Dict[int, str] = {}  # inotify 监视描述符 -> 目录
+        self._poll_dirs: Dict[str, Optional[Dict[str, tuple]]] = {}  # 轮询目录 -> 快照（None 表示尚未建立）
+        self._watched: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def backend(self) -> str:
+        return 'inotify' if self._fd >= 0 else 'polling'
+
+    def watch(self, directories: Iterable[str]):
+        """添加要监视的目录（已监视的目录会被忽略）"""
+        added = False
+        with self._lock:
+            for directory in directories:
+                directory = os.path.abspath(directory)
+                if directory in self._watched:
+                    continue
+                self._watched.add(directory)
+                added = True
+                wd = -1
+                if self._fd >= 0:
+                    wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+                if wd >= 0:
+                    self._watch_dirs[wd] = directory
+                else:
+                    # inotify 不可用或超出监视数量上限时改为轮询该目录
+                    self._poll_dirs[directory] = None
+        if added and (self._thread is None or not self._thread.is_alive()):
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='file-watcher', daemon=True)
+            self._thread.start()
+
+    @property
+    def directories(self) -> Set[str]:
+        with self._lock:
+            return set(self._watched)
+
+    def clear(self):
+        """停止监视所有目录"""
+        self.stop()
+        with self._lock:
+            if self._fd >= 0:
+                os.close(self._fd)
+                self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+            self._watch_dirs.clear()
+            self._poll_dirs.clear()
+            self._watched.clear()
+
+    def stop(self):
+        """停止监视线程（已添加的目录保留，再次 watch 时恢复）"""
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    def resume(self):
+        """恢复已停止的监视线程"""
+        if self._watched and (self._thread is None or not self._thread.is_alive()):
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='file-watcher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        pending: Set[str] = set()
+        overflow = False
+        last_event = 0.0
+        next_poll = time.monotonic()
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            timeout = max(0.0, next_poll - now)
+            if pending or overflow:
+                timeout = min(timeout, self.debounce)
+            if self._fd >= 0 and self._watch_dirs:
+                try:
+                    readable, _, _ = select.select([self._fd], [], [], min(timeout, 1.0))
+                except (OSError, ValueError):
+                    readable = []
+                if readable:
+                    changed, lost = self._read_events()
+                    pending |= changed
+                    overflow = overflow or lost
+                    last_event = time.monotonic()
+            else:
+                self._stop_event.wait(min(timeout, 1.0))
+
+            now = time.monotonic()
+            if now >= next_poll:
+                pending |= self._poll()
+                next_poll = now + self.poll_interval
+                if pending:
+                    last_event = now
+            # 停止产生事件一段时间后统一回调
+            if (pending or overflow) and now - last_event >= self.debounce:
+                try:
+                    self.on_change(None if overflow else pending)
+                except Exception as e:
+                    logger.warning('文件变化处理失败: %s', e)
+                pending = set()
+                overflow = False
+
+    def _read_events(self):
+        """读取并解析 inotify 事件，返回 (变化的文件, 是否丢失了事件)"""
+        changed = set()
+        lost = False
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed, lost
+        except OSError:
+            return changed, True
+        offset = 0
+        with self._lock:
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if mask & _IN_Q_OVERFLOW:
+                    lost = True
+                    continue
+                directory = self._watch_dirs.get(wd)
+                if directory is None or not name:
+                    continue
+                file_name = os.fsdecode(name)
+                if file_name.lower().endswith(self.suffix):
+                    changed.add(os.path.join(directory, file_name))
+        return changed, lost
+
+    def _poll(self) -> Set[str]:
+        """扫描轮询目录并与上次的快照比较"""
+        with self._lock:
+            directories = list(self._poll_dirs.items())
+        changed = set()
+        for directory, previous in directories:
+            snapshot = {}
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.name.lower().endswith(self.suffix):
+                            try:
+                                entry_stat = entry.stat()
+                            except OSError:
+                                continue
+                            snapshot[entry.name] = (entry_stat.st_size, entry_stat.st_mtime_ns)
+            except OSError:
+                pass
+            if previous is not None:
+                for name in snapshot.keys() | previous.keys():
+                    if snapshot.get(name) != previous.get(name):
+                        changed.add(os.path.join(directory, name))
+            with self._lock:
+                if directory in self._poll_dirs:
+                    self._poll_dirs[directory] = snapshot
+        return changed
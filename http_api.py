@@ -0,0 +1,523 @@
+"""
+HTTP 接口
+在 NiceGUI 已经运行的应用上注册 REST 接口，供脚本和标注流水线在不打开浏览器的情况下读写数据集；
+标注直接来自界面使用的共享数据集（同一份内容缓存），写入同样经过编辑锁、冲突检测和原子保存，
+所有页面会实时看到接口写入的内容
+
+响应带有 ETag 和 Last-Modified，支持 If-None-Match / If-Modified-Since 条件读取、If-Match 条件写入
+以及 Range 范围读取；批量接口一次请求读写多个文件，减少往返
+
+接口（path 为已加载的 TXT 文件的完整路径，未加载的文件一律返回 404）：
+    GET  /api/files                 分页列出文件，可按搜索条件、审阅状态、未保存状态、目录过滤
+    GET  /api/captions?path=...     读取标注（text/plain）
+    PUT  /api/captions?path=...     写入标注，请求体为 UTF-8 文本
+    POST /api/captions/batch        批量读取标注：{"paths": [...], "etags": {路径: ETag}}
+    PUT  /api/captions/batch        批量写入标注：{"items": [{"path", "content", "if_match"}], "force": false}
+    GET  /api/images?path=...       读取与 TXT 配对的图片
+    GET  /api/metrics               各项操作的耗时统计和数据集规模
+"""
+
+import asyncio
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from dataset_index import content_hash
+from dataset_scan import find_paired_image
+from dataset_store import SORT_KEYS, DatasetStore
+from perf_metrics import metrics
+
+API_OWNER = 'api'  # 接口写入期间持有编辑锁的名义会话
+MAX_PAGE_SIZE = 1000  # 文件列表每页的最大条数
+MAX_BATCH_SIZE = 1000  # 批量接口每次请求的最大文件数
+STREAM_CHUNK_SIZE = 256 * 1024  # 图片分块读取的大小
+
+# 写入结果 -> 单个写入接口的状态码
+_WRITE_STATUS = {
+    'saved': 200,
+    'unchanged': 200,
+    'not_found': 404,
+    'locked': 409,
+    'conflict': 409,
+    'precondition_failed': 412,
+    'error': 500,
+}
+
+
+class RangeNotSatisfiable(Exception):
+    """请求的范围超出了内容长度"""
+
+
+# ---------- 缓存校验 ----------
+
+def caption_etag(content: str) -> str:
+    """标注内容的强 ETag（内容哈希，与索引中的 content_hash 一致）"""
+    return f'"{content_hash(content.encode("utf-8"))}"'
+
+
+def file_etag(size: int, mtime_ns: int) -> str:
+    """按大小和修改时间生成的文件 ETag（不读取文件内容）"""
+    return f'"{size:x}-{mtime_ns:x}"'
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def _parse_http_date(value: str) -> Optional[float]:
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _etag_matches(header: str, etag: str, weak: bool) -> bool:
+    """判断 If-Match / If-None-Match 头中是否包含 etag（weak 为 True 时忽略 W/ 前缀）"""
+    if header.strip() == '*':
+        return True
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if weak:
+            candidate = candidate[2:] if candidate.startswith('W/') else candidate
+        elif candidate.startswith('W/'):
+            continue
+        if candidate == etag:
+            return True
+    return False
+
+
+def is_not_modified(headers, etag: str, last_modified: Optional[float]) -> bool:
+    """条件读取：客户端缓存的版本仍然有效时返回 True（有 If-None-Match 时忽略 If-Modified-Since）"""
+    if_none_match = headers.get('if-none-match')
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag, weak=True)
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since and last_modified is not None:
+        since = _parse_http_date(if_modified_since)
+        return since is not None and int(last_modified) <= since
+    return False
+
+
+def parse_range(header: Optional[str], size: int, if_range: Optional[str] = None, etag: Optional[str] = None,
+                last_modified: Optional[float] = None) -> Optional[Tuple[int, int]]:
+    """
+    解析 Range 请求头
+
+    只支持单个字节范围；多个范围、格式错误或 If-Range 不匹配时返回 None，由调用方返回完整内容
+
+    Args:
+        header: Range 请求头
+        size: 内容长度
+        if_range: If-Range 请求头（ETag 或日期）
+        etag: 当前内容的 ETag
+        last_modified: 当前内容的修改时间
+
+    Returns:
+        (起始位置, 结束位置（含）)，或 None
+
+    Raises:
+        RangeNotSatisfiable: 范围完全超出内容长度
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    if if_range:
+        if if_range.startswith('"') or if_range.startswith('W/'):
+            if etag is None or not _etag_matches(if_range, etag, weak=False):
+                return None
+        else:
+            since = _parse_http_date(if_range)
+            if since is None or last_modified is None or int(last_modified) > since:
+                return None
+    first, sep, last = header[len('bytes='):].strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if not first:
+            # bytes=-N：最后 N 个字节
+            length = int(last)
+            if length <= 0 or size == 0:
+                raise RangeNotSatisfiable()
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if start < 0 or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _validator_headers(etag: str, last_modified: Optional[float]) -> Dict[str, str]:
+    headers = {'ETag': etag, 'Accept-Ranges': 'bytes', 'Cache-Control': 'no-cache'}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+    return headers
+
+
+def _range_headers(request: Request, size: int, etag: str, last_modified: Optional[float],
+                   headers: Dict[str, str]) -> Optional[Tuple[int, int]]:
+    """解析请求范围并补充 Content-Range 头，范围无效时抛出 416"""
+    try:
+        byte_range = parse_range(request.headers.get('range'), size, request.headers.get('if-range'),
+                                 etag, last_modified)
+    except RangeNotSatisfiable:
+        raise HTTPException(status_code=416, headers={'Content-Range': f'bytes */{size}'})
+    if byte_range is not None:
+        headers['Content-Range'] = f'bytes {byte_range[0]}-{byte_range[1]}/{size}'
+    return byte_range
+
+
+def content_response(request: Request, data: bytes, media_type: str, etag: str,
+                     last_modified: Optional[float] = None, extra_headers: Optional[Dict[str, str]] = None) -> Response:
+    """返回内存中的内容，处理条件请求和范围读取"""
+    headers = _validator_headers(etag, last_modified)
+    headers.update(extra_headers or {})
+    if is_not_modified(request.headers, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    byte_range = _range_headers(request, len(data), etag, last_modified, headers)
+    if byte_range is None:
+        return Response(data, media_type=media_type, headers=headers)
+    start, end = byte_range
+    return Response(data[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+
+
+def _iter_file(file_path: str, start: int, length: int) -> Iterator[bytes]:
+    """分块读取文件的一段（由 Starlette 在线程池中迭代）"""
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+async def file_response(request: Request, file_path: str) -> Response:
+    """流式返回磁盘上的文件，处理条件请求和范围读取"""
+    loop = asyncio.get_event_loop()
+    try:
+        file_stat = await loop.run_in_executor(None, os.stat, file_path)
+    except OSError:
+        raise HTTPException(status_code=404, detail='image not found')
+    size = file_stat.st_size
+    etag = file_etag(size, file_stat.st_mtime_ns)
+    headers = _validator_headers(etag, file_stat.st_mtime)
+    if is_not_modified(request.headers, etag, file_stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+    media_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+    byte_range = _range_headers(request, size, etag, file_stat.st_mtime, headers)
+    start, end = byte_range if byte_range is not None else (0, size - 1)
+    headers['Content-Length'] = str(end - start + 1)
+    return StreamingResponse(_iter_file(file_path, start, end - start + 1),
+                             status_code=206 if byte_range is not None else 200,
+                             media_type=media_type, headers=headers)
+
+
+# ---------- 数据集访问 ----------
+
+def _read_captions(store: DatasetStore, paths: List[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """读取一批文件的文本（可在后台线程调用），返回 (路径 -> 内容, 路径 -> 错误信息)"""
+    contents, errors = {}, {}
+    for file_path in paths:
+        try:
+            contents[file_path] = store.read_caption(file_path)
+        except Exception as e:
+            errors[file_path] = str(e)
+    return contents, errors
+
+
+async def get_captions(store: DatasetStore, paths: List[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    获取一批已加载文件的标注，优先使用缓存（包括未保存的修改），未命中时在后台读取并放入缓存
+
+    Returns:
+        (路径 -> 内容, 路径 -> 错误信息)
+    """
+    contents, missing = {}, []
+    for file_path in paths:
+        content = store.file_contents.get(file_path)
+        if content is None:
+            missing.append(file_path)
+        else:
+            contents[file_path] = content
+    if not missing:
+        return contents, {}
+    read, errors = await asyncio.get_event_loop().run_in_executor(None, _read_captions, store, missing)
+    for file_path, content in read.items():
+        # 读取期间文件可能已被移除或开始编辑
+        if file_path not in store.file_set:
+            errors[file_path] = 'file removed'
+            continue
+        if file_path not in store.file_contents:
+            store.file_contents.put(file_path, content)
+            store.tag_index.update(file_path, content)
+        cached = store.file_contents.get(file_path)
+        contents[file_path] = content if cached is None else cached
+    return contents, errors
+
+
+def _caption_state(store: DatasetStore, file_path: str, content: str) -> dict:
+    """标注的版本信息：未保存的修改没有对应的磁盘时间，不提供 Last-Modified"""
+    dirty = store.file_contents.is_dirty(file_path)
+    mtime = None if dirty else store.file_info.get(file_path, {}).get('mtime')
+    return {'etag': caption_etag(content), 'last_modified': mtime, 'dirty': dirty}
+
+
+async def write_captions(store: DatasetStore, items: List[Tuple[str, str, Optional[str]]],
+                         force: bool = False) -> List[dict]:
+    """
+    写入一批标注
+
+    页面正在编辑（持有编辑锁或有未保存修改）的文件不会写入；写入期间由接口持有编辑锁，
+    失败时恢复原来的内容，不会在缓存中留下未保存的修改
+
+    Args:
+        items: [(路径, 新内容, If-Match 中的 ETag 或 None)]
+        force: 忽略与外部修改的冲突，直接覆盖
+
+    Returns:
+        每个文件的结果 {'path', 'status', 'etag'（成功时）, 'error'（失败时）}
+    """
+    results: Dict[str, dict] = {}
+    candidates = []
+    for file_path, content, if_match in items:
+        if file_path not in store.file_set:
+            results[file_path] = {'path': file_path, 'status': 'not_found'}
+        elif file_path in store.locks or store.file_contents.is_dirty(file_path):
+            results[file_path] = {'path': file_path, 'status': 'locked'}
+        elif file_path in store.saver.conflicts and not force:
+            results[file_path] = {'path': file_path, 'status': 'conflict',
+                                  'error': store.saver.conflicts[file_path]}
+        else:
+            candidates.append((file_path, content, if_match))
+
+    current, errors = await get_captions(store, [file_path for file_path, _, _ in candidates])
+    pending, previous = [], {}
+    for file_path, content, if_match in candidates:
+        if file_path in errors:
+            results[file_path] = {'path': file_path, 'status': 'error', 'error': errors[file_path]}
+            continue
+        old = current[file_path]
+        # 读取期间页面可能开始编辑
+        if not store.lock(file_path, API_OWNER) or store.file_contents.is_dirty(file_path):
+            results[file_path] = {'path': file_path, 'status': 'locked'}
+            continue
+        if if_match is not None and not _etag_matches(if_match, caption_etag(old), weak=False):
+            store.locks.pop(file_path, None)
+            results[file_path] = {'path': file_path, 'status': 'precondition_failed', 'etag': caption_etag(old)}
+            continue
+        if content == old and not force:
+            store.locks.pop(file_path, None)
+            results[file_path] = {'path': file_path, 'status': 'unchanged', 'etag': caption_etag(old)}
+            continue
+        previous[file_path] = old
+        store.file_contents.set_dirty(file_path, content)
+        store.tag_index.update(file_path, content)
+        pending.append(file_path)
+
+    if pending:
+        saved, failed = await store.save_files(pending, force=force)
+        for file_path, content in saved:
+            results[file_path] = {'path': file_path, 'status': 'saved', 'etag': caption_etag(content)}
+        rolled_back, changed_on_disk = [], set()
+        for file_path, error in failed:
+            status = 'conflict' if file_path in store.saver.conflicts else 'error'
+            results[file_path] = {'path': file_path, 'status': status, 'error': error}
+            if status == 'conflict':
+                changed_on_disk.add(file_path)
+            # 恢复原来的内容，磁盘上的文件已被修改时随后按外部修改重新加载
+            store.saver.discard(file_path)
+            store.locks.pop(file_path, None)
+            if file_path in store.file_set:
+                store.file_contents.discard(file_path)
+                store.file_contents.put(file_path, previous[file_path])
+                store.tag_index.update(file_path, previous[file_path])
+                rolled_back.append(file_path)
+        if rolled_back:
+            store.emit('_on_store_files_updated', rolled_back, None)
+        if changed_on_disk:
+            store.on_external_change(changed_on_disk)
+    return [results[file_path] for file_path, _, _ in items if file_path in results]
+
+
+def _file_item(store: DatasetStore, file_path: str) -> dict:
+    info = store.file_info.get(file_path, {})
+    item = {
+        'path': file_path,
+        'name': info.get('name') or os.path.basename(file_path),
+        'size': info.get('size'),
+        'mtime': info.get('mtime'),
+        'created_time': info.get('created_time'),
+        'reviewed': file_path in store.reviewed,
+        'dirty': store.file_contents.is_dirty(file_path),
+        'locked': file_path in store.locks,
+        'conflict': store.saver.conflicts.get(file_path),
+    }
+    if 'image_path' in info:
+        item['image_path'] = info['image_path']
+    return item
+
+
+def _require_loaded(store: DatasetStore, file_path: str):
+    if file_path not in store.file_set:
+        raise HTTPException(status_code=404, detail='file not loaded')
+
+
+async def _json_object(request: Request) -> dict:
+    """读取请求体中的 JSON 对象，不是合法的 JSON 对象时返回 400"""
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail='body must be valid JSON')
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail='body must be a JSON object')
+    return body
+
+
+def _batch_paths(value, name: str) -> list:
+    if not isinstance(value, list) or len(value) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f'{name} must be a list of at most {MAX_BATCH_SIZE} entries')
+    return value
+
+
+# ---------- 路由 ----------
+
+def register_api(app, store: DatasetStore, prefix: str = '/api'):
+    """
+    在应用上注册接口
+
+    Args:
+        app: NiceGUI 的 app（FastAPI 应用）
+        store: 与界面共享的数据集
+        prefix: 接口路径前缀
+    """
+
+    @app.get(prefix + '/files')
+    async def list_files(offset: int = 0, limit: int = 100, sort: str = 'load', q: str = '',
+                         reviewed: Optional[bool] = None, dirty: Optional[bool] = None, under: str = ''):
+        """分页列出文件；sort 为 SORT_KEYS 中的排序方式，默认按加载顺序"""
+        if sort not in SORT_KEYS:
+            raise HTTPException(status_code=400, detail=f'unknown sort: {sort}')
+        if offset < 0 or not 0 < limit <= MAX_PAGE_SIZE:
+            raise HTTPException(status_code=400, detail=f'offset must be >= 0 and limit in 1..{MAX_PAGE_SIZE}')
+        files, positions = store.ordering(sort)
+        try:
+            results = store.tag_index.search(q) if q.strip() else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f'invalid query: {e}')
+
+        filters = []
+        if reviewed is not None:
+            filters.append(lambda file_path: (file_path in store.reviewed) == reviewed)
+        if dirty is not None:
+            filters.append(lambda file_path: store.file_contents.is_dirty(file_path) == dirty)
+        if under:
+            root = os.path.join(os.path.abspath(under), '')
+            filters.append(lambda file_path: file_path.startswith(root))
+
+        if results is not None and len(results) * 8 < len(files):
+            # 结果较少时按位置排序，避免遍历整个列表
+            matched = sorted((file_path for file_path in results if file_path in positions), key=positions.__getitem__)
+        elif results is not None:
+            matched = [file_path for file_path in files if file_path in results]
+        elif filters:
+            matched = files
+        else:
+            return {'total': len(files), 'offset': offset,
+                    'files': [_file_item(store, file_path) for file_path in files[offset:offset + limit]]}
+        if filters:
+            matched = [file_path for file_path in matched if all(check(file_path) for check in filters)]
+        return {'total': len(matched), 'offset': offset,
+                'files': [_file_item(store, file_path) for file_path in matched[offset:offset + limit]]}
+
+    @app.get(prefix + '/captions')
+    async def get_caption(request: Request, path: str):
+        _require_loaded(store, path)
+        contents, errors = await get_captions(store, [path])
+        if path not in contents:
+            raise HTTPException(status_code=404, detail=errors.get(path, 'file not loaded'))
+        state = _caption_state(store, path, contents[path])
+        extra = {'X-Unsaved-Changes': '1'} if state['dirty'] else None
+        return content_response(request, contents[path].encode('utf-8'), 'text/plain; charset=utf-8',
+                                state['etag'], state['last_modified'], extra)
+
+    @app.put(prefix + '/captions')
+    async def put_caption(request: Request, path: str, force: bool = False):
+        try:
+            content = (await request.body()).decode('utf-8')
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail='body must be UTF-8 text')
+        result, = await write_captions(store, [(path, content, request.headers.get('if-match'))], force)
+        headers = {'ETag': result['etag']} if 'etag' in result else None
+        return JSONResponse(result, status_code=_WRITE_STATUS[result['status']], headers=headers)
+
+    @app.post(prefix + '/captions/batch')
+    async def get_caption_batch(request: Request):
+        """批量读取；etags 中给出的版本仍然有效时只返回 not_modified，不返回内容"""
+        body = await _json_object(request)
+        paths = _batch_paths(body.get('paths'), 'paths')
+        if not all(isinstance(file_path, str) for file_path in paths):
+            raise HTTPException(status_code=400, detail='paths must be strings')
+        known = body.get('etags') or {}
+        if not isinstance(known, dict) or not all(isinstance(etag, str) for etag in known.values()):
+            raise HTTPException(status_code=400, detail='etags must be an object mapping paths to strings')
+        loaded = [file_path for file_path in dict.fromkeys(paths) if file_path in store.file_set]
+        contents, errors = await get_captions(store, loaded)
+        items = []
+        for file_path in loaded:
+            if file_path not in contents:
+                continue
+            state = _caption_state(store, file_path, contents[file_path])
+            item = {'path': file_path, 'etag': state['etag'], 'dirty': state['dirty']}
+            if known.get(file_path) == state['etag']:
+                item['not_modified'] = True
+            else:
+                item['content'] = contents[file_path]
+            items.append(item)
+        errors.update((file_path, 'file not loaded') for file_path in paths if file_path not in store.file_set)
+        return {'items': items, 'errors': [{'path': file_path, 'error': error} for file_path, error in errors.items()]}
+
+    @app.put(prefix + '/captions/batch')
+    async def put_caption_batch(request: Request):
+        """批量写入，返回每个文件的结果（saved / unchanged / not_found / locked / conflict / precondition_failed / error）"""
+        body = await _json_object(request)
+        entries = _batch_paths(body.get('items'), 'items')
+        items = []
+        for entry in entries:
+            if not isinstance(entry, dict) or not isinstance(entry.get('path'), str) \
+                    or not isinstance(entry.get('content'), str):
+                raise HTTPException(status_code=400, detail='each item needs a string path and content')
+            if not isinstance(entry.get('if_match'), (str, type(None))):
+                raise HTTPException(status_code=400, detail='if_match must be a string')
+            items.append((entry['path'], entry['content'], entry.get('if_match')))
+        if len({file_path for file_path, _, _ in items}) != len(items):
+            raise HTTPException(status_code=400, detail='duplicate paths in batch')
+        return {'results': await write_captions(store, items, bool(body.get('force')))}
+
+    @app.get(prefix + '/images')
+    async def get_image(request: Request, path: str):
+        _require_loaded(store, path)
+        info = store.file_info.get(path, {})
+        if 'image_path' in info:
+            # 索引中已记录配对图片时不访问磁盘
+            image_path = info['image_path']
+        else:
+            image_path = await asyncio.get_event_loop().run_in_executor(None, find_paired_image, path)
+        if image_path:
+            # 压缩包中的图片先解出到缓存目录
+            image_path = await asyncio.get_event_loop().run_in_executor(None, store.resolve_image, image_path)
+        if not image_path:
+            raise HTTPException(status_code=404, detail='no paired image')
+        return await file_response(request, image_path)
+
+    @app.get(prefix + '/metrics')
+    async def get_metrics():
+        """操作耗时（毫秒，分位数按最近的样本计算）和数据集规模"""
+        return {'operations': metrics.snapshot(), 'dataset': store.status()}
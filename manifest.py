@@ -0,0 +1,481 @@
+"""
+数据集清单
+把整个数据集的标注和图片路径保存为一个 JSONL 或 Parquet 文件（训练程序使用的格式），
+或者直接从清单加载数据集：清单中的每一行在列表中显示为一个“文件”，修改后写回清单
+
+导出和写回都是逐块流式写入临时文件再原子替换，不在内存中构造整个清单；
+JSONL 按行的字节偏移随机读取单行，Parquet 按行组读取
+
+每行的字段：
+    caption   标注文本（导入时也识别 text）
+    image     图片路径（导入时也识别 image_path、file_name），相对路径相对于清单所在目录
+    path      标注文件的路径（导出时写入，导入时只用于显示名称）
+
+Parquet 依赖 pyarrow；未安装时只支持 JSONL
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from save_pipeline import SaveConflict
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 为可选依赖
+    pa = None
+    pq = None
+
+MANIFEST_FORMATS = ('jsonl', 'parquet')
+PARQUET_AVAILABLE = pa is not None
+MANIFEST_CHUNK = 2048  # 每块读写的行数
+CAPTION_FIELDS = ('caption', 'text')
+IMAGE_FIELDS = ('image', 'image_path', 'file_name')
+
+
+def manifest_format(path: str) -> str:
+    """按扩展名判断清单格式，无法识别时抛出 ValueError"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.jsonl', '.json', '.ndjson'):
+        return 'jsonl'
+    if ext in ('.parquet', '.pq'):
+        return 'parquet'
+    raise ValueError(f'unsupported manifest format: {ext or path}')
+
+
+def _manifest_schema():
+    """导出的 Parquet 清单的表结构"""
+    return pa.schema([('path', pa.string()), ('image', pa.string()), ('caption', pa.string())])
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError('pyarrow is required for Parquet manifests')
+
+
+def _field(row: dict, names) -> Optional[str]:
+    """返回行中第一个存在的字段名"""
+    for name in names:
+        if name in row:
+            return name
+    return None
+
+
+def _load_object(line: bytes) -> Optional[dict]:
+    """解析 JSONL 中的一行，无法解析或不是对象时返回 None"""
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _parse_line(line: bytes) -> dict:
+    """解析 JSONL 中的一行，无法解析或不是对象时返回空字典"""
+    data = _load_object(line)
+    return {} if data is None else data
+
+
+def _caption(data: dict) -> str:
+    """行中的标注文本（没有时为空字符串）"""
+    field = _field(data, CAPTION_FIELDS)
+    content = data.get(field) if field else None
+    return content if isinstance(content, str) else ''
+
+
+def _caption_hash(content: str) -> int:
+    """标注的哈希，用于写回时判断磁盘上的行是否被其他程序修改"""
+    return int.from_bytes(hashlib.blake2b(content.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _temp_path(path: str) -> str:
+    """在目标文件所在目录创建临时文件（同一文件系统才能原子替换）"""
+    fd, temp_path = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    return temp_path
+
+
+def _replace(temp_path: str, path: str):
+    """用临时文件替换目标文件，保留原文件的权限"""
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o644
+    os.chmod(temp_path, mode)
+    os.replace(temp_path, path)
+
+
+class ManifestWriter:
+    """流式写入清单：逐块追加到临时文件，close 时原子替换目标文件"""
+
+    def __init__(self, path: str, fmt: Optional[str] = None):
+        """
+        创建清单写入器
+
+        Args:
+            path: 清单路径
+            fmt: 'jsonl' 或 'parquet'，None 时按扩展名判断
+        """
+        self.path = os.path.abspath(path)
+        self.format = fmt or manifest_format(path)
+        if self.format not in MANIFEST_FORMATS:
+            raise ValueError(f'unsupported manifest format: {self.format}')
+        if self.format == 'parquet':
+            _require_pyarrow()
+        self.rows = 0
+        self._temp_path = _temp_path(self.path)
+        self._file = None
+        self._writer = None
+        if self.format == 'jsonl':
+            self._file = open(self._temp_path, 'w', encoding='utf-8', newline='\n')
+
+    def write(self, rows: List[dict]):
+        """追加一块行（字段为 path、image、caption）"""
+        if not rows:
+            return
+        if self.format == 'jsonl':
+            self._file.write(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows))
+        else:
+            table = pa.Table.from_pylist(rows, schema=_manifest_schema())
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self._temp_path, table.schema)
+            self._writer.write_table(table)
+        self.rows += len(rows)
+
+    def close(self):
+        """写完所有行：刷新到磁盘并替换目标文件"""
+        if self.format == 'jsonl':
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+        else:
+            if self._writer is None:
+                # 没有任何行时也写出带有表结构的空文件
+                self._writer = pq.ParquetWriter(self._temp_path, _manifest_schema())
+            self._writer.close()
+        _replace(self._temp_path, self.path)
+
+    def abort(self):
+        """放弃写入，删除临时文件（目标文件保持不变）"""
+        try:
+            if self._file is not None:
+                self._file.close()
+            if self._writer is not None:
+                self._writer.close()
+        finally:
+            try:
+                os.unlink(self._temp_path)
+            except OSError:
+                pass
+
+
+class Manifest:
+    """
+    作为数据集来源的清单（线程安全）
+
+    清单中的第 i 行在列表中的路径为 “清单路径/i”，由 DatasetStore 按路径前缀把读写交给清单。
+    每一行记录最近一次读取时标注的哈希，写回时只有磁盘上的标注与之不同的行才算冲突，
+    其他程序对清单中其他行的修改会保留
+    """
+
+    def __init__(self, path: str):
+        """
+        打开清单（不读取内容，加载时调用 iter_entries）
+
+        Args:
+            path: 清单路径
+        """
+        self.path = os.path.abspath(path)
+        self.format = manifest_format(self.path)
+        if self.format == 'parquet':
+            _require_pyarrow()
+        self.prefix = os.path.join(self.path, '')  # 清单中各行的路径前缀
+        self.rows = 0
+        self._lock = threading.RLock()
+        self._offsets = array('Q')  # JSONL：每行的字节偏移
+        self._group_starts: List[int] = []  # Parquet：每个行组的第一行
+        self._group_cache: Optional[Tuple[int, list]] = None  # 最近读取的行组
+        self._hashes = array('Q')  # 每行最近一次读取时标注的哈希
+        self._caption_field = 'caption'
+        self._reader = None
+        self._stat: Optional[Tuple[int, float]] = None  # 行偏移对应的清单 (大小, 修改时间)
+
+    def row_path(self, row: int) -> str:
+        return f'{self.prefix}{row}'
+
+    def row_of(self, file_path: str) -> int:
+        """列表中的路径 -> 行号，不属于该清单或超出范围时抛出 KeyError"""
+        if not file_path.startswith(self.prefix):
+            raise KeyError(file_path)
+        try:
+            row = int(file_path[len(self.prefix):])
+        except ValueError:
+            raise KeyError(file_path)
+        if not 0 <= row < self.rows:
+            raise KeyError(file_path)
+        return row
+
+    def _entry(self, row: int, data: dict, mtime: float) -> dict:
+        """清单中的一行 -> 数据集条目（与扫描 TXT 得到的条目字段相同）"""
+        content = _caption(data)
+        image_field = _field(data, IMAGE_FIELDS)
+        image = data.get(image_field) if image_field else None
+        image_path = ''
+        if isinstance(image, str) and image:
+            image_path = image if os.path.isabs(image) else os.path.join(os.path.dirname(self.path), image)
+        source_path = data.get('path') if isinstance(data.get('path'), str) else None
+        name = os.path.basename(source_path or '') or (
+            os.path.splitext(os.path.basename(image_path))[0] + '.txt' if image_path else f'{row}.txt'
+        )
+        return {
+            'path': self.row_path(row),
+            'name': name,
+            'size': len(content.encode('utf-8')),
+            'mtime': mtime,
+            'created_time': float(row),
+            'image_path': image_path,
+            'source_path': source_path,
+            'content': content,
+        }
+
+    def iter_entries(self, chunk_size: int = MANIFEST_CHUNK) -> Iterator[Tuple[List[dict], float]]:
+        """
+        逐块读取清单中的行（阻塞，应在后台线程中调用），同时记录随机读取需要的行偏移
+
+        加载期间已读取的行可以随机读取（行偏移只追加，不加锁）；每一块可以在不同的线程中继续
+
+        Yields:
+            (一块数据集条目, 已读取的比例)
+        """
+        file_stat = os.stat(self.path)
+        with self._lock:
+            self._stat = (file_stat.st_size, file_stat.st_mtime)
+            self._offsets = array('Q')
+            self._group_starts = []
+            self._group_cache = None
+            self._hashes = array('Q')
+            self.rows = 0
+        rows = self._iter_jsonl(file_stat) if self.format == 'jsonl' else self._iter_parquet()
+        chunk = []
+        for data, fraction in rows:
+            entry = self._entry(self.rows, data, file_stat.st_mtime)
+            self._hashes.append(_caption_hash(entry['content']))
+            self.rows += 1
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                yield chunk, fraction
+                chunk = []
+        yield chunk, 1.0
+
+    def _iter_jsonl(self, file_stat):
+        """逐行解析 JSONL，记录每行的偏移，返回 (行, 已读取的比例)"""
+        offset = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                start, offset = offset, offset + len(line)
+                if not line.strip():
+                    continue
+                data = _parse_line(line)
+                if not self._offsets:
+                    self._caption_field = _field(data, CAPTION_FIELDS) or 'caption'
+                self._offsets.append(start)
+                yield data, offset / file_stat.st_size
+
+    def _iter_parquet(self):
+        """按行组读取 Parquet（只读取需要的列），返回 (行, 已读取的比例)"""
+        parquet = pq.ParquetFile(self.path)
+        names = parquet.schema_arrow.names
+        self._caption_field = _field(dict.fromkeys(names), CAPTION_FIELDS) or 'caption'
+        columns = [name for name in names if name in CAPTION_FIELDS + IMAGE_FIELDS + ('path',)]
+        total = parquet.metadata.num_rows or 1
+        row = 0
+        for group in range(parquet.num_row_groups):
+            self._group_starts.append(row)
+            for data in parquet.read_row_group(group, columns=columns).to_pylist():
+                row += 1
+                yield data, row / total
+
+    def _ensure_current(self):
+        """清单在加载后被其他程序修改时，重新记录行偏移（持有锁时调用）"""
+        file_stat = os.stat(self.path)
+        if (file_stat.st_size, file_stat.st_mtime) == self._stat:
+            return
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        self._group_cache = None
+        if self.format == 'jsonl':
+            offsets = array('Q')
+            offset = 0
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    if line.strip():
+                        offsets.append(offset)
+                    offset += len(line)
+            self._offsets = offsets
+            rows = len(offsets)
+        else:
+            metadata = pq.ParquetFile(self.path).metadata
+            self._group_starts = []
+            rows = 0
+            for group in range(metadata.num_row_groups):
+                self._group_starts.append(rows)
+                rows += metadata.row_group(group).num_rows
+        # 新增的行没有读取记录，写回时按读取时的内容比较
+        while len(self._hashes) < rows:
+            self._hashes.append(0)
+        self.rows = rows
+        self._stat = (file_stat.st_size, file_stat.st_mtime)
+
+    def _read_row(self, row: int) -> dict:
+        """读取一行的原始数据（持有锁时调用）"""
+        if self.format == 'jsonl':
+            if self._reader is None:
+                self._reader = open(self.path, 'rb')
+            self._reader.seek(self._offsets[row])
+            return _parse_line(self._reader.readline())
+        group = bisect_right(self._group_starts, row) - 1
+        if self._group_cache is None or self._group_cache[0] != group:
+            self._group_cache = (group, pq.ParquetFile(self.path).read_row_group(group).to_pylist())
+        return self._group_cache[1][row - self._group_starts[group]]
+
+    def read(self, file_path: str) -> str:
+        """随机读取一行的标注"""
+        return self.entry(file_path)['content']
+
+    def entry(self, file_path: str) -> dict:
+        """随机读取一行，返回数据集条目（包括内容），并以读到的标注作为之后写回时比较的基准"""
+        with self._lock:
+            self._ensure_current()
+            row = self.row_of(file_path)
+            entry = self._entry(row, self._read_row(row), self._stat[1])
+            self._hashes[row] = _caption_hash(entry['content'])
+            return entry
+
+    def write(self, contents: Dict[str, str], force: bool = False) -> Dict[str, str]:
+        """
+        把修改后的标注写回清单（阻塞，应在后台线程中调用）
+
+        逐块复制原清单到临时文件，只替换修改的行，再原子替换原文件
+
+        Args:
+            contents: 列表中的路径 -> 新的标注
+            force: 磁盘上的标注在读取后被其他程序修改时仍然覆盖
+
+        Returns:
+            没有写入的冲突行：路径 -> 冲突原因（'modified' / 'deleted' / 'invalid'，
+            'invalid' 表示磁盘上的行不是 JSON 对象，即使 force 也不会覆盖）
+        """
+        with self._lock:
+            if not os.path.exists(self.path):
+                raise SaveConflict('deleted')
+            self._ensure_current()
+            edits, conflicts = {}, {}
+            for file_path, content in contents.items():
+                try:
+                    edits[self.row_of(file_path)] = content
+                except KeyError:
+                    conflicts[file_path] = 'deleted'
+            if not edits:
+                return conflicts
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+            temp_path = _temp_path(self.path)
+            try:
+                if self.format == 'jsonl':
+                    skipped = self._rewrite_jsonl(temp_path, edits, force)
+                else:
+                    skipped = self._rewrite_parquet(temp_path, edits, force)
+                _replace(temp_path, self.path)
+            except BaseException:
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+                raise
+            self._group_cache = None
+            file_stat = os.stat(self.path)
+            self._stat = (file_stat.st_size, file_stat.st_mtime)
+            conflicts.update((self.row_path(row), reason) for row, reason in skipped.items())
+            return conflicts
+
+    def _accept(self, row: int, current: str, new: str, force: bool) -> bool:
+        """磁盘上的标注与读取时相同（或 force）时接受修改，并更新比较的基准"""
+        if not force and _caption_hash(current) != self._hashes[row]:
+            return False
+        self._hashes[row] = _caption_hash(new)
+        return True
+
+    def _rewrite_jsonl(self, temp_path: str, edits: Dict[int, str], force: bool) -> Dict[int, str]:
+        offsets = array('Q')
+        skipped = {}
+        row = 0
+        position = 0
+        with open(self.path, 'rb') as source, open(temp_path, 'wb') as target:
+            for line in source:
+                if line.strip():
+                    if row in edits:
+                        data = _load_object(line)
+                        if data is None:
+                            # 无法解析的行原样保留，不用只含标注的新行替换掉原有内容
+                            skipped[row] = 'invalid'
+                        elif self._accept(row, _caption(data), edits[row], force):
+                            data[_field(data, CAPTION_FIELDS) or self._caption_field] = edits[row]
+                            line = (json.dumps(data, ensure_ascii=False) + '\n').encode('utf-8')
+                        else:
+                            skipped[row] = 'modified'
+                    offsets.append(position)
+                    row += 1
+                target.write(line)
+                position += len(line)
+            target.flush()
+            os.fsync(target.fileno())
+        self._offsets = offsets
+        return skipped
+
+    def _rewrite_parquet(self, temp_path: str, edits: Dict[int, str], force: bool) -> Dict[int, str]:
+        parquet = pq.ParquetFile(self.path)
+        starts, skipped = [], {}
+        row = 0
+        writer = None
+        try:
+            for group in range(parquet.num_row_groups):
+                table = parquet.read_row_group(group)
+                starts.append(row)
+                changed = [i for i in range(table.num_rows) if row + i in edits]
+                if changed:
+                    index = table.schema.get_field_index(self._caption_field)
+                    values = table.column(index).to_pylist() if index >= 0 else [''] * table.num_rows
+                    for i in changed:
+                        current = values[i] if isinstance(values[i], str) else ''
+                        if self._accept(row + i, current, edits[row + i], force):
+                            values[i] = edits[row + i]
+                        else:
+                            skipped[row + i] = 'modified'
+                    column = pa.array(values, pa.string())
+                    if index >= 0:
+                        table = table.set_column(index, self._caption_field, column)
+                    else:
+                        table = table.append_column(self._caption_field, column)
+                if writer is None:
+                    writer = pq.ParquetWriter(temp_path, table.schema)
+                writer.write_table(table)
+                row += table.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+        self._group_starts = starts
+        return skipped
+
+    def close(self):
+        with self._lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
@@ -0,0 +1,128 @@
+"""
+性能计时
+记录界面关键操作（加载、点击、刷新列表、排序、保存、图片预览）的耗时，
+供调试面板和 /api/metrics 接口查看；每种操作只保留最近一段时间的样本用于计算分位数
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict
+
+DEFAULT_WINDOW = 1000  # 每种操作保留的最近样本数
+
+
+class OperationStats:
+    """单种操作的耗时统计（秒）"""
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+        self.samples.append(seconds)
+
+    def summary(self) -> dict:
+        """汇总为毫秒，分位数按最近的样本计算"""
+        ordered = sorted(self.samples)
+
+        def percentile(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+        return {
+            'count': self.count,
+            'total_ms': round(self.total * 1000, 3),
+            'mean_ms': round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            'p50_ms': round(percentile(0.50), 3),
+            'p95_ms': round(percentile(0.95), 3),
+            'p99_ms': round(percentile(0.99), 3),
+            'max_ms': round(self.max * 1000, 3),
+            'last_ms': round(self.last * 1000, 3),
+        }
+
+
+class PerfMetrics:
+    """进程内的操作耗时记录（线程安全）"""
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        """
+        初始化计时记录
+
+        Args:
+            window: 每种操作保留的最近样本数
+        """
+        self.window = window
+        self.version = 0  # 每次记录递增，面板据此判断是否需要刷新
+        self._operations: Dict[str, OperationStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        """记录一次操作的耗时"""
+        with self._lock:
+            stats = self._operations.get(name)
+            if stats is None:
+                stats = self._operations[name] = OperationStats(self.window)
+            stats.record(seconds)
+            self.version += 1
+
+    @contextmanager
+    def measure(self, name: str):
+        """计时一段代码"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """所有操作的耗时汇总：操作名 -> {count, total_ms, mean_ms, p50_ms, p95_ms, p99_ms, max_ms, last_ms}"""
+        with self._lock:
+            return {name: stats.summary() for name, stats in sorted(self._operations.items())}
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+            self.version += 1
+
+
+metrics = PerfMetrics()  # 进程内共享的计时记录
+
+
+def timed(name: str):
+    """
+    记录函数耗时的装饰器，支持普通函数和协程函数
+
+    协程函数的耗时包括其中的等待（后台读取、写入等），应只用于不等待用户操作的函数
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    metrics.record(name, time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
@@ -0,0 +1,201 @@
+"""
+保存队列
+把内容缓存中未保存的修改批量、原子地写入磁盘（在线程池中执行，不阻塞事件循环）
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from content_cache import ContentCache
+from dataset_scan import atomic_write_text
+
+
+class SaveConflict(Exception):
+    """磁盘上的文件在编辑期间被其他程序修改或删除"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason  # 'modified'、'deleted'，或清单中的行无法解析时为 'invalid'
+
+
+class SavePipeline:
+    """异步保存队列"""
+
+    def __init__(self, cache: ContentCache, write: Callable[[str, str], None] = atomic_write_text,
+                 max_workers: int = 4):
+        """
+        初始化保存队列
+
+        Args:
+            cache: 内容缓存，未保存的修改从这里读取，保存成功后标记为已保存
+            write: 写入单个文件的函数
+            max_workers: 写入线程数
+        """
+        self.cache = cache
+        self.write = write
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='save')
+        self.errors: Dict[str, str] = {}  # 文件路径 -> 最近一次保存失败的原因
+        self.conflicts: Dict[str, str] = {}  # 文件路径 -> 冲突原因（见 SaveConflict），解决前不会保存
+        self.saving: Set[str] = set()  # 正在写入的文件
+        # 写入期间又被请求保存的文件 -> 合并后的下一次写入结果，同一文件的多个请求共用一个
+        self._waiting: Dict[str, asyncio.Future] = {}
+        self._forced: Set[str] = set()  # 其中要求忽略冲突的文件
+
+    async def save(self, paths: Iterable[str], expected: Optional[Dict[str, tuple]] = None,
+                   force: bool = False) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+        """
+        保存一批文件
+
+        正在写入的文件不会重复提交：写入完成后若仍有未保存的修改会合并再保存一次，
+        这些文件的保存结果（包括失败）在合并的写入完成后返回
+
+        Args:
+            paths: 要保存的文件
+            expected: 文件路径 -> 编辑开始时磁盘上的 (大小, 修改时间)；写入前若不一致则记为冲突，
+                写入成功后原地更新为新的 (大小, 修改时间)
+            force: 忽略冲突，直接覆盖磁盘上的文件
+
+        Returns:
+            (已保存的 [(路径, 内容)], 失败的 [(路径, 错误信息)])，冲突的文件同时记录在 conflicts 中
+        """
+        expected = {} if expected is None else expected
+        saved_all, errors_all = [], []
+        batch, waits = {}, {}
+        for file_path in paths:
+            if force:
+                self.conflicts.pop(file_path, None)
+            elif file_path in self.conflicts:
+                errors_all.append((file_path, self.conflicts[file_path]))
+                continue
+            if file_path in self.saving:
+                future = self._waiting.get(file_path)
+                if future is None:
+                    future = self._waiting[file_path] = asyncio.get_event_loop().create_future()
+                if force:
+                    self._forced.add(file_path)
+                waits[file_path] = future
+                continue
+            content = self.cache.get(file_path)
+            if content is not None:
+                batch[file_path] = content
+        forced = set(batch) if force else set()
+        waiters: Dict[str, asyncio.Future] = {}
+        while batch:
+            try:
+                outcomes = await self._write_batch(batch, expected, forced)
+            except BaseException as e:
+                # 不让等待这些文件的请求一直挂起
+                pending = list(waiters.values())
+                pending.extend(self._waiting.pop(file_path) for file_path in batch if file_path in self._waiting)
+                for future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                raise
+            for file_path, (content, error, _) in outcomes.items():
+                if error is None:
+                    saved_all.append((file_path, content))
+                else:
+                    errors_all.append((file_path, error))
+            for file_path, future in waiters.items():
+                future.set_result(outcomes[file_path])
+            # 写入期间又被请求保存的文件：仍有修改时再写入一次，否则本次写入已包含其内容
+            batch, waiters, forced = {}, {}, set()
+            for file_path in outcomes:
+                future = self._waiting.pop(file_path, None)
+                if future is None:
+                    continue
+                force_next = file_path in self._forced
+                self._forced.discard(file_path)
+                if self.cache.is_dirty(file_path) and (force_next or file_path not in self.conflicts):
+                    if force_next:
+                        self.conflicts.pop(file_path, None)
+                        forced.add(file_path)
+                    batch[file_path] = self.cache.get(file_path)
+                    waiters[file_path] = future
+                else:
+                    future.set_result(outcomes[file_path])
+        for file_path, future in waits.items():
+            content, error, file_stat = await future
+            if error is None:
+                if file_path in expected:
+                    expected[file_path] = file_stat
+                saved_all.append((file_path, content))
+            else:
+                errors_all.append((file_path, error))
+        return saved_all, errors_all
+
+    async def _write_batch(self, batch: Dict[str, str], expected: Dict[str, tuple],
+                           forced: Set[str]) -> Dict[str, tuple]:
+        """写入一批文件（forced 中的文件不检查冲突），返回 路径 -> (内容, 错误信息或 None, 写入后的 (大小, 修改时间))"""
+        loop = asyncio.get_event_loop()
+        self.saving.update(batch)
+
+        def write_all(items):
+            results = []
+            for file_path, content in items:
+                try:
+                    if file_path not in forced and file_path in expected:
+                        self._check_unchanged(file_path, expected[file_path])
+                    self.write(file_path, content)
+                    file_stat = os.stat(file_path)
+                    results.append((file_path, content, None, (file_stat.st_size, file_stat.st_mtime)))
+                except SaveConflict as e:
+                    results.append((file_path, content, e, None))
+                except Exception as e:
+                    results.append((file_path, content, str(e), None))
+            return results
+
+        items = list(batch.items())
+        chunks = [items[i::self.max_workers] for i in range(min(self.max_workers, len(items)))]
+        try:
+            results = await asyncio.gather(*(loop.run_in_executor(self.executor, write_all, chunk) for chunk in chunks))
+        finally:
+            self.saving.difference_update(batch)
+
+        outcomes = {}
+        for file_path, content, error, file_stat in (result for chunk in results for result in chunk):
+            if error is None:
+                self.errors.pop(file_path, None)
+                if file_path in expected:
+                    # 再次保存（包括写入期间排队的保存）时以本次写入的结果为准
+                    expected[file_path] = file_stat
+                # 写入期间内容未再修改时才标记为已保存
+                if self.cache.get(file_path) == content:
+                    self.cache.mark_clean(file_path)
+            elif isinstance(error, SaveConflict):
+                self.conflicts[file_path] = error.reason
+                error = error.reason
+            else:
+                self.errors[file_path] = error
+            outcomes[file_path] = (content, error, file_stat)
+        return outcomes
+
+    @staticmethod
+    def _check_unchanged(file_path: str, expected: tuple):
+        """确认磁盘上的文件与编辑开始时一致"""
+        try:
+            file_stat = os.stat(file_path)
+        except FileNotFoundError:
+            raise SaveConflict('deleted')
+        if (file_stat.st_size, file_stat.st_mtime) != tuple(expected):
+            raise SaveConflict('modified')
+
+    def mark_conflict(self, file_path: str, reason: str):
+        """记录外部修改造成的冲突"""
+        self.conflicts[file_path] = reason
+
+    def resolve_conflict(self, file_path: str):
+        """冲突已处理（覆盖或重新加载）"""
+        self.conflicts.pop(file_path, None)
+
+    def discard(self, file_path: str):
+        """文件从列表移除时清除其保存状态"""
+        self.errors.pop(file_path, None)
+        self.conflicts.pop(file_path, None)
+
+    def clear(self):
+        self.errors.clear()
+        self.conflicts.clear()
@@ -0,0 +1,269 @@
+"""
+排序索引
+按预先计算的排序键维护有序的文件列表，文件加入、移除或排序键变化时只在一个块内插入或删除，
+不需要重新排序整个列表；同一个索引可以按正序或倒序查看，位置查询通过块的前缀计数二分完成
+
+存储方式为分块有序表：每块最多 2 × block_size 个 (排序键, 路径)，查找块和块内位置都是二分（O(log n)），
+插入和删除只移动一个块内的元素；按位置访问时使用各块长度的前缀和（修改后首次访问时按块数重建）
+"""
+
+import re
+from bisect import bisect_left, bisect_right, insort
+from itertools import accumulate
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_BLOCK_SIZE = 1000
+
+_DIGITS = re.compile(r'(\d+)')
+
+
+def natural_key(name: str) -> tuple:
+    """自然排序键：文件名中的数字按数值比较（img2 排在 img10 之前），字母不区分大小写"""
+    parts = _DIGITS.split(name.lower())
+    # split 的结果中偶数位置总是文本、奇数位置总是数字，逐位比较时类型一致
+    parts[1::2] = [int(part) for part in parts[1::2]]
+    return tuple(parts)
+
+
+class SortIndex:
+    """按排序键有序排列的文件路径"""
+
+    def __init__(self, key_func: Callable[[str], object], block_size: int = DEFAULT_BLOCK_SIZE):
+        """
+        初始化排序索引
+
+        Args:
+            key_func: 文件路径 -> 排序键，每个文件只在加入或调用 update 时计算一次；
+                排序键相同的文件按路径排序
+            block_size: 块的大小
+        """
+        self.key_func = key_func
+        self.block_size = block_size
+        self.version = 0  # 每次顺序变化递增
+        self._items: Dict[str, tuple] = {}  # 文件路径 -> (排序键, 路径)
+        self._blocks: List[List[tuple]] = []  # 有序的块
+        self._maxes: List[tuple] = []  # 每块的最大元素
+        self._offsets: Optional[List[int]] = None  # 每块之前的元素个数，修改后置为 None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, file_path) -> bool:
+        return file_path in self._items
+
+    def __iter__(self) -> Iterator[str]:
+        for block in self._blocks:
+            for _, file_path in block:
+                yield file_path
+
+    def __reversed__(self) -> Iterator[str]:
+        for block in reversed(self._blocks):
+            for _, file_path in reversed(block):
+                yield file_path
+
+    def add(self, file_path: str):
+        """加入一个文件（已存在时按新的排序键更新位置）"""
+        if file_path in self._items:
+            self.update(file_path)
+            return
+        item = (self.key_func(file_path), file_path)
+        self._items[file_path] = item
+        self._insert(item)
+
+    def discard(self, file_path: str):
+        """移除一个文件（不存在时忽略）"""
+        item = self._items.pop(file_path, None)
+        if item is not None:
+            self._remove(item)
+
+    def update(self, file_path: str) -> bool:
+        """重新计算文件的排序键，位置变化时返回 True"""
+        item = self._items.get(file_path)
+        if item is None:
+            return False
+        new_item = (self.key_func(file_path), file_path)
+        if new_item == item:
+            return False
+        self._remove(item)
+        self._items[file_path] = new_item
+        self._insert(new_item)
+        return True
+
+    def add_many(self, paths: Iterable[str]):
+        """加入一批文件；数量与已有文件相当时合并后整体重建，比逐个插入快"""
+        paths = [file_path for file_path in dict.fromkeys(paths) if file_path not in self._items]
+        if len(paths) * 4 < len(self._items):
+            for file_path in paths:
+                self.add(file_path)
+            return
+        for file_path in paths:
+            self._items[file_path] = (self.key_func(file_path), file_path)
+        self._rebuild()
+
+    def discard_many(self, paths: Iterable[str]):
+        """移除一批文件；数量较多时整体重建"""
+        paths = [file_path for file_path in set(paths) if file_path in self._items]
+        if len(paths) * 4 < len(self._items):
+            for file_path in paths:
+                self.discard(file_path)
+            return
+        for file_path in paths:
+            del self._items[file_path]
+        self._rebuild()
+
+    def update_many(self, paths: Iterable[str]) -> int:
+        """重新计算一批文件的排序键，返回位置变化的文件数"""
+        return sum(self.update(file_path) for file_path in paths)
+
+    def rebuild(self):
+        """重新计算所有文件的排序键（排序键依赖的数据整体变化时调用）"""
+        for file_path in self._items:
+            self._items[file_path] = (self.key_func(file_path), file_path)
+        self._rebuild()
+
+    def clear(self):
+        self._items.clear()
+        self._blocks = []
+        self._maxes = []
+        self._offsets = None
+        self.version += 1
+
+    def index(self, file_path: str) -> int:
+        """返回文件在升序中的位置，不存在时抛出 KeyError"""
+        item = self._items[file_path]
+        i = bisect_left(self._maxes, item)
+        return self._block_offsets()[i] + bisect_left(self._blocks[i], item)
+
+    def at(self, position: int) -> str:
+        """返回升序中第 position 个文件"""
+        if not 0 <= position < len(self._items):
+            raise IndexError('sort index out of range')
+        offsets = self._block_offsets()
+        i = bisect_right(offsets, position) - 1
+        return self._blocks[i][position - offsets[i]][1]
+
+    def slice(self, start: int, stop: int) -> List[str]:
+        """返回升序中 [start, stop) 范围内的文件"""
+        start, stop = max(0, start), min(stop, len(self._items))
+        if start >= stop:
+            return []
+        offsets = self._block_offsets()
+        i = bisect_right(offsets, start) - 1
+        result = []
+        position = start - offsets[i]
+        while len(result) < stop - start:
+            block = self._blocks[i]
+            result.extend(file_path for _, file_path in block[position:position + stop - start - len(result)])
+            i += 1
+            position = 0
+        return result
+
+    def view(self, reverse: bool = False) -> Tuple['SortedFiles', 'FilePositions']:
+        """返回按正序或倒序查看的 (文件列表, 位置映射)"""
+        return SortedFiles(self, reverse), FilePositions(self, reverse)
+
+    def _block_offsets(self) -> List[int]:
+        if self._offsets is None:
+            self._offsets = [0, *accumulate(len(block) for block in self._blocks)]
+        return self._offsets
+
+    def _insert(self, item: tuple):
+        self._offsets = None
+        self.version += 1
+        if not self._blocks:
+            self._blocks.append([item])
+            self._maxes.append(item)
+            return
+        i = bisect_left(self._maxes, item)
+        if i == len(self._maxes):
+            # 比所有元素都大，追加到最后一块
+            i -= 1
+            self._blocks[i].append(item)
+            self._maxes[i] = item
+        else:
+            insort(self._blocks[i], item)
+        block = self._blocks[i]
+        if len(block) > 2 * self.block_size:
+            half = len(block) // 2
+            self._blocks[i:i + 1] = [block[:half], block[half:]]
+            self._maxes[i:i + 1] = [block[half - 1], block[-1]]
+
+    def _remove(self, item: tuple):
+        self._offsets = None
+        self.version += 1
+        i = bisect_left(self._maxes, item)
+        block = self._blocks[i]
+        del block[bisect_left(block, item)]
+        if not block:
+            del self._blocks[i]
+            del self._maxes[i]
+        else:
+            self._maxes[i] = block[-1]
+
+    def _rebuild(self):
+        items = sorted(self._items.values())
+        size = self.block_size
+        self._blocks = [items[i:i + size] for i in range(0, len(items), size)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._offsets = None
+        self.version += 1
+
+
+class SortedFiles:
+    """排序索引的只读列表视图，支持 len、下标、切片和迭代，倒序视图不复制数据"""
+
+    def __init__(self, index: SortIndex, reverse: bool = False):
+        self.index = index
+        self.reverse = reverse
+
+    @property
+    def version(self) -> int:
+        return self.index.version
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, file_path) -> bool:
+        return file_path in self.index
+
+    def __iter__(self) -> Iterator[str]:
+        return reversed(self.index) if self.reverse else iter(self.index)
+
+    def __getitem__(self, position):
+        size = len(self.index)
+        if isinstance(position, slice):
+            start, stop, step = position.indices(size)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            if not self.reverse:
+                return self.index.slice(start, stop)
+            # 倒序视图的 [start, stop) 对应升序的 [size - stop, size - start)
+            return self.index.slice(size - stop, size - start)[::-1]
+        if position < 0:
+            position += size
+        if not 0 <= position < size:
+            raise IndexError('sorted files index out of range')
+        return self.index.at(size - 1 - position if self.reverse else position)
+
+
+class FilePositions:
+    """排序索引的位置映射视图：文件路径 -> 在列表视图中的位置"""
+
+    def __init__(self, index: SortIndex, reverse: bool = False):
+        self.index = index
+        self.reverse = reverse
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, file_path) -> bool:
+        return file_path in self.index
+
+    def __getitem__(self, file_path: str) -> int:
+        position = self.index.index(file_path)
+        return len(self.index) - 1 - position if self.reverse else position
+
+    def get(self, file_path: str, default=None):
+        if file_path not in self.index:
+            return default
+        return self[file_path]
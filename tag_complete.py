@@ -0,0 +1,207 @@
+"""
+标签补全
+在整个数据集的标签表上按前缀查找候选标签，并按包含该标签的文件数排序
+
+标签按字典序存放在数组中，前缀对应数组中连续的一段；各标签的文件数存放在与之对齐的最大值线段树中，
+取一段中出现最多的 k 个标签只需 O(k log n)，与前缀匹配的标签数无关。
+标签索引变化时只记录变化的标签，查询前再增量更新：已有标签只更新线段树上的一条路径，
+新标签先放入较小的待合并表，积累到一定数量（或删除的标签过多）时才重新建立整个数组
+"""
+
+import bisect
+import heapq
+from array import array
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+MERGE_THRESHOLD = 4096  # 待合并的新标签超过该数量时重新建立数组
+DEFAULT_LIMIT = 10  # 默认返回的候选数
+
+
+def _prefix_end(prefix: str) -> str:
+    """字典序中所有以 prefix 开头的字符串之后的第一个字符串（prefix 不为空）"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def edited_tag(previous: str, content: str) -> Optional[Tuple[int, int, str]]:
+    """
+    根据编辑前后的文本找出正在输入的标签（服务端没有光标位置，以新插入内容的末尾作为光标）
+
+    Args:
+        previous: 编辑前的文本
+        content: 编辑后的文本
+
+    Returns:
+        (标签在 content 中的起点, 终点, 光标前已输入的部分)；删除内容或光标前没有输入时返回 None
+    """
+    if len(content) <= len(previous):
+        return None
+    start = 0
+    limit = len(previous)
+    while start < limit and previous[start] == content[start]:
+        start += 1
+    cursor, old_end = len(content), len(previous)
+    while old_end > start and previous[old_end - 1] == content[cursor - 1]:
+        old_end -= 1
+        cursor -= 1
+    segment_start = max(content.rfind(',', 0, cursor), content.rfind('\n', 0, cursor)) + 1
+    ends = [index for index in (content.find(',', cursor), content.find('\n', cursor)) if index >= 0]
+    segment_end = min(ends) if ends else len(content)
+    typed = content[segment_start:cursor].lstrip()
+    if not typed:
+        return None
+    return segment_start, segment_end, typed
+
+
+class TagVocabulary:
+    """按前缀查找标签并按文件数排序的标签表（由 TagIndex 维护，与之共用倒排表）"""
+
+    def __init__(self, postings: Dict[str, Set[str]]):
+        """
+        初始化标签表
+
+        Args:
+            postings: 标签索引的倒排表（标签 -> 文件集合），文件数取自其中集合的大小
+        """
+        self._postings = postings
+        # 倒排表发生变化、尚未同步的标签，由标签索引直接写入；为 None 时表示需要重新建立，不再记录
+        self.changed: Optional[Set[str]] = None
+        self._tags: List[str] = []  # 按字典序排列的标签（可能包含文件数已为 0 的标签）
+        self._positions: Dict[str, int] = {}  # 标签 -> 在 _tags 中的位置
+        self._size = 1  # 线段树的叶子数（2 的幂）
+        self._tree = array('l', [0, 0])  # 最大值线段树，叶子为 _tags 中各标签的文件数
+        self._dead = 0  # _tags 中文件数为 0 的标签数
+        self._pending: List[str] = []  # 尚未合并到 _tags 的新标签（有序）
+
+    def clear(self):
+        self.changed = None
+        self._tags = []
+        self._positions = {}
+        self._size = 1
+        self._tree = array('l', [0, 0])
+        self._dead = 0
+        self._pending = []
+
+    def _rebuild(self):
+        """按当前的倒排表重新建立数组和线段树"""
+        tags = sorted(self._postings)
+        size = 1
+        while size < len(tags):
+            size *= 2
+        tree = array('l', [0]) * (2 * size)
+        tree[size:size + len(tags)] = array('l', [len(self._postings[tag]) for tag in tags])
+        for node in range(size - 1, 0, -1):
+            left, right = tree[2 * node], tree[2 * node + 1]
+            tree[node] = left if left > right else right
+        self._tags = tags
+        self._positions = {tag: position for position, tag in enumerate(tags)}
+        self._size = size
+        self._tree = tree
+        self._dead = 0
+        self._pending = []
+        self.changed = set()
+
+    def _set_count(self, position: int, count: int):
+        """更新一个标签的文件数，并沿线段树向上更新最大值"""
+        tree = self._tree
+        node = self._size + position
+        if (tree[node] == 0) != (count == 0):
+            self._dead += 1 if count == 0 else -1
+        tree[node] = count
+        node //= 2
+        while node:
+            left, right = tree[2 * node], tree[2 * node + 1]
+            value = left if left > right else right
+            if tree[node] == value:
+                break
+            tree[node] = value
+            node //= 2
+
+    def _sync(self):
+        """把记录的变化同步到数组和线段树"""
+        changed = self.changed
+        if changed is not None and not changed:
+            return
+        if changed is None or len(self._pending) + len(changed) > MERGE_THRESHOLD:
+            self._rebuild()
+            return
+        pending = self._pending
+        for tag in changed:
+            position = self._positions.get(tag)
+            posting = self._postings.get(tag)
+            if position is not None:
+                self._set_count(position, len(posting) if posting else 0)
+            elif posting:
+                index = bisect.bisect_left(pending, tag)
+                if index == len(pending) or pending[index] != tag:
+                    pending.insert(index, tag)
+        changed.clear()
+        if len(pending) > MERGE_THRESHOLD or self._dead * 4 > len(self._tags) + MERGE_THRESHOLD:
+            self._rebuild()
+
+    def _range(self, tags: List[str], prefix: str) -> Tuple[int, int]:
+        if not prefix:
+            return 0, len(tags)
+        return bisect.bisect_left(tags, prefix), bisect.bisect_left(tags, _prefix_end(prefix))
+
+    def prefix_tags(self, prefix: str) -> Iterator[str]:
+        """返回以 prefix 开头的所有标签（不保证顺序）"""
+        self._sync()
+        for tags in (self._tags, self._pending):
+            start, end = self._range(tags, prefix)
+            for tag in tags[start:end]:
+                if tag in self._postings:
+                    yield tag
+
+    def complete(self, prefix: str, limit: int = DEFAULT_LIMIT) -> List[Tuple[str, int]]:
+        """
+        以 prefix 开头、文件数最多的标签
+
+        Args:
+            prefix: 已规范化（小写）的前缀，为空时返回整个数据集中最常用的标签
+            limit: 最多返回的候选数
+
+        Returns:
+            [(标签, 文件数)]，按文件数从多到少排列，文件数相同时按标签排序
+        """
+        self._sync()
+        start, end = self._range(self._tags, prefix)
+        results = []
+        if start < end:
+            tree, size = self._tree, self._size
+            levels = size.bit_length()
+
+            def item(node):
+                # 文件数相同时先展开最靠左（字典序最小）的节点，同一位置先展开更深的节点，
+                # 避免逐层展开整棵树，结果中文件数相同的标签也按字典序排列
+                shift = levels - node.bit_length()
+                return -tree[node], node << shift, shift, node
+
+            # 把 [start, end) 分解为线段树上的 O(log n) 个节点，再按最大值逐个展开
+            heap = []
+            low, high = start + size, end + size
+            while low < high:
+                if low & 1:
+                    heap.append(item(low))
+                    low += 1
+                if high & 1:
+                    high -= 1
+                    heap.append(item(high))
+                low //= 2
+                high //= 2
+            heapq.heapify(heap)
+            while heap and len(results) < limit:
+                count, _, _, node = heapq.heappop(heap)
+                if count == 0:
+                    break
+                if node >= size:
+                    results.append((self._tags[node - size], -count))
+                else:
+                    heapq.heappush(heap, item(2 * node))
+                    heapq.heappush(heap, item(2 * node + 1))
+        start, end = self._range(self._pending, prefix)
+        for tag in self._pending[start:end]:
+            posting = self._postings.get(tag)
+            if posting:
+                results.append((tag, len(posting)))
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results[:limit]
@@ -0,0 +1,248 @@
+"""
+标签搜索
+基于倒排索引的标签检索，支持与 / 或 / 非、前缀查询和正则匹配，并可随文本修改增量更新
+
+查询语法：
+    1girl, blue hair        逗号或 AND 连接：同时包含
+    red hair | blue hair    竖线或 OR 连接：包含其一
+    -hat / NOT hat          排除（以 - 开头的标签本身存在时按标签匹配，也可以写作 \\-_-）
+    blue*                   前缀匹配
+    /^(red|blue) hair$/     正则匹配（对单个标签），正则中的逗号和竖线不作为连接符
+"""
+
+import re
+import sys
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from tag_complete import DEFAULT_LIMIT, MERGE_THRESHOLD, TagVocabulary
+from tag_stats import TagStatistics
+
+# 查询中的连接符（两侧的空白一并去掉）
+_SEPARATOR_PATTERN = re.compile(r'\s*(,|\||\s+AND\s+|\s+OR\s+)\s*')
+_NEGATIONS = ('', '-', 'NOT')  # 正则查询词前面允许出现的内容
+
+
+def _regex_end(query: str, start: int) -> Optional[int]:
+    """start 处的 / 开始一个正则查询词时，返回结尾 / 的位置（其后为查询结尾或连接符），否则返回 None"""
+    end = query.find('/', start + 1)
+    while end >= 0:
+        if query[end - 1] != '\\' and (not query[end + 1:].strip() or _SEPARATOR_PATTERN.match(query, end + 1)):
+            return end
+        end = query.find('/', end + 1)
+    return None
+
+
+def tokenize_query(query: str) -> List[List[str]]:
+    """
+    把查询拆分为子句：[[子句 1 中用“或”连接的查询词], [子句 2 ...], ...]
+
+    完整的 /正则/ 先作为一个查询词识别出来，其中的逗号、竖线等不会被当作连接符
+    """
+    clauses: List[List[str]] = [[]]
+    term_start = position = 0
+    while position < len(query):
+        if query[position] == '/' and query[term_start:position].strip() in _NEGATIONS:
+            end = _regex_end(query, position)
+            if end is not None:
+                position = end + 1
+                continue
+        match = _SEPARATOR_PATTERN.match(query, position)
+        if match is None:
+            position += 1
+            continue
+        clauses[-1].append(query[term_start:position].strip())
+        if match.group(1).strip() in (',', 'AND'):
+            clauses.append([])
+        term_start = position = match.end()
+    clauses[-1].append(query[term_start:].strip())
+    return [[term for term in clause if term] for clause in clauses if any(clause)]
+
+
+def split_tags(content: str) -> List[str]:
+    """把逗号分隔的文本拆分为规范化（去空白、小写）的标签列表"""
+    tags = []
+    for line in content.splitlines():
+        for tag in line.split(','):
+            tag = tag.strip().lower()
+            if tag:
+                tags.append(tag)
+    return tags
+
+
+class TagIndex:
+    """标签倒排索引：标签 -> 包含该标签的文件集合"""
+
+    def __init__(self, stats: Optional[TagStatistics] = None, on_change: Optional[Callable[[str], None]] = None):
+        """
+        初始化索引
+
+        Args:
+            stats: 随索引一起增量更新的标签统计
+            on_change: 文件的标签发生变化时的回调（参数为文件路径）
+        """
+        self.stats = stats
+        self.on_change = on_change
+        self._postings: Dict[str, Set[str]] = {}  # 标签 -> 文件路径集合
+        self._doc_tags: Dict[str, Tuple[str, ...]] = {}  # 文件路径 -> 去重后的标签
+        self.vocabulary = TagVocabulary(self._postings)  # 排序后的标签表，用于前缀查询和补全
+
+    def update(self, file_path: str, content: str):
+        """添加或更新一个文件的标签（只处理新旧标签的差异）"""
+        new_tags = tuple(dict.fromkeys(sys.intern(tag) for tag in split_tags(content)))
+        old_tags = self._doc_tags.get(file_path, ())
+        if self.stats is not None:
+            self.stats.set_row(file_path, len(content), len(new_tags))
+        if new_tags == old_tags:
+            return
+        old_set = set(old_tags)
+        new_set = set(new_tags)
+        removed = old_set - new_set
+        added = new_set - old_set
+        if self.stats is not None:
+            self.stats.count_tags(added, removed)
+        for tag in removed:
+            self._remove_posting(tag, file_path)
+        for tag in added:
+            posting = self._postings.get(tag)
+            if posting is None:
+                self._postings[tag] = {file_path}
+            else:
+                posting.add(file_path)
+        changed = self.vocabulary.changed
+        if changed is not None:
+            changed |= added
+            changed |= removed
+            if len(changed) > MERGE_THRESHOLD:
+                # 大量变化（如加载数据集）时不再逐个记录，查询前整体重新建立
+                self.vocabulary.changed = None
+        self._doc_tags[file_path] = new_tags
+        if self.on_change is not None:
+            self.on_change(file_path)
+
+    def remove(self, file_path: str):
+        """从索引中移除一个文件"""
+        tags = self._doc_tags.pop(file_path, ())
+        for tag in tags:
+            self._remove_posting(tag, file_path)
+        if self.vocabulary.changed is not None:
+            self.vocabulary.changed.update(tags)
+        if self.stats is not None:
+            self.stats.count_tags((), tags)
+            self.stats.remove_row(file_path)
+
+    def clear(self):
+        """清空索引"""
+        self._postings.clear()
+        self._doc_tags.clear()
+        self.vocabulary.clear()
+        if self.stats is not None:
+            self.stats.clear()
+
+    def tags_of(self, file_path: str) -> Tuple[str, ...]:
+        """返回文件的标签（已规范化、去重）"""
+        return self._doc_tags.get(file_path, ())
+
+    def __contains__(self, file_path: str) -> bool:
+        return file_path in self._doc_tags
+
+    def __len__(self) -> int:
+        return len(self._doc_tags)
+
+    def complete(self, prefix: str, limit: int = DEFAULT_LIMIT) -> List[Tuple[str, int]]:
+        """
+        补全标签：返回以 prefix 开头、包含该标签的文件数最多的标签
+
+        Args:
+            prefix: 正在输入的标签（规范化方式与索引中的标签相同）
+            limit: 最多返回的候选数
+
+        Returns:
+            [(标签, 文件数)]，按文件数从多到少排列
+        """
+        return self.vocabulary.complete(prefix.lstrip().lower(), limit)
+
+    def search(self, query: str) -> Optional[Set[str]]:
+        """
+        执行查询
+
+        Args:
+            query: 查询字符串，语法见模块说明
+
+        Returns:
+            匹配的文件路径集合；查询为空时返回 None
+
+        Raises:
+            ValueError: 正则表达式无效
+        """
+        include: List[Set[str]] = []
+        exclude: List[Set[str]] = []
+        for terms in tokenize_query(query):
+            # 否定作用于整个子句，写在子句的第一个查询词前面
+            negate, terms[0] = self._split_negation(terms[0])
+            terms = [term for term in terms if term]
+            if not terms:
+                continue
+            if len(terms) == 1:
+                matched = self._match_term(terms[0])
+            else:
+                matched = set()
+                for term in terms:
+                    matched |= self._match_term(term)
+            (exclude if negate else include).append(matched)
+
+        if not include and not exclude:
+            return None
+        # 各子句的结果可能直接引用倒排表，这里只生成新集合，不修改它们
+        if include:
+            include.sort(key=len)
+            result = include[0].intersection(*include[1:])
+        else:
+            result = set(self._doc_tags)
+        if exclude:
+            result.difference_update(*exclude)
+        return result
+
+    def _split_negation(self, term: str) -> Tuple[bool, str]:
+        """
+        拆出查询词前面的否定
+
+        以 - 开头的词只有在它本身不是已有标签（例如 -_-）时才作为否定；\\- 开头表示 - 是标签的一部分
+        """
+        if term.startswith('\\-'):
+            return False, term[1:]
+        if term.startswith('NOT '):
+            return True, term[4:].strip()
+        if term.startswith('-') and len(term) > 1 and term.lower() not in self._postings:
+            return True, term[1:].strip()
+        return False, term
+
+    def _match_term(self, term: str) -> Set[str]:
+        """匹配单个查询词（返回的集合可能是倒排表本身，调用方不得修改）"""
+        if len(term) > 2 and term.startswith('/') and term.endswith('/'):
+            try:
+                pattern = re.compile(term[1:-1], re.IGNORECASE)
+            except re.error as e:
+                raise ValueError(str(e)) from e
+            return self._union(tag for tag in self._postings if pattern.search(tag))
+        term = term.lower()
+        if term.endswith('*'):
+            return self._union(self._prefix_tags(term[:-1]))
+        return self._postings.get(term, set())
+
+    def _prefix_tags(self, prefix: str) -> Iterable[str]:
+        """返回以 prefix 开头的所有标签"""
+        return self.vocabulary.prefix_tags(prefix)
+
+    def _union(self, tags: Iterable[str]) -> Set[str]:
+        result: Set[str] = set()
+        for tag in tags:
+            result |= self._postings[tag]
+        return result
+
+    def _remove_posting(self, tag: str, file_path: str):
+        posting = self._postings.get(tag)
+        if posting is None:
+            return
+        posting.discard(file_path)
+        if not posting:
+            del self._postings[tag]
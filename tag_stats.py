@@ -0,0 +1,116 @@
+"""
+标签统计
+记录数据集的标签频次、每个文件的文本长度和标签数，由标签索引在每次更新时按差异增量维护，
+不需要重新遍历全部文本；长度和标签数按列存储在 array 中，直方图可以直接在列上计算
+"""
+
+import heapq
+from array import array
+from collections import Counter
+from typing import Dict, List, Set, Tuple
+
+
+class TagStatistics:
+    """增量维护的标签统计"""
+
+    def __init__(self):
+        self.tag_counts: Counter = Counter()  # 标签 -> 包含该标签的文件数
+        self.lengths = array('L')  # 每行文件的文本长度（字符数）
+        self.tag_totals = array('L')  # 每行文件的标签数（去重后）
+        self.untagged: Set[str] = set()  # 没有任何标签的文件
+        self.version = 0  # 每次变化递增，界面据此判断是否需要刷新
+        self._rows: Dict[str, int] = {}  # 文件路径 -> 行号
+        self._paths: List[str] = []  # 行号 -> 文件路径
+
+    def set_row(self, file_path: str, length: int, tag_count: int):
+        """写入或更新一个文件的文本长度和标签数"""
+        row = self._rows.get(file_path)
+        if row is None:
+            self._rows[file_path] = len(self._paths)
+            self._paths.append(file_path)
+            self.lengths.append(length)
+            self.tag_totals.append(tag_count)
+        elif self.lengths[row] == length and self.tag_totals[row] == tag_count:
+            return
+        else:
+            self.lengths[row] = length
+            self.tag_totals[row] = tag_count
+        if tag_count:
+            self.untagged.discard(file_path)
+        else:
+            self.untagged.add(file_path)
+        self.version += 1
+
+    def remove_row(self, file_path: str):
+        """移除一个文件（用最后一行填补空位，保持各列紧凑）"""
+        row = self._rows.pop(file_path, None)
+        if row is None:
+            return
+        last = len(self._paths) - 1
+        if row != last:
+            moved = self._paths[last]
+            self._paths[row] = moved
+            self._rows[moved] = row
+            self.lengths[row] = self.lengths[last]
+            self.tag_totals[row] = self.tag_totals[last]
+        self._paths.pop()
+        self.lengths.pop()
+        self.tag_totals.pop()
+        self.untagged.discard(file_path)
+        self.version += 1
+
+    def count_tags(self, added, removed):
+        """按差异更新标签频次"""
+        for tag in added:
+            self.tag_counts[tag] += 1
+        for tag in removed:
+            count = self.tag_counts[tag] - 1
+            if count > 0:
+                self.tag_counts[tag] = count
+            else:
+                del self.tag_counts[tag]
+        self.version += 1
+
+    def clear(self):
+        """清空统计"""
+        self.tag_counts.clear()
+        self.lengths = array('L')
+        self.tag_totals = array('L')
+        self.untagged.clear()
+        self._rows.clear()
+        self._paths.clear()
+        self.version += 1
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def top_tags(self, n: int = 20) -> List[Tuple[str, int]]:
+        """出现次数最多的 n 个标签"""
+        return self.tag_counts.most_common(n)
+
+    def rare_tags(self, n: int = 20) -> List[Tuple[str, int]]:
+        """出现次数最少的 n 个标签（次数相同按标签名排序）"""
+        return heapq.nsmallest(n, self.tag_counts.items(), key=lambda item: (item[1], item[0]))
+
+    @staticmethod
+    def histogram(column: array, bins: int = 20) -> List[Tuple[int, int, int]]:
+        """
+        计算一列数值的直方图
+
+        Args:
+            column: lengths 或 tag_totals
+            bins: 最多分成的区间数，值域较小时每个整数一个区间
+
+        Returns:
+            [(区间下界, 区间上界（含）, 文件数)]
+        """
+        if not column:
+            return []
+        # Counter 在 C 中统计各个取值，再把数量少得多的不同取值归入区间
+        values = Counter(column)
+        low, high = min(values), max(values)
+        width = max(1, -(-(high - low + 1) // bins))
+        counts = [0] * (-(-(high - low + 1) // width))
+        for value, count in values.items():
+            counts[(value - low) // width] += count
+        return [(low + i * width, low + (i + 1) * width - 1, count) for i, count in enumerate(counts)]
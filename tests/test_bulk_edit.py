@@ -0,0 +1,98 @@
+import pytest
+
+from bulk_edit import BulkEditor, _map_tag_lines, build_operation
+from dataset_scan import atomic_write_text
+
+
+def run(kind, content, find='', replace='', position='start'):
+    return build_operation(kind, find, replace, position)(content)
+
+
+def test_map_tag_lines_keeps_unchanged_lines_verbatim():
+    content = 'a,b ,  c\n\nkeep ,  me'
+    assert _map_tag_lines(content, lambda tags: tags) == content
+    assert _map_tag_lines(content, lambda tags: tags[::-1]) == 'c, b, a\n\nme, keep'
+    assert _map_tag_lines(content, lambda tags: ['x'], first_line_only=True) == 'x\n\nkeep ,  me'
+
+
+def test_text_replace_operations():
+    assert run('replace', 'red hair, red eyes', 'red', 'blue') == 'blue hair, blue eyes'
+    assert run('regex_replace', 'tag_1, tag_22', r'tag_(\d+)', r'n\1') == 'n1, n22'
+
+
+def test_rename_tag_is_case_insensitive_and_whole_tag():
+    assert run('rename_tag', '1girl, Red Hair, red hair ribbon', 'red hair', 'crimson hair') == \
+        '1girl, crimson hair, red hair ribbon'
+
+
+def test_remove_tags():
+    assert run('remove_tags', 'a, b, c\nb, d', 'B, c') == 'a\nd'
+    # 删除后为空的行保留为空行
+    assert run('remove_tags', 'a', 'a') == ''
+
+
+@pytest.mark.parametrize('position, expected', [('start', 'x, y, a, b'), ('end', 'a, b, x, y')])
+def test_insert_tags(position, expected):
+    assert run('insert_tags', 'a, b', 'x, y, A', position=position) == expected
+    # 只处理第一行标签
+    assert run('insert_tags', 'a\nb', 'x', position=position).split('\n')[1] == 'b'
+
+
+@pytest.mark.parametrize('position', ['start', 'end'])
+def test_insert_tags_into_empty_caption(position):
+    assert run('insert_tags', '', 'x, y', position=position) == 'x, y'
+    assert run('insert_tags', '\n', 'x', position=position) == 'x\n'
+
+
+def test_dedupe_tags():
+    assert run('dedupe_tags', 'a, B, b, a\nc, c') == 'a, B\nc'
+
+
+def test_reorder_tags():
+    assert run('reorder_tags', 'b, solo, A, 1girl', 'solo, 1girl') == 'solo, 1girl, b, A'
+    assert run('reorder_tags', 'b, c, A') == 'A, b, c'
+
+
+@pytest.mark.parametrize('kind, find, replace', [
+    ('replace', '', 'x'), ('regex_replace', '(', ''), ('rename_tag', 'a', ''),
+    ('remove_tags', ' , ', ''), ('insert_tags', '', ''), ('unknown', 'a', 'b'),
+])
+def test_invalid_operations(kind, find, replace):
+    with pytest.raises(ValueError):
+        build_operation(kind, find, replace)
+
+
+def test_plan_and_apply(tmp_path):
+    paths = [str(tmp_path / f'{name}.txt') for name in 'abc']
+    for file_path, content in zip(paths, ['x, old', 'old', 'y']):
+        atomic_write_text(file_path, content)
+    editor = BulkEditor([build_operation('rename_tag', 'old', 'new')], chunk_size=1)
+    plan = editor.plan(paths, overrides={paths[2]: 'old, unsaved'})
+    assert plan.scanned == 3
+    assert sorted(plan.changes) == [
+        (paths[0], 'x, old', 'x, new'), (paths[1], 'old', 'new'), (paths[2], 'old, unsaved', 'new, unsaved')
+    ]
+    added, removed = plan.tag_delta()
+    assert added == {'new': 3} and removed == {'old': 3}
+
+    # 预览后被其他程序修改的文件跳过
+    atomic_write_text(paths[1], 'changed elsewhere')
+    written, errors = editor.apply(plan, overrides={paths[2]: 'old, unsaved'})
+    assert sorted(written) == [(paths[0], 'x, new'), (paths[2], 'new, unsaved')]
+    assert errors == [(paths[1], 'modified since preview')]
+    with open(paths[1], encoding='utf-8') as f:
+        assert f.read() == 'changed elsewhere'
+    with open(paths[2], encoding='utf-8') as f:
+        assert f.read() == 'new, unsaved'
+
+
+def test_plan_reports_unreadable_files(tmp_path):
+    editor = BulkEditor([build_operation('dedupe_tags')])
+    plan = editor.plan([str(tmp_path / 'missing.txt')])
+    assert plan.changes == [] and len(plan.errors) == 1
+
+
+def test_rewritten_lines_keep_crlf_endings():
+    assert run('dedupe_tags', 'a, b, a\r\nc, c\r\n') == 'a, b\r\nc\r\n'
+    assert run('remove_tags', 'x, a\r\nb', 'x') == 'a\r\nb'
+    assert run('insert_tags', 'a\r\nb', 'x', position='end') == 'a, x\r\nb'
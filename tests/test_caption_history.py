@@ -0,0 +1,57 @@
+import asyncio
+
+from caption_history import CaptionHistory
+from dataset_scan import atomic_write_text, stat_txt_file
+from dataset_store import DatasetStore
+
+
+def test_records_only_changed_files_and_diffs_between_revisions():
+    history = CaptionHistory(':memory:')
+    first = history.record([('a.txt', 'one'), ('b.txt', 'two')], 'save')
+    assert history.record([('a.txt', 'one')], 'save') is None
+    second = history.record([('a.txt', 'one, more'), ('b.txt', 'two')], 'bulk_edit')
+    third = history.record([('c.txt', 'three')], 'save')
+
+    assert [r['revision'] for r in history.revisions()] == [third, second, first]
+    assert history.revisions()[1]['files'] == 1
+    assert history.diff(first, second) == [('a.txt', 'one', 'one, more')]
+    assert history.diff(first) == [('a.txt', 'one', 'one, more'), ('c.txt', None, 'three')]
+    # 反向比较得到反向的差异
+    assert history.diff(third, first) == [('a.txt', 'one, more', 'one'), ('c.txt', 'three', None)]
+    assert history.contents_at(['a.txt', 'c.txt'], first) == {'a.txt': 'one', 'c.txt': None}
+    assert [r['revision'] for r in history.file_revisions('a.txt')] == [second, first]
+
+
+def test_changes_that_are_reverted_are_not_in_the_diff():
+    history = CaptionHistory(':memory:')
+    first = history.record([('a.txt', 'one')], 'save')
+    history.record([('a.txt', 'two')], 'save')
+    history.record([('a.txt', 'one')], 'rollback')
+    assert history.diff(first) == []
+    assert history.record([], 'snapshot', 'empty', always=True) == history.latest_revision()
+
+
+def test_store_rollback_restores_files_on_disk(tmp_path):
+    paths = [str(tmp_path / f'{name}.txt') for name in 'ab']
+    for file_path in paths:
+        atomic_write_text(file_path, 'original')
+
+    async def run():
+        store = DatasetStore(index_path=None, history_path=':memory:')
+        store.add_entries(stat_txt_file(file_path) for file_path in paths)
+        baseline = await store.create_snapshot('before')
+        for file_path in paths:
+            store.file_contents.set_dirty(file_path, 'edited')
+        saved, errors = await store.save_files(paths)
+        assert len(saved) == 2 and errors == []
+        assert [path for path, _, _ in await store.history_diff(baseline)] == paths
+        restored = await store.rollback(baseline, paths[:1])
+        return store, baseline, restored
+
+    store, baseline, (saved, errors, skipped) = asyncio.run(run())
+    assert saved == [(paths[0], 'original')] and errors == [] and skipped == []
+    with open(paths[0], encoding='utf-8') as f:
+        assert f.read() == 'original'
+    with open(paths[1], encoding='utf-8') as f:
+        assert f.read() == 'edited'
+    assert store.history.revisions()[0]['kind'] == 'rollback'
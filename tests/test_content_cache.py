@@ -0,0 +1,37 @@
+import sys
+
+from content_cache import ContentCache
+
+ENTRY = 'x' * 60
+ENTRY_BYTES = sys.getsizeof(ENTRY)
+
+
+def test_evicts_least_recently_used_clean_entries():
+    cache = ContentCache(max_bytes=2 * ENTRY_BYTES)
+    cache.put('a.txt', ENTRY)
+    cache.put('b.txt', ENTRY)
+    cache.get('a.txt')
+    cache.put('c.txt', ENTRY)
+    assert 'a.txt' in cache and 'c.txt' in cache
+    assert 'b.txt' not in cache
+    assert cache.clean_bytes <= cache.max_bytes
+
+
+def test_dirty_entries_are_pinned_until_saved():
+    changes = []
+    cache = ContentCache(max_bytes=2 * ENTRY_BYTES, on_dirty_change=changes.append)
+    cache.set_dirty('a.txt', 'edited')
+    for i in range(20):
+        cache.put(f'{i}.txt', ENTRY)
+    assert cache.get('a.txt') == 'edited'
+    # 从磁盘重新读取的内容不覆盖未保存的修改
+    cache.put('a.txt', 'on disk')
+    assert cache.get('a.txt') == 'edited'
+    assert cache.dirty_paths() == ['a.txt']
+
+    cache.mark_clean('a.txt')
+    assert not cache.is_dirty('a.txt')
+    assert changes == ['a.txt', 'a.txt']
+    for i in range(20, 40):
+        cache.put(f'{i}.txt', ENTRY)
+    assert 'a.txt' not in cache
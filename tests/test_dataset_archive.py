@@ -0,0 +1,134 @@
+import io
+import json
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+import dataset_archive
+from dataset_archive import DatasetArchive
+from save_pipeline import SaveConflict
+
+CAPTIONS = {'a.txt': '1girl, solo', 'sub/b.txt': '猫, outdoors, ' + 'long ' * 200}
+
+
+def make_zip(path, compression):
+    with zipfile.ZipFile(path, 'w', compression=compression) as archive:
+        for name, content in CAPTIONS.items():
+            archive.writestr(name, content)
+        archive.writestr('a.png', b'\x89PNG image')
+    return str(path)
+
+
+def make_tar(path):
+    with tarfile.open(path, 'w') as archive:
+        members = [(name, content.encode('utf-8')) for name, content in CAPTIONS.items()]
+        for name, data in [*members, ('a.png', b'\x89PNG image')]:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return str(path)
+
+
+def load(path):
+    archive = DatasetArchive(path, extract_dir=os.path.join(os.path.dirname(path), 'extract'))
+    entries = [entry for chunk, _ in archive.iter_entries() for entry in chunk]
+    return archive, {entry['source_path']: entry for entry in entries}
+
+
+@pytest.fixture(params=['stored', 'deflated', 'tar'])
+def archive_path(request, tmp_path):
+    if request.param == 'tar':
+        return make_tar(tmp_path / 'data.tar')
+    compression = zipfile.ZIP_STORED if request.param == 'stored' else zipfile.ZIP_DEFLATED
+    return make_zip(tmp_path / 'data.zip', compression)
+
+
+def test_members_are_read_by_offset(archive_path, monkeypatch):
+    archive, entries = load(archive_path)
+    assert set(entries) == set(CAPTIONS)
+    assert entries['a.txt']['image_path'] == archive.prefix + 'a.png'
+    assert entries['sub/b.txt']['image_path'] == ''
+    # 建立索引后读取成员不再经过 zipfile / tarfile
+    monkeypatch.setattr(zipfile, 'ZipFile', None)
+    monkeypatch.setattr(tarfile, 'open', None)
+    for name, content in CAPTIONS.items():
+        assert archive.read(archive.prefix + name) == content
+    with open(archive.extract(archive.prefix + 'a.png'), 'rb') as f:
+        assert f.read() == b'\x89PNG image'
+    archive.close()
+
+
+def test_index_cache_is_reused(archive_path, monkeypatch):
+    archive, _ = load(archive_path)
+    archive.close()
+    with open(archive_path + '.index', 'r', encoding='utf-8') as f:
+        assert json.load(f)['version'] == dataset_archive.INDEX_VERSION
+
+    def fail(path):
+        raise AssertionError('member index rebuilt')
+
+    monkeypatch.setattr(dataset_archive, '_zip_members', fail)
+    monkeypatch.setattr(dataset_archive, '_tar_members', fail)
+    archive, entries = load(archive_path)
+    assert archive.read(archive.prefix + 'a.txt') == CAPTIONS['a.txt']
+    archive.close()
+
+
+def test_stale_index_cache_is_rebuilt(tmp_path):
+    path = make_zip(tmp_path / 'data.zip', zipfile.ZIP_DEFLATED)
+    load(path)[0].close()
+    with zipfile.ZipFile(path, 'a') as archive:
+        archive.writestr('c.txt', 'new')
+    archive, entries = load(path)
+    assert 'c.txt' in entries
+    assert archive.read(archive.prefix + 'c.txt') == 'new'
+    archive.close()
+
+
+def test_edits_go_to_the_overlay(archive_path):
+    with open(archive_path, 'rb') as f:
+        original = f.read()
+    archive, _ = load(archive_path)
+    file_path = archive.prefix + 'a.txt'
+    archive.read(file_path)
+    assert archive.write({file_path: '1girl, smile'}) == {}
+    assert archive.read(file_path) == '1girl, smile'
+    with open(archive.overlay_path, 'r', encoding='utf-8') as f:
+        assert json.load(f) == {'a.txt': '1girl, smile'}
+    with open(archive_path, 'rb') as f:
+        assert f.read() == original
+    archive.close()
+
+    # 重新打开时条目直接带有修改后的标注
+    archive, entries = load(archive_path)
+    assert entries['a.txt']['content'] == '1girl, smile'
+    # 改回压缩包中的内容时从覆盖文件中移除
+    assert archive.write({file_path: CAPTIONS['a.txt']}) == {}
+    assert not os.path.exists(archive.overlay_path)
+    archive.close()
+
+
+def test_overlay_changed_by_others_is_a_conflict(archive_path):
+    mine, _ = load(archive_path)
+    other, _ = load(archive_path)
+    file_path = mine.prefix + 'a.txt'
+    mine.read(file_path)
+    other.read(file_path)
+    assert other.write({file_path: 'edited elsewhere, with more tags'}) == {}
+    assert mine.write({file_path: 'mine'}) == {file_path: 'modified'}
+    assert mine.read(file_path) == 'edited elsewhere, with more tags'
+    assert mine.write({file_path: 'mine'}, force=True) == {}
+    assert other.read(file_path) == 'mine'
+    mine.close()
+    other.close()
+
+
+def test_missing_members_and_archive(archive_path):
+    archive, _ = load(archive_path)
+    assert archive.write({archive.prefix + 'gone.txt': 'x'}) == {archive.prefix + 'gone.txt': 'deleted'}
+    archive.close()
+    os.unlink(archive_path)
+    with pytest.raises(SaveConflict):
+        archive.write({archive.prefix + 'a.txt': 'x'})
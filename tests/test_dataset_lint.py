@@ -0,0 +1,76 @@
+import json
+import os
+
+from dataset_lint import check_caption, check_pairs, main
+
+
+def write_bytes(path, data: bytes):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def read_bytes(path) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_check_pairs():
+    names = ['a.txt', 'a.png', 'b.txt', 'c.txt', 'c.jpg', 'c.webp', 'd.txt', 'd.JPG', 'e.webp', 'notes.md']
+    txt_files, issues = check_pairs('/data', names)
+    assert sorted(txt_files) == ['/data/a.txt', '/data/b.txt', '/data/c.txt', '/data/d.txt']
+    found = sorted((issue['type'], os.path.basename(issue['path'])) for issue in issues)
+    assert found == [
+        ('ambiguous_image', 'c.txt'), ('missing_image', 'b.txt'),
+        ('orphan_image', 'e.webp'), ('unsupported_image', 'd.txt'),
+    ]
+
+
+def test_check_caption_reports_issues(tmp_path):
+    cases = {
+        'empty.txt': (b'  \n', ['empty_caption']),
+        'bom.txt': (b'\xef\xbb\xbfa, b', ['utf8_bom']),
+        'gbk.txt': ('标签'.encode('gbk'), ['non_utf8']),
+        'dup.txt': (b'a, B, b\nc', ['duplicate_tags']),
+        'long.txt': (b'a' * 11, ['oversized_caption']),
+        'ok.txt': (b'a, b', []),
+    }
+    for name, (data, expected) in cases.items():
+        write_bytes(tmp_path / name, data)
+        issues, fixed = check_caption(str(tmp_path / name), max_chars=10)
+        assert [issue['type'] for issue in issues] == expected, name
+        assert fixed == []
+    issues, _ = check_caption(str(tmp_path / 'missing.txt'))
+    assert issues[0]['type'] == 'read_error'
+
+
+def test_fix_removes_bom_and_duplicates_and_keeps_line_endings(tmp_path):
+    path = tmp_path / 'a.txt'
+    write_bytes(path, b'\xef\xbb\xbfa, b, a\r\nc, c\r\nkeep,  as is\r\n')
+    issues, fixed = check_caption(str(path), fix=True)
+    assert issues == [] and sorted(fixed) == ['duplicate_tags', 'utf8_bom']
+    assert read_bytes(path) == b'a, b\r\nc\r\nkeep,  as is\r\n'
+
+    write_bytes(path, b'a, b, a\nc\n')
+    check_caption(str(path), fix=True)
+    assert read_bytes(path) == b'a, b\nc\n'
+
+
+def test_main_exit_codes(tmp_path, capsys):
+    assert main([str(tmp_path / 'missing')]) == 2
+    assert main([str(tmp_path), '--jobs', '0']) == 2
+    capsys.readouterr()
+
+    write_bytes(tmp_path / 'a.txt', b'a, a')
+    write_bytes(tmp_path / 'a.png', b'')
+    assert main([str(tmp_path), '--jobs', '1']) == 1
+    report = json.loads(capsys.readouterr().out)
+    assert report['summary'] == {'duplicate_tags': 1}
+
+    output = tmp_path / 'report.json'
+    assert main([str(tmp_path), '--jobs', '1', '--fix', '--output', str(output)]) == 0
+    report = json.loads(output.read_text(encoding='utf-8'))
+    assert report['fixed'] == {'duplicate_tags': 1} and report['issues'] == []
+    assert read_bytes(tmp_path / 'a.txt') == b'a'
+
+    write_bytes(tmp_path / 'b.txt', b'b')
+    assert main([str(tmp_path), '--jobs', '1', '--ignore', 'missing_image']) == 0
@@ -0,0 +1,139 @@
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('httpx')
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from dataset_scan import atomic_write_text, stat_txt_file  # noqa: E402
+from dataset_store import DatasetStore  # noqa: E402
+from http_api import caption_etag, register_api  # noqa: E402
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    paths = []
+    for name, content in (('a', '1girl, solo'), ('b', 'red hair')):
+        file_path = str(tmp_path / f'{name}.txt')
+        atomic_write_text(file_path, content)
+        paths.append(file_path)
+    with open(tmp_path / 'a.png', 'wb') as f:
+        f.write(bytes(range(256)) * 4)
+    store = DatasetStore(index_path=None, history_path=None)
+    store.add_entries(stat_txt_file(file_path) for file_path in paths)
+    app = FastAPI()
+    register_api(app, store)
+    with TestClient(app) as client:
+        yield client, paths
+
+
+def test_caption_etag_and_conditional_get(dataset):
+    client, (a, _) = dataset
+    response = client.get('/api/captions', params={'path': a})
+    assert response.status_code == 200 and response.text == '1girl, solo'
+    etag = response.headers['etag']
+    assert etag == caption_etag('1girl, solo')
+    assert response.headers['accept-ranges'] == 'bytes'
+
+    for headers in ({'If-None-Match': etag}, {'If-None-Match': f'"other", W/{etag}'},
+                    {'If-Modified-Since': response.headers['last-modified']}):
+        response = client.get('/api/captions', params={'path': a}, headers=headers)
+        assert response.status_code == 304 and response.content == b''
+    response = client.get('/api/captions', params={'path': a}, headers={'If-None-Match': '"other"'})
+    assert response.status_code == 200
+    assert client.get('/api/captions', params={'path': a + '.missing'}).status_code == 404
+
+
+def test_caption_range_requests(dataset):
+    client, (a, _) = dataset
+    get = lambda headers: client.get('/api/captions', params={'path': a}, headers=headers)  # noqa: E731
+    response = get({'Range': 'bytes=0-4'})
+    assert response.status_code == 206 and response.text == '1girl'
+    assert response.headers['content-range'] == 'bytes 0-4/11'
+    response = get({'Range': 'bytes=-4'})
+    assert response.status_code == 206 and response.text == 'solo'
+    response = get({'Range': 'bytes=20-'})
+    assert response.status_code == 416 and response.headers['content-range'] == 'bytes */11'
+    # 多个范围和 If-Range 不匹配时返回完整内容
+    assert get({'Range': 'bytes=0-1,3-4'}).status_code == 200
+    assert get({'Range': 'bytes=0-4', 'If-Range': '"stale"'}).status_code == 200
+    etag = get({}).headers['etag']
+    assert get({'Range': 'bytes=0-4', 'If-Range': etag}).status_code == 206
+
+
+def test_image_streaming_with_range_and_etag(dataset):
+    client, (a, b) = dataset
+    response = client.get('/api/images', params={'path': a})
+    assert response.status_code == 200 and response.headers['content-type'] == 'image/png'
+    assert response.content == bytes(range(256)) * 4
+    response = client.get('/api/images', params={'path': a}, headers={'Range': 'bytes=256-259'})
+    assert response.status_code == 206 and response.content == bytes(range(4))
+    assert response.headers['content-range'] == 'bytes 256-259/1024'
+    etag = response.headers['etag']
+    assert client.get('/api/images', params={'path': a}, headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/images', params={'path': b}).status_code == 404
+
+
+def test_put_caption_with_if_match(dataset):
+    client, (a, _) = dataset
+    response = client.put('/api/captions', params={'path': a}, content='new'.encode('utf-8'),
+                          headers={'If-Match': '"stale"'})
+    assert response.status_code == 412 and response.json()['etag'] == caption_etag('1girl, solo')
+    response = client.put('/api/captions', params={'path': a}, content='new'.encode('utf-8'),
+                          headers={'If-Match': caption_etag('1girl, solo')})
+    assert response.status_code == 200 and response.json()['status'] == 'saved'
+    assert response.headers['etag'] == caption_etag('new')
+    with open(a, encoding='utf-8') as f:
+        assert f.read() == 'new'
+    response = client.put('/api/captions', params={'path': a}, content='new'.encode('utf-8'))
+    assert response.json()['status'] == 'unchanged'
+    response = client.put('/api/captions', params={'path': a}, content=b'\xff')
+    assert response.status_code == 400
+
+
+def test_batch_get_with_known_etags(dataset):
+    client, (a, b) = dataset
+    response = client.post('/api/captions/batch', json={
+        'paths': [a, b, a, '/not/loaded.txt'], 'etags': {a: caption_etag('1girl, solo')}
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body['items'] == [
+        {'path': a, 'etag': caption_etag('1girl, solo'), 'dirty': False, 'not_modified': True},
+        {'path': b, 'etag': caption_etag('red hair'), 'dirty': False, 'content': 'red hair'},
+    ]
+    assert body['errors'] == [{'path': '/not/loaded.txt', 'error': 'file not loaded'}]
+
+
+def test_batch_put(dataset):
+    client, (a, b) = dataset
+    response = client.put('/api/captions/batch', json={'items': [
+        {'path': a, 'content': 'x'},
+        {'path': b, 'content': 'y', 'if_match': '"stale"'},
+        {'path': '/not/loaded.txt', 'content': 'z'},
+    ]})
+    assert response.status_code == 200
+    assert [(result['path'], result['status']) for result in response.json()['results']] == [
+        (a, 'saved'), (b, 'precondition_failed'), ('/not/loaded.txt', 'not_found')
+    ]
+    with open(a, encoding='utf-8') as f:
+        assert f.read() == 'x'
+
+
+@pytest.mark.parametrize('method, body', [
+    ('post', b'not json'),
+    ('post', b'[1, 2]'),
+    ('post', b'{"paths": "a"}'),
+    ('post', b'{"paths": [["a"]]}'),
+    ('post', b'{"paths": ["x"], "etags": [1]}'),
+    ('post', b'{"paths": ["x"], "etags": {"x": 1}}'),
+    ('put', b'{"items": [{"path": "x"}]}'),
+    ('put', b'{"items": [{"path": "x", "content": "a", "if_match": 1}]}'),
+    ('put', b'{"items": [{"path": "x", "content": "a"}, {"path": "x", "content": "b"}]}'),
+])
+def test_invalid_batch_bodies_are_rejected(dataset, method, body):
+    client, _ = dataset
+    response = client.request(method.upper(), '/api/captions/batch', content=body,
+                              headers={'Content-Type': 'application/json'})
+    assert response.status_code == 400
@@ -0,0 +1,32 @@
+from dataset_store import LeaseTable
+
+
+def test_acquire_skips_files_leased_to_others():
+    leases = LeaseTable()
+    files = [f'{i}.txt' for i in range(10)]
+    assert leases.acquire('alice', files, 4) == files[:4]
+    assert leases.acquire('bob', files, 4) == files[4:8]
+    assert leases.owner_of('5.txt') == 'bob'
+    # 同一审阅者再次租借时追加到已有批次
+    assert leases.acquire('alice', files, 4) == files[8:]
+    assert leases.batch_of('alice') == set(files[:4] + files[8:])
+
+
+def test_release_and_discard():
+    leases = LeaseTable()
+    leases.acquire('alice', ['a', 'b', 'c'], 3)
+    leases.release('alice', ['a'])
+    assert leases.owner_of('a') is None
+    leases.discard(['b'])
+    assert leases.batch_of('alice') == {'c'}
+    leases.release('alice')
+    assert leases.batch_of('alice') == set()
+    assert leases.acquire('bob', ['a', 'b', 'c'], 3) == ['a', 'b', 'c']
+
+
+def test_expired_batches_are_reclaimed():
+    leases = LeaseTable(ttl=0)
+    leases.acquire('alice', ['a', 'b'], 2)
+    assert leases.expire() == ['alice']
+    assert leases.owner_of('a') is None
+    assert leases.acquire('bob', ['a', 'b'], 2) == ['a', 'b']
@@ -0,0 +1,44 @@
+import json
+
+from manifest import Manifest
+
+
+def load(path):
+    manifest = Manifest(str(path))
+    entries = [entry for chunk, _ in manifest.iter_entries() for entry in chunk]
+    return manifest, entries
+
+
+def test_write_replaces_only_edited_rows(tmp_path):
+    path = tmp_path / 'data.jsonl'
+    path.write_text('{"image": "a.png", "caption": "one"}\n{"image": "b.png", "caption": "two"}\n', encoding='utf-8')
+    manifest, entries = load(path)
+    assert [entry['content'] for entry in entries] == ['one', 'two']
+    assert manifest.write({entries[1]['path']: 'two, more'}) == {}
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert json.loads(lines[0]) == {'image': 'a.png', 'caption': 'one'}
+    assert json.loads(lines[1]) == {'image': 'b.png', 'caption': 'two, more'}
+    assert manifest.read(entries[1]['path']) == 'two, more'
+
+
+def test_rows_changed_on_disk_are_conflicts(tmp_path):
+    path = tmp_path / 'data.jsonl'
+    path.write_text('{"caption": "one"}\n', encoding='utf-8')
+    manifest, entries = load(path)
+    path.write_text('{"caption": "changed"}\n', encoding='utf-8')
+    assert manifest.write({entries[0]['path']: 'mine'}) == {entries[0]['path']: 'modified'}
+    assert manifest.write({entries[0]['path']: 'mine'}, force=True) == {}
+    assert json.loads(path.read_text(encoding='utf-8')) == {'caption': 'mine'}
+
+
+def test_unparsable_rows_are_never_overwritten(tmp_path):
+    path = tmp_path / 'data.jsonl'
+    path.write_text('not json\n[1, 2]\n{"caption": "ok"}\n', encoding='utf-8')
+    manifest, entries = load(path)
+    edits = {entry['path']: 'fixed' for entry in entries}
+    for force in (False, True):
+        conflicts = manifest.write(edits, force=force)
+        assert conflicts == {entries[0]['path']: 'invalid', entries[1]['path']: 'invalid'}
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert lines[:2] == ['not json', '[1, 2]']
+    assert json.loads(lines[2]) == {'caption': 'fixed'}
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+
+from content_cache import ContentCache
+from dataset_scan import atomic_write_text
+from save_pipeline import SavePipeline
+
+
+class GatedWriter:
+    """写入时阻塞到 release 被调用，用于在写入期间再次请求保存"""
+
+    def __init__(self):
+        self.written = []
+        self.gate = threading.Event()
+
+    def __call__(self, file_path, content):
+        self.written.append(content)
+        self.gate.wait(5)
+        if content == 'bad':
+            raise OSError('disk full')
+        atomic_write_text(file_path, content)
+
+
+def test_saves_requested_during_a_write_are_coalesced(tmp_path):
+    file_path = str(tmp_path / 'a.txt')
+
+    async def run():
+        cache = ContentCache()
+        writer = GatedWriter()
+        saver = SavePipeline(cache, write=writer)
+        cache.set_dirty(file_path, 'v1')
+        first = asyncio.ensure_future(saver.save([file_path]))
+        await asyncio.sleep(0.05)
+        cache.set_dirty(file_path, 'v2')
+        second = asyncio.ensure_future(saver.save([file_path]))
+        third = asyncio.ensure_future(saver.save([file_path]))
+        await asyncio.sleep(0.05)
+        # 正在写入的文件不会立即返回成功
+        assert not second.done() and not third.done()
+        writer.gate.set()
+        return writer, cache, await first, await second, await third
+
+    writer, cache, first, second, third = asyncio.run(run())
+    # 写入期间的两次请求合并为一次写入
+    assert writer.written == ['v1', 'v2']
+    assert second == third == ([(file_path, 'v2')], [])
+    assert (file_path, 'v1') in first[0]
+    assert not cache.is_dirty(file_path)
+    with open(file_path, encoding='utf-8') as f:
+        assert f.read() == 'v2'
+
+
+def test_coalesced_save_reports_the_failure(tmp_path):
+    file_path = str(tmp_path / 'a.txt')
+
+    async def run():
+        cache = ContentCache()
+        writer = GatedWriter()
+        saver = SavePipeline(cache, write=writer)
+        cache.set_dirty(file_path, 'v1')
+        first = asyncio.ensure_future(saver.save([file_path]))
+        await asyncio.sleep(0.05)
+        cache.set_dirty(file_path, 'bad')
+        second = asyncio.ensure_future(saver.save([file_path]))
+        await asyncio.sleep(0.05)
+        writer.gate.set()
+        await first
+        return saver, cache, await second
+
+    saver, cache, second = asyncio.run(run())
+    assert second == ([], [(file_path, 'disk full')])
+    assert saver.errors[file_path] == 'disk full'
+    assert cache.is_dirty(file_path)
+
+
+def test_waits_for_the_current_write_when_nothing_changed(tmp_path):
+    file_path = str(tmp_path / 'a.txt')
+
+    async def run():
+        cache = ContentCache()
+        writer = GatedWriter()
+        saver = SavePipeline(cache, write=writer)
+        cache.set_dirty(file_path, 'v1')
+        first = asyncio.ensure_future(saver.save([file_path]))
+        await asyncio.sleep(0.05)
+        second = asyncio.ensure_future(saver.save([file_path]))
+        await asyncio.sleep(0.05)
+        writer.gate.set()
+        return writer, await first, await second
+
+    writer, first, second = asyncio.run(run())
+    assert writer.written == ['v1']
+    assert first == second == ([(file_path, 'v1')], [])
+
+
+def test_detects_external_modification(tmp_path):
+    file_path = str(tmp_path / 'a.txt')
+    atomic_write_text(file_path, 'original')
+    cache = ContentCache()
+    saver = SavePipeline(cache)
+    cache.set_dirty(file_path, 'edited')
+    saved, errors = asyncio.run(saver.save([file_path], expected={file_path: (0, 0.0)}))
+    assert saved == [] and errors == [(file_path, 'modified')]
+    assert saver.conflicts == {file_path: 'modified'}
+    saved, errors = asyncio.run(saver.save([file_path], force=True))
+    assert saved == [(file_path, 'edited')] and errors == []
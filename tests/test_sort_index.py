@@ -0,0 +1,42 @@
+import random
+
+from sort_index import SortIndex, natural_key
+
+
+def test_natural_key_orders_numbers_by_value():
+    names = ['img10.txt', 'IMG2.txt', 'img1.txt']
+    assert sorted(names, key=natural_key) == ['img1.txt', 'IMG2.txt', 'img10.txt']
+
+
+def test_matches_sorted_order_under_incremental_changes():
+    keys = {f'{i:04d}.txt': random.Random(i).randint(0, 50) for i in range(500)}
+    index = SortIndex(keys.__getitem__, block_size=8)
+    index.add_many(list(keys)[:400])
+    for file_path in list(keys)[400:]:
+        index.add(file_path)
+    removed = list(keys)[::7]
+    index.discard_many(removed)
+    for file_path in list(keys)[1::5]:
+        keys[file_path] = -keys[file_path]
+    moved = index.update_many(list(keys)[1::5])
+
+    expected = sorted((keys[p], p) for p in keys if p not in set(removed))
+    assert list(index) == [p for _, p in expected]
+    assert list(reversed(index)) == [p for _, p in reversed(expected)]
+    assert moved > 0
+    for position in (0, 123, len(expected) - 1):
+        file_path = expected[position][1]
+        assert index.at(position) == file_path
+        assert index.index(file_path) == position
+    assert index.slice(10, 20) == [p for _, p in expected[10:20]]
+
+
+def test_reverse_view():
+    index = SortIndex(lambda file_path: file_path)
+    index.add_many(['b', 'a', 'c'])
+    files, positions = index.view(reverse=True)
+    assert list(files) == ['c', 'b', 'a']
+    assert positions['a'] == 2
+    index.discard('b')
+    assert list(files) == ['c', 'a']
+    assert positions['a'] == 1
@@ -0,0 +1,77 @@
+from tag_search import TagIndex, tokenize_query
+from tag_stats import TagStatistics
+
+
+def build_index():
+    index = TagIndex()
+    index.update('a.txt', '1girl, red hair')
+    index.update('b.txt', 'blue hair, -_-')
+    index.update('c.txt', 'aaa, solo')
+    index.update('d.txt', 'hat, solo')
+    return index
+
+
+def test_tokenize_splits_clauses_and_alternatives():
+    assert tokenize_query('1girl, red hair | blue hair') == [['1girl'], ['red hair', 'blue hair']]
+    assert tokenize_query('a AND b OR c') == [['a'], ['b', 'c']]
+    assert tokenize_query(' , ') == []
+
+
+def test_tokenize_keeps_regex_terms_whole():
+    assert tokenize_query('/^(red|blue) hair$/') == [['/^(red|blue) hair$/']]
+    assert tokenize_query('/a{1,3}/, solo') == [['/a{1,3}/'], ['solo']]
+    assert tokenize_query('-hat, NOT /x|y/ | z') == [['-hat'], ['NOT /x|y/', 'z']]
+    # 不在查询词开头的 / 是普通字符
+    assert tokenize_query('path/to, x') == [['path/to'], ['x']]
+
+
+def test_regex_with_separators_matches():
+    index = build_index()
+    assert index.search('/^(red|blue) hair$/') == {'a.txt', 'b.txt'}
+    assert index.search('/^a{3}$/, solo') == {'c.txt'}
+
+
+def test_negation_and_dash_tags():
+    index = build_index()
+    assert index.search('-hat') == {'a.txt', 'b.txt', 'c.txt'}
+    assert index.search('NOT hat, solo') == {'c.txt'}
+    # 以 - 开头的已有标签按标签匹配，\- 强制按标签匹配
+    assert index.search('-_-') == {'b.txt'}
+    assert index.search('\\-_-') == {'b.txt'}
+    assert index.search('red hair | -_-') == {'a.txt', 'b.txt'}
+
+
+def test_prefix_and_incremental_update():
+    index = build_index()
+    assert index.search('h*') == {'d.txt'}
+    index.update('d.txt', 'solo')
+    assert index.search('hat') == set()
+    index.remove('c.txt')
+    assert index.search('solo') == {'d.txt'}
+    assert index.search('') is None
+
+
+def test_statistics_follow_updates():
+    stats = TagStatistics()
+    changed = []
+    index = TagIndex(stats, on_change=changed.append)
+    index.update('a.txt', 'solo, red hair')
+    index.update('b.txt', 'solo, blue hair')
+    assert dict(stats.top_tags()) == {'solo': 2, 'red hair': 1, 'blue hair': 1}
+    index.update('b.txt', 'smile')
+    index.remove('a.txt')
+    assert dict(stats.top_tags()) == {'smile': 1}
+    assert len(stats) == len(index) == 1
+    # 标签变化时回调，移除文件时不回调
+    assert changed == ['a.txt', 'b.txt', 'b.txt']
+
+
+def test_completion_follows_updates():
+    index = TagIndex()
+    index.update('a.txt', 'solo, smile')
+    index.update('b.txt', 'solo, blue hair')
+    assert index.complete('s') == [('solo', 2), ('smile', 1)]
+    index.update('b.txt', 'blue hair')
+    index.remove('a.txt')
+    assert index.complete('s') == []
+    assert index.complete('bl') == [('blue hair', 1)]
@@ -0,0 +1,132 @@
+"""
+缩略图缓存
+在后台线程池中为预览区生成缩略图，按 路径 + 修改时间 + 大小 缓存到磁盘，避免每次点击都把原图传给浏览器
+
+依赖 Pillow；未安装时不生成缩略图，调用方应回退为显示原图
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow 为可选依赖
+    Image = None
+    ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THUMBNAIL_DIR = os.path.join(os.path.expanduser('~'), '.youkengi_label_tool', 'thumbnails')
+DEFAULT_THUMBNAIL_SIZE = 768  # 缩略图最长边（像素）
+
+
+def read_image_size(image_path: str) -> Optional[Tuple[int, int]]:
+    """读取图片的 (宽, 高)（只解析文件头），无法读取或未安装 Pillow 时返回 None"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(image_path) as image:
+            return image.size
+    except Exception:
+        return None
+
+
+class ThumbnailCache:
+    """磁盘缩略图缓存（线程安全）"""
+
+    def __init__(self, cache_dir: str = DEFAULT_THUMBNAIL_DIR, url_prefix: str = '/thumbnails',
+                 max_size: int = DEFAULT_THUMBNAIL_SIZE, max_workers: int = 4):
+        """
+        初始化缩略图缓存
+
+        Args:
+            cache_dir: 缓存目录
+            url_prefix: 缓存目录对应的静态文件路由
+            max_size: 缩略图最长边
+            max_workers: 生成缩略图的线程数
+        """
+        self.cache_dir = cache_dir
+        self.url_prefix = url_prefix.rstrip('/')
+        self.max_size = max_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='thumbnail')
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Future] = {}  # 正在生成的缩略图，避免重复提交
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def available(self) -> bool:
+        """是否可以生成缩略图（已安装 Pillow）"""
+        return Image is not None
+
+    def url_for(self, image_path: str) -> Optional[str]:
+        """
+        返回图片缩略图的 URL，缓存中没有时立即生成（阻塞）
+
+        Returns:
+            缩略图 URL；无法生成时返回 None
+        """
+        if not self.available:
+            return None
+        try:
+            image_stat = os.stat(image_path)
+        except OSError:
+            return None
+        key = hashlib.sha1(
+            f'{os.path.abspath(image_path)}\0{image_stat.st_mtime_ns}\0{image_stat.st_size}\0{self.max_size}'.encode('utf-8')
+        ).hexdigest()
+        relative_path = f'{key[:2]}/{key}.jpg'
+        thumbnail_path = os.path.join(self.cache_dir, key[:2], f'{key}.jpg')
+        if not os.path.exists(thumbnail_path):
+            with self._lock:
+                future = self._pending.get(key)
+                owner = future is None
+                if owner:
+                    future = Future()
+                    self._pending[key] = future
+            if owner:
+                try:
+                    self._generate(image_path, thumbnail_path)
+                    future.set_result(True)
+                except Exception as e:
+                    logger.warning('缩略图生成失败: %s', e)
+                    future.set_result(False)
+                finally:
+                    with self._lock:
+                        self._pending.pop(key, None)
+            if not future.result():
+                return None
+        return f'{self.url_prefix}/{relative_path}'
+
+    def submit(self, image_path: str) -> Future:
+        """在后台生成缩略图，返回结果为 URL（或 None）的 Future"""
+        return self.executor.submit(self.url_for, image_path)
+
+    def _generate(self, image_path: str, thumbnail_path: str):
+        """生成缩略图并原子写入缓存"""
+        with Image.open(image_path) as image:
+            # JPEG 可以在解码时直接缩小，大幅降低大图的解码开销
+            image.draft('RGB', (self.max_size, self.max_size))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((self.max_size, self.max_size))
+            if image.mode in ('RGBA', 'LA', 'P'):
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+            directory = os.path.dirname(thumbnail_path)
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    image.save(f, 'JPEG', quality=85)
+                os.replace(temp_path, thumbnail_path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
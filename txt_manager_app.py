@@ -3,15 +3,199 @@ TXT 文件管理工具应用
 整合了核心组件和应用入口
 """
 
+import functools
+import logging
 import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
 from pathlib import Path
-from typing import List, Optional
-from nicegui import ui
+from typing import Callable, List, Optional, Tuple
+from nicegui import app, background_tasks, context, ui
+
+from bulk_edit import OPERATIONS, BulkEditor, build_operation
+from caption_history import DEFAULT_HISTORY_PATH, KINDS as HISTORY_KINDS
+from content_cache import DEFAULT_CACHE_BYTES
+from dataset_archive import ARCHIVE_EXTENSIONS, is_archive
+from dataset_index import DEFAULT_INDEX_PATH
+from dataset_scan import DatasetScanner, find_paired_image, iter_txt_files
+from dataset_store import SORT_KEYS, DatasetStore
+from duplicates import DEFAULT_IMAGE_DISTANCE, DEFAULT_SIMILARITY
+from http_api import register_api
+from manifest import MANIFEST_FORMATS, PARQUET_AVAILABLE
+from perf_metrics import metrics, timed
+from tag_complete import edited_tag
+from thumbnails import ThumbnailCache
+
+logger = logging.getLogger(__name__)
+
+# 缩略图缓存由所有页面共享，缓存目录作为静态文件路由提供给浏览器
+thumbnail_cache = ThumbnailCache()
+app.add_static_files(thumbnail_cache.url_prefix, thumbnail_cache.cache_dir)
+# 文件列表可选的排序方式（不含加载顺序）
+SORT_OPTIONS = [sort_by for sort_by in SORT_KEYS if sort_by != 'load']
+# 所有页面共享同一个数据集：多人审阅时内存不随页面数量增长，且能看到彼此的修改；
+# 在应用启动时才创建（打开数据库并启动后台线程），导入本模块没有副作用
+dataset_store: Optional[DatasetStore] = None
+
+
+def _create_dataset_store():
+    """创建共享的数据集，并注册供脚本和标注流水线使用的 REST 接口（读写同一个数据集）"""
+    global dataset_store
+    dataset_store = DatasetStore()
+    register_api(app, dataset_store)
+
+
+app.on_startup(_create_dataset_store)
+
+
+class VirtualFileList:
+    """虚拟化文件列表
+
+    只创建固定数量的行卡片（可见行 + 预渲染行），滚动时复用这些卡片并重新绑定内容。
+    选中、点击等操作只更新受影响的行，开销与文件总数无关。
+    """
+
+    ROW_HEIGHT = 72  # 每行占用的像素高度（含间距）
+    OVERSCAN = 4  # 可见区域上下额外渲染的行数
+
+    def __init__(self, row_provider: Callable[[int], Tuple[str, str]],
+                 on_select: Callable[[int], None], height: int = 576):
+        """
+        初始化虚拟文件列表
+
+        Args:
+            row_provider: 根据索引返回 (文件名, 文件路径) 的函数
+            on_select: 行被点击时的回调，参数为文件索引
+            height: 列表可视区域高度（像素）
+        """
+        self.row_provider = row_provider
+        self.on_select = on_select
+        self.height = height
+        self.count = 0
+        self.first_index = 0  # 行池绑定的第一个索引
+        self.scroll_row = 0  # 可视区域顶部对应的行
+        self.selected_index = -1
+        self.pool_size = height // self.ROW_HEIGHT + 2 * self.OVERSCAN + 1
+        self.rows: list = []  # 每个槽位的 (卡片, 文件名标签, 路径标签)
+        self.slot_state: list = []  # 每个槽位当前绑定的 (索引, 文件名, 路径, 是否选中)
+        self.scroll_area = None
+        self.top_spacer = None
+        self.bottom_spacer = None
+
+    def create(self):
+        """创建列表界面"""
+        self.scroll_area = ui.scroll_area(on_scroll=self._on_scroll).classes('w-full').style(f'height: {self.height}px;')
+        with self.scroll_area:
+            self.top_spacer = ui.element('div').classes('w-full').style('height: 0px;')
+            for slot in range(self.pool_size):
+                card = ui.card().classes('w-full compact-file-item cursor-pointer border-l-4 border-blue-500') \
+                    .style(f'height: {self.ROW_HEIGHT - 8}px; margin-bottom: 8px; padding: 8px 12px; gap: 2px; flex-shrink: 0;')
+                with card:
+                    name_label = ui.label('').classes('file-name text-black')
+                    path_label = ui.label('').classes('file-path text-gray-600 w-full')
+                card.on('click', lambda e, s=slot: self._on_row_click(s))
+                card.set_visibility(False)
+                self.rows.append((card, name_label, path_label))
+                self.slot_state.append(None)
+            self.bottom_spacer = ui.element('div').classes('w-full').style('height: 0px;')
+        return self
+
+    def refresh(self, count: int, selected_index: int = -1):
+        """文件列表结构变化（加载、排序、删除）后重新绑定可见行"""
+        self.count = count
+        self.selected_index = selected_index
+        self._render_window(self.first_index, force=True)
+
+    def set_selected(self, index: int, scroll: bool = False):
+        """原地更新选中高亮，只重绘新旧两行"""
+        previous = self.selected_index
+        self.selected_index = index
+        for i in (previous, index):
+            self.refresh_row(i)
+        if scroll:
+            self.scroll_to_index(index)
+
+    def refresh_row(self, index: int):
+        """若该索引的行在可见窗口内，则重新绑定其内容"""
+        slot = index - self.first_index
+        if 0 <= index < self.count and 0 <= slot < self.pool_size:
+            self._bind_slot(slot, index)
+
+    def scroll_to_index(self, index: int):
+        """确保指定索引的行可见"""
+        if not 0 <= index < self.count or self.scroll_area is None:
+            return
+        visible_rows = self.height // self.ROW_HEIGHT
+        if index < self.scroll_row:
+            self.scroll_row = index
+        elif index >= self.scroll_row + visible_rows:
+            self.scroll_row = index - visible_rows + 1
+        else:
+            return
+        self.scroll_area.scroll_to(pixels=self.scroll_row * self.ROW_HEIGHT)
+        self._render_window(self.scroll_row - self.OVERSCAN)
+
+    def _on_scroll(self, e):
+        """滚动事件：计算新的可见窗口"""
+        self.scroll_row = int(e.vertical_position // self.ROW_HEIGHT)
+        self._render_window(self.scroll_row - self.OVERSCAN)
+
+    def _render_window(self, first: int, force: bool = False):
+        """将行池绑定到从 first 开始的连续索引"""
+        first = max(0, min(first, self.count - self.pool_size))
+        if first == self.first_index and not force:
+            return
+        self.first_index = first
+        shown = min(self.pool_size, self.count - first)
+        self.top_spacer.style(f'height: {first * self.ROW_HEIGHT}px;')
+        self.bottom_spacer.style(f'height: {(self.count - first - shown) * self.ROW_HEIGHT}px;')
+        for slot in range(self.pool_size):
+            index = first + slot
+            if index < self.count:
+                self._bind_slot(slot, index)
+            elif self.slot_state[slot] is not None:
+                self.rows[slot][0].set_visibility(False)
+                self.slot_state[slot] = None
+
+    def _bind_slot(self, slot: int, index: int):
+        """把一个槽位绑定到指定索引，内容未变化时不产生任何更新"""
+        name, path = self.row_provider(index)
+        is_selected = index == self.selected_index
+        state = (index, name, path, is_selected)
+        previous = self.slot_state[slot]
+        if previous == state:
+            return
+        card, name_label, path_label = self.rows[slot]
+        name_label.set_text('✅  ' + name if is_selected else name)
+        path_label.set_text(path)
+        if previous is None or previous[3] != is_selected:
+            if is_selected:
+                card.classes(add='bg-blue-50 border-blue-600', remove='border-blue-500')
+                name_label.classes(add='font-semibold')
+            else:
+                card.classes(add='border-blue-500', remove='bg-blue-50 border-blue-600')
+                name_label.classes(remove='font-semibold')
+        if previous is None:
+            card.set_visibility(True)
+        self.slot_state[slot] = state
+
+    def _on_row_click(self, slot: int):
+        """行点击事件"""
+        state = self.slot_state[slot]
+        if state is not None:
+            self.on_select(state[0])
 
 
 class TxtManager:
     """TXT 文件管理工具"""
 
+    PREFETCH_COUNT = 5  # 预取当前排序中前后各 N 个文件的预览图
+    PREVIEW_MEMO_SIZE = 256  # 记住的预览图来源数量
+    AUTOSAVE_DELAY = 2.0  # 停止输入多少秒后自动保存
+    TAG_SUGGESTIONS = 8  # 显示的标签补全候选数
+
     # 多语言文本配置
     TEXTS = {
         'zh': {
@@ -25,12 +209,34 @@ class TxtManager:
             'editor_placeholder': '请选择或加载 TXT 文件',
             'load_area': '📤 加载区',
             'load_files': '批量加载 TXT 文件',
+            'load_folder': '加载数据集文件夹',
+            'recent_datasets': '最近打开的数据集',
+            'select_folder': '选择数据集文件夹',
+            'scan_progress': '已读取 {} / {} 个文件',
+            'cancel_scan': '取消加载',
+            'scan_cancelled': '已取消加载，已载入 {} 个文件',
+            'read_failed_count': '{} 个文件读取失败: {}',
             'file_list': '📂 滚动文件列表',
             'sort_by': '排序方式:',
+            'search_placeholder': '搜索标签：a, b | c, -d, 前缀*, /正则/',
+            'search_results': '匹配 {} 个文件',
+            'search_invalid': '无效的查询: {}',
             'sort_time_desc': '按创建时间（最新在前）',
             'sort_time_asc': '按创建时间（最旧在前）',
             'sort_name_asc': '按文件名（A-Z）',
             'sort_name_desc': '按文件名（Z-A）',
+            'sort_natural_asc': '按文件名数字顺序（1, 2, 10）',
+            'sort_natural_desc': '按文件名数字顺序（10, 2, 1）',
+            'sort_mtime_desc': '按修改时间（最新在前）',
+            'sort_mtime_asc': '按修改时间（最旧在前）',
+            'sort_size_desc': '按文件大小（最大在前）',
+            'sort_size_asc': '按文件大小（最小在前）',
+            'sort_tags_desc': '按标签数（最多在前）',
+            'sort_tags_asc': '按标签数（最少在前）',
+            'sort_resolution_desc': '按图片分辨率（最高在前）',
+            'sort_resolution_asc': '按图片分辨率（最低在前）',
+            'sort_unreviewed_first': '未审阅的在前',
+            'sort_unsaved_first': '未保存的在前',
             'clear_file_list': '清空文件列表',
             'select_file': '选择 TXT 文件',
             'txt_files': 'TXT 文件',
@@ -43,6 +249,135 @@ class TxtManager:
             'sorted_by': '已将文件列表按{}排序',
             'read_failed': '读取文件失败: {}',
             'language': '🌐 语言',
+            'review_mode': '审阅模式',
+            'save_all': '💾 全部保存',
+            'autosave': '自动保存',
+            'dirty_count': '未保存 {} 个文件',
+            'saved_count': '已保存 {} 个文件',
+            'save_failed_count': '{} 个文件保存失败: {}',
+            'nothing_to_save': '没有未保存的修改',
+            'review_hotkeys': 'Alt+↓ / Alt+J 下一个　Alt+↑ / Alt+K 上一个　Ctrl+Enter 保存并下一个　Alt+R 标记已审阅',
+            'review_progress': '已审阅 {} / {}',
+            'bulk_edit': '🛠️ 批量编辑',
+            'bulk_scope': '处理范围',
+            'bulk_scope_all': '全部文件',
+            'bulk_scope_view': '当前搜索结果',
+            'bulk_operation': '操作',
+            'bulk_op_replace': '查找替换文本',
+            'bulk_op_regex_replace': '正则替换',
+            'bulk_op_rename_tag': '重命名标签',
+            'bulk_op_remove_tags': '删除标签',
+            'bulk_op_insert_tags': '插入标签',
+            'bulk_op_dedupe_tags': '标签去重',
+            'bulk_op_reorder_tags': '标签排序（指定标签置前，留空按字母）',
+            'bulk_find': '查找内容 / 标签（逗号分隔）',
+            'bulk_replace': '替换为 / 新标签',
+            'bulk_position': '插入位置',
+            'bulk_position_start': '开头',
+            'bulk_position_end': '末尾',
+            'bulk_preview': '预览修改',
+            'bulk_apply': '应用修改',
+            'close': '关闭',
+            'bulk_invalid': '参数无效: {}',
+            'bulk_summary': '将修改 {} / {} 个文件，{} 个读取失败',
+            'bulk_tag_delta': '新增标签: {}；移除标签: {}',
+            'bulk_done': '已修改 {} 个文件，{} 个失败',
+            'bulk_locked': '{} 个文件正由其他人编辑，已跳过',
+            'bulk_sources_skipped': '清单或压缩包中的 {} 条标注不支持批量编辑，已跳过',
+            'history': '🕘 版本历史',
+            'history_label': '快照说明（可选）',
+            'history_snapshot': '创建快照',
+            'history_snapshot_done': '已创建快照 #{}，{} 个文件与上一版本不同',
+            'history_from': '基准版本',
+            'history_to': '比较版本',
+            'history_latest': '最新',
+            'history_compare': '比较',
+            'history_diff_summary': '{} 个文件不同',
+            'history_missing': '（无记录）',
+            'history_restore_file': '把选中文件恢复到基准版本',
+            'history_restore_all': '把所有文件恢复到基准版本',
+            'history_restored': '已恢复 {} 个文件，{} 个失败，{} 个跳过（该版本时没有记录或正被其他人编辑）',
+            'history_unavailable': '未启用版本历史',
+            'history_empty': '还没有历史版本',
+            'history_files': '{} 个文件',
+            'history_kind_baseline': '原内容',
+            'history_kind_save': '保存',
+            'history_kind_bulk_edit': '批量编辑',
+            'history_kind_rollback': '回滚',
+            'history_kind_snapshot': '快照',
+            'lease_batch': '领取一批',
+            'release_batch': '归还',
+            'lease_granted': '已领取 {} 个未审阅的文件',
+            'lease_empty': '没有可领取的未审阅文件',
+            'batch_progress': '本批已审阅 {} / {}',
+            'locked_by_other': '其他审阅者正在编辑此文件',
+            'tag_stats': '📊 标签统计',
+            'stats_coverage': '已统计 {} / {} 个文件',
+            'stats_read_all': '读取全部文件',
+            'stats_read_failed': '{} 个文件读取失败，例如 {}',
+            'stats_top_tags': '最常见的标签',
+            'stats_rare_tags': '最少见的标签',
+            'stats_length_hist': '文本长度分布（字符）',
+            'stats_tag_count_hist': '标签数分布',
+            'stats_untagged': '没有标签的文件: {}',
+            'stats_summary': '标签 {} 种，平均长度 {:.0f} 字符，平均 {:.1f} 个标签',
+            'perf_panel': '⏱ 性能指标',
+            'perf_reset': '重置',
+            'perf_empty': '尚无计时记录',
+            'perf_operation': '操作',
+            'perf_count': '次数',
+            'perf_summary': '文件 {} 个，缓存 {} 个（{:.1f} MB），未保存 {} 个，在线页面 {} 个',
+            'dup_panel': '🔁 重复检测',
+            'dup_detect': '开始检测',
+            'dup_similarity': '标注相似度下限',
+            'dup_distance': '图片哈希距离上限',
+            'dup_progress': '已处理 {} / {} 个文件',
+            'dup_summary': '{} 组重复，涉及 {} 个文件',
+            'dup_empty': '没有发现重复的文件',
+            'dup_no_pillow': '未安装 Pillow，图片只比较文件内容',
+            'dup_kind_caption_exact': '标注相同',
+            'dup_kind_caption_near': '标注近似',
+            'dup_kind_image_exact': '图片相同',
+            'dup_kind_image_near': '图片近似',
+            'dup_score_caption_near': '最低相似度 {:.2f}',
+            'dup_score_image_near': '最大距离 {}',
+            'dup_keep': '保留',
+            'dup_select_all': '全选',
+            'dup_remove': '移除所选组的重复项',
+            'dup_removed': '已从列表移除 {} 个文件，{} 个有未保存修改的文件未移除',
+            'dup_done': '重复检测完成：{} 组',
+            'dup_failed': '重复检测失败: {}',
+            'dup_running': '重复检测正在进行',
+            'open_archive': '打开数据集压缩包',
+            'select_archive': '选择数据集压缩包',
+            'archive_files': '压缩包 (zip / tar)',
+            'archive_progress': '已加载 {} 个文件',
+            'archive_failed': '压缩包打开失败: {}',
+            'import_manifest': '📥 导入清单',
+            'export_manifest': '📤 导出清单',
+            'select_manifest': '选择清单文件',
+            'manifest_files': '清单文件 (JSONL / Parquet)',
+            'manifest_progress': '已读取 {} 行',
+            'manifest_loaded': '已从清单加载 {} 行',
+            'manifest_failed': '清单读写失败: {}',
+            'manifest_path': '清单路径',
+            'manifest_browse': '浏览',
+            'manifest_format': '格式',
+            'manifest_export': '导出',
+            'manifest_export_progress': '已处理 {} / {} 个文件',
+            'manifest_exported': '已导出 {} 行，{} 个文件读取失败',
+            'manifest_path_required': '请填写清单路径',
+            'manifest_no_pyarrow': '未安装 pyarrow，只能使用 JSONL 格式',
+            'external_summary': '检测到外部修改：重新加载 {} 个，新增 {} 个，移除 {} 个文件',
+            'external_conflict': '{} 个有未保存修改的文件已被其他程序修改或删除，保存前需要确认',
+            'conflict_modified': '文件已被其他程序修改',
+            'conflict_deleted': '文件已被其他程序删除',
+            'conflict_invalid': '清单中的这一行不是有效的 JSON 对象，无法写回',
+            'conflict_title': '保存冲突',
+            'conflict_message': '{}：{}。覆盖磁盘上的文件，还是放弃修改并重新加载？',
+            'conflict_overwrite': '覆盖',
+            'conflict_reload': '放弃修改并重新加载',
+            'cancel': '取消',
         },
         'en': {
             'title': 'Youkengi Label Verification Tool',
@@ -55,12 +390,34 @@ class TxtManager:
             'editor_placeholder': 'Please select or load a TXT file',
             'load_area': '📤 Load Area',
             'load_files': 'Batch Load TXT Files',
+            'load_folder': 'Load Dataset Folder',
+            'recent_datasets': 'Recent Datasets',
+            'select_folder': 'Select Dataset Folder',
+            'scan_progress': 'Read {} / {} files',
+            'cancel_scan': 'Cancel Loading',
+            'scan_cancelled': 'Loading cancelled, {} files loaded',
+            'read_failed_count': 'Failed to read {} files: {}',
             'file_list': '📂 File List',
             'sort_by': 'Sort by:',
+            'search_placeholder': 'Search tags: a, b | c, -d, prefix*, /regex/',
+            'search_results': '{} matching files',
+            'search_invalid': 'Invalid query: {}',
             'sort_time_desc': 'By Time (Newest First)',
             'sort_time_asc': 'By Time (Oldest First)',
             'sort_name_asc': 'By Name (A-Z)',
             'sort_name_desc': 'By Name (Z-A)',
+            'sort_natural_asc': 'By Name, Numeric (1, 2, 10)',
+            'sort_natural_desc': 'By Name, Numeric (10, 2, 1)',
+            'sort_mtime_desc': 'By Modified Time (Newest First)',
+            'sort_mtime_asc': 'By Modified Time (Oldest First)',
+            'sort_size_desc': 'By Size (Largest First)',
+            'sort_size_asc': 'By Size (Smallest First)',
+            'sort_tags_desc': 'By Tag Count (Most First)',
+            'sort_tags_asc': 'By Tag Count (Fewest First)',
+            'sort_resolution_desc': 'By Image Resolution (Highest First)',
+            'sort_resolution_asc': 'By Image Resolution (Lowest First)',
+            'sort_unreviewed_first': 'Unreviewed First',
+            'sort_unsaved_first': 'Unsaved First',
             'clear_file_list': 'Clear File List',
             'select_file': 'Select TXT Files',
             'txt_files': 'TXT Files',
@@ -73,32 +430,205 @@ class TxtManager:
             'sorted_by': 'File list sorted by {}',
             'read_failed': 'Failed to read file: {}',
             'language': '🌐 Language',
+            'review_mode': 'Review Mode',
+            'save_all': '💾 Save All',
+            'autosave': 'Autosave',
+            'dirty_count': '{} unsaved files',
+            'saved_count': '{} files saved',
+            'save_failed_count': 'Failed to save {} files: {}',
+            'nothing_to_save': 'No unsaved changes',
+            'review_hotkeys': 'Alt+↓ / Alt+J next   Alt+↑ / Alt+K previous   Ctrl+Enter save and next   Alt+R mark reviewed',
+            'review_progress': 'Reviewed {} / {}',
+            'bulk_edit': '🛠️ Bulk Edit',
+            'bulk_scope': 'Scope',
+            'bulk_scope_all': 'All files',
+            'bulk_scope_view': 'Current search results',
+            'bulk_operation': 'Operation',
+            'bulk_op_replace': 'Find and replace text',
+            'bulk_op_regex_replace': 'Regex replace',
+            'bulk_op_rename_tag': 'Rename tag',
+            'bulk_op_remove_tags': 'Remove tags',
+            'bulk_op_insert_tags': 'Insert tags',
+            'bulk_op_dedupe_tags': 'Deduplicate tags',
+            'bulk_op_reorder_tags': 'Reorder tags (given tags first, empty for A-Z)',
+            'bulk_find': 'Find / tags (comma separated)',
+            'bulk_replace': 'Replace with / new tag',
+            'bulk_position': 'Insert position',
+            'bulk_position_start': 'Start',
+            'bulk_position_end': 'End',
+            'bulk_preview': 'Preview Changes',
+            'bulk_apply': 'Apply Changes',
+            'close': 'Close',
+            'bulk_invalid': 'Invalid parameters: {}',
+            'bulk_summary': '{} of {} files will change, {} failed to read',
+            'bulk_tag_delta': 'Tags added: {}; tags removed: {}',
+            'bulk_done': '{} files modified, {} failed',
+            'bulk_locked': '{} file(s) are being edited by someone else and were skipped',
+            'bulk_sources_skipped': '{} caption(s) in manifests or archives cannot be bulk edited and were skipped',
+            'history': '🕘 Version History',
+            'history_label': 'Snapshot label (optional)',
+            'history_snapshot': 'Create Snapshot',
+            'history_snapshot_done': 'Snapshot #{} created, {} files differ from the previous version',
+            'history_from': 'Base version',
+            'history_to': 'Compare with',
+            'history_latest': 'Latest',
+            'history_compare': 'Compare',
+            'history_diff_summary': '{} files differ',
+            'history_missing': '(not recorded)',
+            'history_restore_file': 'Restore Selected File to Base Version',
+            'history_restore_all': 'Restore All Files to Base Version',
+            'history_restored': '{} files restored, {} failed, {} skipped (not recorded in that version or being edited by someone else)',
+            'history_unavailable': 'Version history is not enabled',
+            'history_empty': 'No versions recorded yet',
+            'history_files': '{} files',
+            'history_kind_baseline': 'Original',
+            'history_kind_save': 'Save',
+            'history_kind_bulk_edit': 'Bulk edit',
+            'history_kind_rollback': 'Rollback',
+            'history_kind_snapshot': 'Snapshot',
+            'lease_batch': 'Take a Batch',
+            'release_batch': 'Return',
+            'lease_granted': 'Took {} unreviewed files',
+            'lease_empty': 'No unreviewed files left to take',
+            'batch_progress': 'Batch reviewed {} / {}',
+            'locked_by_other': 'Another reviewer is editing this file',
+            'tag_stats': '📊 Tag Statistics',
+            'stats_coverage': '{} of {} files counted',
+            'stats_read_all': 'Read All Files',
+            'stats_read_failed': '{} file(s) could not be read, e.g. {}',
+            'stats_top_tags': 'Most common tags',
+            'stats_rare_tags': 'Rarest tags',
+            'stats_length_hist': 'Caption length (characters)',
+            'stats_tag_count_hist': 'Tags per caption',
+            'stats_untagged': 'Files without tags: {}',
+            'stats_summary': '{} distinct tags, average length {:.0f} characters, {:.1f} tags on average',
+            'perf_panel': '⏱ Performance',
+            'perf_reset': 'Reset',
+            'perf_empty': 'No timings recorded yet',
+            'perf_operation': 'Operation',
+            'perf_count': 'Count',
+            'perf_summary': '{} files, {} cached ({:.1f} MB), {} unsaved, {} pages connected',
+            'dup_panel': '🔁 Duplicates',
+            'dup_detect': 'Detect',
+            'dup_similarity': 'Minimum caption similarity',
+            'dup_distance': 'Maximum image hash distance',
+            'dup_progress': '{} / {} files processed',
+            'dup_summary': '{} duplicate groups covering {} files',
+            'dup_empty': 'No duplicates found',
+            'dup_no_pillow': 'Pillow is not installed; images are compared by file content only',
+            'dup_kind_caption_exact': 'Same caption',
+            'dup_kind_caption_near': 'Similar caption',
+            'dup_kind_image_exact': 'Same image',
+            'dup_kind_image_near': 'Similar image',
+            'dup_score_caption_near': 'lowest similarity {:.2f}',
+            'dup_score_image_near': 'largest distance {}',
+            'dup_keep': 'keep',
+            'dup_select_all': 'Select All',
+            'dup_remove': 'Remove Duplicates of Selected Groups',
+            'dup_removed': '{} files removed from the list, {} files with unsaved changes kept',
+            'dup_done': 'Duplicate detection finished: {} groups',
+            'dup_failed': 'Duplicate detection failed: {}',
+            'dup_running': 'Duplicate detection is already running',
+            'open_archive': 'Open Dataset Archive',
+            'select_archive': 'Select Dataset Archive',
+            'archive_files': 'Archives (zip / tar)',
+            'archive_progress': '{} files loaded',
+            'archive_failed': 'Failed to open archive: {}',
+            'import_manifest': '📥 Import Manifest',
+            'export_manifest': '📤 Export Manifest',
+            'select_manifest': 'Select Manifest File',
+            'manifest_files': 'Manifest files (JSONL / Parquet)',
+            'manifest_progress': '{} rows read',
+            'manifest_loaded': '{} rows loaded from the manifest',
+            'manifest_failed': 'Manifest failed: {}',
+            'manifest_path': 'Manifest path',
+            'manifest_browse': 'Browse',
+            'manifest_format': 'Format',
+            'manifest_export': 'Export',
+            'manifest_export_progress': '{} / {} files processed',
+            'manifest_exported': '{} rows exported, {} files could not be read',
+            'manifest_path_required': 'Please enter a manifest path',
+            'manifest_no_pyarrow': 'pyarrow is not installed; only JSONL is available',
+            'external_summary': 'External changes detected: {} reloaded, {} added, {} removed',
+            'external_conflict': '{} files with unsaved changes were modified or deleted by another program; saving them needs confirmation',
+            'conflict_modified': 'File was modified by another program',
+            'conflict_deleted': 'File was deleted by another program',
+            'conflict_invalid': 'This manifest line is not a valid JSON object and cannot be written back',
+            'conflict_title': 'Save Conflict',
+            'conflict_message': '{}: {}. Overwrite the file on disk, or discard your changes and reload?',
+            'conflict_overwrite': 'Overwrite',
+            'conflict_reload': 'Discard and Reload',
+            'cancel': 'Cancel',
         }
     }
 
-    def __init__(self, title: str = "TXT 管理工具"):
+    def __init__(self, title: str = "TXT 管理工具", cache_bytes: int = DEFAULT_CACHE_BYTES,
+                 index_path: Optional[str] = DEFAULT_INDEX_PATH, store: Optional[DatasetStore] = None,
+                 history_path: Optional[str] = DEFAULT_HISTORY_PATH):
         """
         初始化 TXT 管理工具
 
         Args:
             title: 工具标题
+            cache_bytes: 文本内容缓存的字节上限（未传入 store 时使用）
+            index_path: 持久化索引数据库路径，为 None 时不使用索引（未传入 store 时使用）
+            store: 与其他页面共享的数据集，为 None 时创建独立的数据集
+            history_path: 标注版本历史数据库路径，为 None 时不记录历史（未传入 store 时使用）
         """
         self.title = title
-        self.txt_files: List[str] = []
-        self.selected_index: int = -1
+        self.store = store if store is not None else DatasetStore(cache_bytes, index_path, history_path=history_path)
+        self.session_id: str = uuid.uuid4().hex  # 编辑锁和审阅批次的持有者
+        # 以下对象由共享同一数据集的所有页面共用
+        self.file_contents = self.store.file_contents
+        self.file_table = self.store.file_table
+        self.file_set = self.store.file_set
+        self.tag_stats = self.store.tag_stats
+        self.tag_index = self.store.tag_index
+        self.reviewed = self.store.reviewed
+        self.saver = self.store.saver
+        self.index = self.store.index
+        self.dataset_roots = self.store.dataset_roots
+        self.sort_by: str = 'time_desc'  # 默认按创建时间排序，最新的在前
+        # 当前排序下的文件列表和位置映射（同一排序方式的页面共用一份）
+        self.txt_files, self.file_positions = self.store.ordering(self.sort_by)
+        self.selected_file: Optional[str] = None  # 选中的文件，文件列表变化后选中位置随之更新
         self.ui_refs = {}
-        self.file_contents: dict = {}
-        self.file_info: dict = {}  # 存储文件信息，包括创建时间
-        self.sort_by: str = 'time'  # 默认按创建时间排序
+        self.search_query: str = ''
+        self.view_files: Optional[List[str]] = None  # 搜索过滤后显示的文件，None 表示不过滤
+        self.view_positions: dict = {}  # 文件路径 -> 在 view_files 中的位置
+        self.thumbnails = thumbnail_cache
+        self.preview_sources: OrderedDict = OrderedDict()  # 文件路径 -> 预览图来源的 Future
+        self._tag_segment: Optional[Tuple[str, int, int]] = None  # 补全候选对应的 (文件, 标签起点, 终点)
+        self.caption_prefetching: set = set()  # 正在后台预读的文本
+        self.review_mode: bool = False
+        self.autosave: bool = False
+        self._autosave_handle = None  # 自动保存的防抖定时器
+        self.client = None
         self.current_lang: str = 'zh'  # 默认中文
         self.lang_elements: dict = {}  # 存储需要更新的UI元素
 
+    @property
+    def selected_index(self) -> int:
+        """选中文件在 txt_files 中的位置，未选中时为 -1"""
+        if self.selected_file is None:
+            return -1
+        return self.file_positions.get(self.selected_file, -1)
+
+    @selected_index.setter
+    def selected_index(self, index: int):
+        self.selected_file = self.txt_files[index] if 0 <= index < len(self.txt_files) else None
+
     def t(self, key: str) -> str:
         """获取当前语言的文本"""
         return self.TEXTS[self.current_lang].get(key, key)
 
     def create(self):
         """创建 TXT 管理工具界面"""
+        self.client = context.client
+        # 页面断开时不再接收数据集的变化，重新连接后恢复并刷新
+        self.client.on_disconnect(lambda: self.store.detach(self))
+        self.client.on_connect(self._on_reconnect)
+        self.store.attach(self)
         # 添加自定义样式
         self._add_custom_styles()
         
@@ -115,11 +645,28 @@ class TxtManager:
                     with ui.row().classes('w-full items-center justify-between mb-3'):
                         self.lang_elements['preview_area'] = ui.label(self.t('preview_area')).classes('text-lg font-semibold')
                         # 操作按钮
-                        with ui.row().classes('gap-2'):
+                        with ui.row().classes('gap-2 items-center'):
+                            self.lang_elements['review_switch'] = ui.switch(self.t('review_mode'), on_change=self._on_review_mode_change)
+                            self.lang_elements['autosave_switch'] = ui.switch(self.t('autosave'), on_change=self._on_autosave_change)
+                            self.ui_refs['dirty_label'] = ui.label('').classes('text-xs text-orange-600')
+                            self.ui_refs['lock_label'] = ui.label('').classes('text-xs text-red-600')
                             self.lang_elements['save_btn'] = ui.button(self.t('save_changes'), on_click=self._save_changes).props('color=primary')
+                            self.lang_elements['save_all_btn'] = ui.button(self.t('save_all'), on_click=self._save_all).props('color=primary outline')
                             self.lang_elements['delete_btn'] = ui.button(self.t('delete_file'), on_click=self._delete_file).props('color=negative')
                             self.lang_elements['clear_btn'] = ui.button(self.t('clear_preview'), on_click=self._clear_preview).props('outline')
                     
+                    # 审阅模式快捷键提示和进度
+                    with ui.row().classes('w-full items-center justify-between mb-2') as review_bar:
+                        self.lang_elements['review_hotkeys'] = ui.label(self.t('review_hotkeys')).classes('text-xs text-gray-600')
+                        # 多人审阅时每人领取互不重叠的一批文件，领取后列表只显示本批文件
+                        with ui.row().classes('items-center gap-2'):
+                            self.ui_refs['lease_size'] = ui.number(value=50, min=1, step=10, format='%d').props('dense').classes('w-20')
+                            self.lang_elements['lease_btn'] = ui.button(self.t('lease_batch'), on_click=self._lease_batch).props('dense outline')
+                            self.lang_elements['release_btn'] = ui.button(self.t('release_batch'), on_click=self._release_batch).props('dense flat')
+                            self.ui_refs['review_progress'] = ui.label('').classes('text-xs font-medium')
+                    review_bar.set_visibility(False)
+                    self.ui_refs['review_bar'] = review_bar
+
                     # 图片预览区域
                     self.lang_elements['image_preview'] = ui.label(self.t('image_preview')).classes('text-md font-semibold mb-3')
                     # 独立的图片显示区域
@@ -133,6 +680,8 @@ class TxtManager:
                         placeholder=self.t('editor_placeholder'),
                         on_change=self._on_content_change
                     ).props('autogrow').classes('w-full').style('min-height: 400px; font-family: monospace;')
+                    # 标签补全：输入时显示整个数据集中以当前输入开头的常用标签，点击替换正在输入的标签
+                    self.ui_refs['tag_suggestions'] = ui.row().classes('w-full gap-1 flex-wrap')
 
             # 右侧：加载区（固定宽度）
             with ui.column().classes('w-96 gap-3 flex-shrink-0'):
@@ -140,27 +689,59 @@ class TxtManager:
                 with ui.card().classes('w-full p-4'):
                     self.lang_elements['load_area'] = ui.label(self.t('load_area')).classes('text-lg font-semibold mb-3')
                     self.lang_elements['load_btn'] = ui.button(self.t('load_files'), on_click=self._load_txt_files).classes('w-full bg-blue-500 text-white')
+                    self.lang_elements['load_folder_btn'] = ui.button(self.t('load_folder'), on_click=self._load_txt_folder).classes('w-full mt-2 bg-blue-500 text-white')
+                    self.lang_elements['open_archive_btn'] = ui.button(self.t('open_archive'), on_click=self._load_archive).classes('w-full mt-2 bg-blue-500 text-white')
+                    self.lang_elements['import_manifest_btn'] = ui.button(self.t('import_manifest'), on_click=self._import_manifest).classes('w-full mt-2').props('outline')
+                    self.lang_elements['export_manifest_btn'] = ui.button(self.t('export_manifest'), on_click=self._open_export_dialog).classes('w-full mt-2').props('outline')
+                    self.lang_elements['bulk_btn'] = ui.button(self.t('bulk_edit'), on_click=self._open_bulk_dialog).classes('w-full mt-2').props('outline')
+                    self.lang_elements['history_btn'] = ui.button(self.t('history'), on_click=self._open_history_dialog).classes('w-full mt-2').props('outline')
+                    self.lang_elements['stats_btn'] = ui.button(self.t('tag_stats'), on_click=self._open_stats_dialog).classes('w-full mt-2').props('outline')
+                    self.lang_elements['dup_btn'] = ui.button(self.t('dup_panel'), on_click=self._open_duplicates_dialog).classes('w-full mt-2').props('outline')
+                    self.lang_elements['perf_btn'] = ui.button(self.t('perf_panel'), on_click=self._open_perf_dialog).classes('w-full mt-2').props('outline')
+                    # 最近打开的数据集，选择后直接从索引重新打开
+                    self.ui_refs['recent_select'] = ui.select(
+                        options=self.index.recent_datasets() if self.index else [],
+                        label=self.t('recent_datasets'),
+                        on_change=self._on_recent_dataset
+                    ).classes('w-full mt-2').props('dense')
+                    # 加载进度（加载时显示）
+                    with ui.column().classes('w-full mt-2 gap-1') as scan_panel:
+                        self.ui_refs['scan_progress'] = ui.linear_progress(value=0, show_value=False).classes('w-full')
+                        self.ui_refs['scan_label'] = ui.label('').classes('text-xs text-gray-600')
+                        self.lang_elements['cancel_scan_btn'] = ui.button(self.t('cancel_scan'), on_click=self._cancel_scan).props('outline dense').classes('w-full')
+                    scan_panel.set_visibility(False)
+                    self.ui_refs['scan_panel'] = scan_panel
                 
                 # 滚动文件列表卡片
                 with ui.card().classes('w-full p-4'):
                     self.lang_elements['file_list'] = ui.label(self.t('file_list')).classes('text-sm font-medium mb-2')
+                    # 标签搜索，输入时过滤文件列表
+                    self.ui_refs['search_input'] = ui.input(
+                        placeholder=self.t('search_placeholder'),
+                        on_change=self._on_search_change
+                    ).props('dense clearable debounce=150').classes('w-full')
+                    self.ui_refs['search_label'] = ui.label('').classes('text-xs text-gray-600 mb-2')
                     # 排序方式选择
                     with ui.row().classes('w-full mb-3 items-center gap-2'):
                         self.lang_elements['sort_label'] = ui.label(self.t('sort_by')).classes('text-xs')
                         self.ui_refs['sort_select'] = ui.select(
-                            options=[
-                                self.t('sort_time_desc'),
-                                self.t('sort_time_asc'),
-                                self.t('sort_name_asc'),
-                                self.t('sort_name_desc')
-                            ],
-                            value=self.t('sort_time_desc'),
+                            options=self._sort_options(),
+                            value=self.sort_by,
                             on_change=self._on_sort_change
                         ).classes('flex-grow')
                     # 清空文件列表按钮
                     self.lang_elements['clear_list_btn'] = ui.button(self.t('clear_file_list'), on_click=self._clear_file_list).classes('w-full mb-3 bg-gray-200 text-gray-700')
-                    # 使用紧凑卡片展示文件列表
-                    self.ui_refs['file_cards'] = ui.column().classes('w-full max-h-[576px] overflow-y-auto')
+                    # 使用虚拟化列表展示文件，只渲染可见行
+                    self.ui_refs['file_cards'] = VirtualFileList(
+                        row_provider=self._file_row,
+                        on_select=self._on_row_select
+                    ).create()
+
+        # 审阅模式快捷键（编辑框内同样生效，因此都需要组合键）
+        ui.keyboard(on_key=self._on_key, ignore=[])
+
+        # 其他页面可能已经加载了数据集
+        self._update_file_list()
 
         return self
 
@@ -181,7 +762,7 @@ class TxtManager:
         
         # 更新标签类UI元素
         label_keys = [
-            'preview_area', 'image_preview', 'load_area', 'file_list', 'sort_by'
+            'preview_area', 'image_preview', 'load_area', 'file_list', 'sort_by', 'review_hotkeys'
         ]
         
         for key in label_keys:
@@ -194,6 +775,21 @@ class TxtManager:
             'delete_btn': 'delete_file',
             'clear_btn': 'clear_preview',
             'load_btn': 'load_files',
+            'load_folder_btn': 'load_folder',
+            'open_archive_btn': 'open_archive',
+            'import_manifest_btn': 'import_manifest',
+            'export_manifest_btn': 'export_manifest',
+            'bulk_btn': 'bulk_edit',
+            'history_btn': 'history',
+            'stats_btn': 'tag_stats',
+            'dup_btn': 'dup_panel',
+            'perf_btn': 'perf_panel',
+            'lease_btn': 'lease_batch',
+            'release_btn': 'release_batch',
+            'review_switch': 'review_mode',
+            'autosave_switch': 'autosave',
+            'save_all_btn': 'save_all',
+            'cancel_scan_btn': 'cancel_scan',
             'clear_list_btn': 'clear_file_list'
         }
         
@@ -203,12 +799,15 @@ class TxtManager:
         
         # 更新排序选项
         if 'sort_select' in self.ui_refs:
-            self.ui_refs['sort_select'].options = [
-                self.t('sort_time_desc'),
-                self.t('sort_time_asc'),
-                self.t('sort_name_asc'),
-                self.t('sort_name_desc')
-            ]
+            self.ui_refs['sort_select'].options = self._sort_options()
+            self.ui_refs['sort_select'].update()
+        
+        if 'recent_select' in self.ui_refs:
+            self.ui_refs['recent_select'].props(f'label="{self.t("recent_datasets")}"')
+        
+        if 'search_input' in self.ui_refs:
+            self.ui_refs['search_input'].props(f'placeholder="{self.t("search_placeholder")}"')
+            self._update_file_list()
         
         # 更新编辑器placeholder
         if 'editor' in self.ui_refs:
@@ -295,40 +894,141 @@ class TxtManager:
         files = await loop.run_in_executor(None, self._open_file_dialog)
 
         if files:
-            # 去重并添加新文件
-            for file_path in files:
-                if file_path not in self.txt_files:
-                    self.txt_files.append(file_path)
-                    # 读取文件内容
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                        self.file_contents[file_path] = content
-                        # 存储文件信息，包括创建时间
-                        file_stat = os.stat(file_path)
-                        self.file_info[file_path] = {
-                            'name': os.path.basename(file_path),
-                            'created_time': file_stat.st_ctime
-                        }
-                    except Exception as e:
-                        ui.notify(self.t('read_failed').format(e), type='negative')
-            
-            # 保存当前选中的文件路径
-            current_selected_file = None
-            if self.selected_index >= 0 and self.selected_index < len(self.txt_files):
-                current_selected_file = self.txt_files[self.selected_index]
-            
-            # 排序文件列表
-            self._sort_files()
-            
-            # 恢复选中状态
-            if current_selected_file and current_selected_file in self.txt_files:
-                self.selected_index = self.txt_files.index(current_selected_file)
-            
-            # 更新文件列表
-            self._update_file_list()
-            ui.notify(self.t('file_loaded').format(len(files)), type='positive')
-    
+            # 只读取尚未加载的文件
+            new_files = [file_path for file_path in dict.fromkeys(map(os.path.abspath, files))
+                         if file_path not in self.file_set]
+            known = await loop.run_in_executor(None, self.index.lookup, new_files) if self.index else None
+            await self._run_scan(DatasetScanner(new_files, reader=self.store.scan_reader(known)))
+            if self.index:
+                # 未变化的文件扫描时不读取内容，标签从索引中读取
+                await self.store.load_indexed_tags(known)
+                self._add_reviewed(await loop.run_in_executor(None, self.index.reviewed_in, new_files))
+
+    async def _load_txt_folder(self, folder: Optional[str] = None):
+        """加载数据集文件夹（递归扫描其中的所有 TXT 文件）"""
+        import asyncio
+
+        loop = asyncio.get_event_loop()
+        if not folder:
+            folder = await loop.run_in_executor(None, self._open_folder_dialog)
+
+        if folder and self.store.scanner is None:
+            folder = os.path.abspath(folder)
+            known = None
+            if self.index:
+                # 先用索引中的条目（只有元数据）立即填充列表，分批读取标签后再在后台按修改时间和大小校验
+                known = await loop.run_in_executor(None, self.index.entries_under, folder)
+                reviewed = await loop.run_in_executor(None, self.index.reviewed_under, folder)
+                self.store.add_entries(known.values())
+                await self.store.load_indexed_tags(known)
+                self._add_reviewed(reviewed)
+            await self._run_scan(DatasetScanner(iter_txt_files(folder), reader=self.store.scan_reader(known)),
+                                 known=known, root=folder)
+
+    def _add_reviewed(self, paths):
+        """恢复索引中记录的已审阅标记"""
+        self.store.add_reviewed(paths)
+        self.store.emit('_on_store_files_changed')
+
+    @timed('load')
+    async def _run_scan(self, scanner: DatasetScanner, known: Optional[dict] = None, root: Optional[str] = None):
+        """
+        在后台线程中执行扫描，并按批次把文件加入列表
+
+        Args:
+            scanner: 扫描器
+            known: 扫描前索引中已有的条目，扫描完成后其中未出现的文件会被移除
+            root: 扫描的数据集目录，扫描完成后记录到最近打开列表
+        """
+        import asyncio
+
+        if self.store.scanner is not None:
+            return
+        self.store.scanner = scanner
+        loop = asyncio.get_event_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def on_batch(entries, errors, done, discovered):
+            # 在扫描线程中写入索引，避免阻塞事件循环
+            if self.index:
+                self.index.upsert(entry for entry in entries if not entry.get('unchanged'))
+            loop.call_soon_threadsafe(queue.put_nowait, (entries, errors, done, discovered))
+
+        self._show_scan_progress(0, 0)
+        future = loop.run_in_executor(None, scanner.run, on_batch)
+        future.add_done_callback(lambda _: queue.put_nowait(None))
+
+        loaded = 0
+        seen = set()
+        directories = set()
+        errors = []
+        try:
+            while True:
+                batch = await queue.get()
+                if batch is None:
+                    break
+                entries, batch_errors, done, discovered = batch
+                if scanner.cancelled:
+                    continue
+                loaded += len(entries)
+                self.store.add_entries(entries)
+                directories.update(os.path.dirname(entry['path']) for entry in entries)
+                if known:
+                    seen.update(entry['path'] for entry in entries)
+                errors.extend(batch_errors)
+                self._show_scan_progress(done, discovered)
+                # 新文件按排序键直接插入到各个排序中的位置
+                self.store.emit('_on_store_files_changed')
+            await future
+        finally:
+            self.store.scanner = None
+            self.ui_refs['scan_panel'].set_visibility(False)
+
+        if not scanner.cancelled:
+            if known:
+                # 移除索引中有记录但磁盘上已不存在的文件
+                missing = known.keys() - seen
+                if missing:
+                    self.store.remove_files(missing)
+                    self.index.remove(missing)
+            if root:
+                self.dataset_roots.add(os.path.join(root, ''))
+                if self.index:
+                    self.index.record_dataset(root)
+                    self._update_recent_datasets()
+        self.store.watch_directories(directories)
+
+        self.store.emit('_on_store_files_changed')
+        if errors:
+            ui.notify(self.t('read_failed_count').format(len(errors), errors[0][1]), type='negative')
+        if scanner.cancelled:
+            ui.notify(self.t('scan_cancelled').format(loaded), type='warning')
+        else:
+            ui.notify(self.t('file_loaded').format(loaded), type='positive')
+
+    async def _on_recent_dataset(self, e):
+        """选择最近打开的数据集"""
+        if e.value and is_archive(e.value):
+            await self._load_archive(e.value)
+        elif e.value:
+            await self._load_txt_folder(e.value)
+
+    def _update_recent_datasets(self):
+        """刷新最近打开的数据集列表"""
+        if 'recent_select' in self.ui_refs and self.index:
+            self.ui_refs['recent_select'].set_options(self.index.recent_datasets())
+
+    def _show_scan_progress(self, done: int, discovered: int):
+        """更新加载进度"""
+        self.ui_refs['scan_panel'].set_visibility(True)
+        self.ui_refs['scan_progress'].set_value(done / discovered if discovered else 0)
+        self.ui_refs['scan_label'].set_text(self.t('scan_progress').format(done, discovered))
+
+    def _cancel_scan(self):
+        """取消正在进行的加载"""
+        if self.store.scanner is not None:
+            self.store.scanner.cancel()
+
     def _open_file_dialog(self):
         """打开文件选择对话框"""
         import tkinter as tk
@@ -345,178 +1045,1260 @@ class TxtManager:
         root.destroy()
         return files
 
+    async def _load_archive(self, path: Optional[str] = None):
+        """不解压直接打开 zip / tar 压缩包中的数据集（标注和图片在选中时才读取，修改写入压缩包旁的覆盖文件）"""
+        import asyncio
+
+        if not path:
+            path = await asyncio.get_event_loop().run_in_executor(None, self._open_archive_dialog)
+        if not path or self.store.scanner is not None:
+            return
+        path = os.path.abspath(path)
+
+        def on_progress(loaded, fraction):
+            self.ui_refs['scan_panel'].set_visibility(True)
+            self.ui_refs['scan_progress'].set_value(fraction)
+            self.ui_refs['scan_label'].set_text(self.t('archive_progress').format(loaded))
+
+        try:
+            loaded = await self.store.load_archive(path, on_progress)
+        except (OSError, ValueError) as e:
+            ui.notify(self.t('archive_failed').format(e), type='negative')
+            return
+        finally:
+            self.ui_refs['scan_panel'].set_visibility(False)
+        if self.index:
+            self.index.record_dataset(path)
+            self._update_recent_datasets()
+        ui.notify(self.t('file_loaded').format(loaded), type='positive')
+
+    def _open_archive_dialog(self):
+        """打开压缩包选择对话框"""
+        import tkinter as tk
+        from tkinter import filedialog
+
+        root = tk.Tk()
+        root.withdraw()
+        root.attributes('-topmost', True)
+
+        path = filedialog.askopenfilename(
+            title=self.t('select_archive'),
+            filetypes=[(self.t('archive_files'), ' '.join(f'*{ext}' for ext in ARCHIVE_EXTENSIONS))]
+        )
+        root.destroy()
+        return path
+
+    async def _import_manifest(self):
+        """从 JSONL 或 Parquet 清单加载数据集（每一行显示为一个文件，保存时写回清单）"""
+        import asyncio
+
+        path = await asyncio.get_event_loop().run_in_executor(None, self._open_manifest_dialog)
+        if not path or self.store.scanner is not None:
+            return
+
+        def on_progress(loaded, fraction):
+            self.ui_refs['scan_panel'].set_visibility(True)
+            self.ui_refs['scan_progress'].set_value(fraction)
+            self.ui_refs['scan_label'].set_text(self.t('manifest_progress').format(loaded))
+
+        try:
+            loaded = await self.store.load_manifest(os.path.abspath(path), on_progress)
+        except (OSError, ValueError, RuntimeError) as e:
+            ui.notify(self.t('manifest_failed').format(e), type='negative')
+            return
+        finally:
+            self.ui_refs['scan_panel'].set_visibility(False)
+        ui.notify(self.t('manifest_loaded').format(loaded), type='positive')
+
+    def _open_manifest_dialog(self):
+        """打开清单文件选择对话框"""
+        import tkinter as tk
+        from tkinter import filedialog
+
+        root = tk.Tk()
+        root.withdraw()
+        root.attributes('-topmost', True)
+
+        patterns = '*.jsonl *.ndjson *.json *.parquet' if PARQUET_AVAILABLE else '*.jsonl *.ndjson *.json'
+        path = filedialog.askopenfilename(
+            title=self.t('select_manifest'),
+            filetypes=[(self.t('manifest_files'), patterns)]
+        )
+        root.destroy()
+        return path
+
+    def _open_save_manifest_dialog(self, fmt: str):
+        """打开清单保存位置对话框"""
+        import tkinter as tk
+        from tkinter import filedialog
+
+        root = tk.Tk()
+        root.withdraw()
+        root.attributes('-topmost', True)
+
+        path = filedialog.asksaveasfilename(
+            title=self.t('export_manifest'),
+            defaultextension=f'.{fmt}',
+            filetypes=[(self.t('manifest_files'), f'*.{fmt}')]
+        )
+        root.destroy()
+        return path
+
+    def _open_folder_dialog(self):
+        """打开文件夹选择对话框"""
+        import tkinter as tk
+        from tkinter import filedialog
+
+        root = tk.Tk()
+        root.withdraw()
+        root.attributes('-topmost', True)
+
+        folder = filedialog.askdirectory(title=self.t('select_folder'))
+        root.destroy()
+        return folder
+
+    @timed('update_file_list')
     def _update_file_list(self):
         """更新文件列表"""
-        # 更新文件卡片列表
+        self._update_view()
+        # 文件列表结构变化后，仅重新绑定可见窗口内的行
         if 'file_cards' in self.ui_refs:
-            # 清空现有卡片
-            self.ui_refs['file_cards'].clear()
-            # 添加新卡片
-            for file_path in self.txt_files:
-                file_name = os.path.basename(file_path)
-                # 检查是否是当前选中的文件
-                is_selected = False
-                if self.selected_index >= 0 and self.selected_index < len(self.txt_files):
-                    is_selected = (file_path == self.txt_files[self.selected_index])
-                
-                # 使用紧凑样式的卡片，为选中的文件添加特殊样式
-                card_classes = 'w-full mb-2 compact-file-item cursor-pointer border-l-4 border-blue-500'
-                if is_selected:
-                    card_classes += ' bg-blue-50 border-l-4 border-blue-600'
-                
-                # 使用 parent 参数指定父容器
-                with self.ui_refs['file_cards']:
-                    card = ui.card().classes(card_classes)
-                    with card:
-                        if is_selected:
-                            ui.label('✅  ' + file_name).classes('file-name text-black font-semibold')
-                        else:
-                            ui.label(file_name).classes('file-name text-black')
-                        ui.label(file_path).classes('file-path text-gray-600')
-                    # 添加点击事件
-                    card.on('click', lambda e, fp=file_path: self._on_file_click(fp))
-
-    def _on_file_click(self, file_path):
+            self.ui_refs['file_cards'].refresh(len(self._visible_files()), self._selected_view_index())
+        self._update_review_progress()
+        self._update_dirty_status()
+
+    def _update_selection(self):
+        """原地更新文件列表的选中标记"""
+        if 'file_cards' in self.ui_refs:
+            self.ui_refs['file_cards'].set_selected(self._selected_view_index())
+
+    def _visible_files(self) -> List[str]:
+        """返回文件列表中实际显示的文件（搜索过滤后）"""
+        return self.txt_files if self.view_files is None else self.view_files
+
+    def _selected_view_index(self) -> int:
+        """返回选中文件在显示列表中的位置，不可见时返回 -1"""
+        if self.selected_index < 0 or self.selected_index >= len(self.txt_files):
+            return -1
+        if self.view_files is None:
+            return self.selected_index
+        return self.view_positions.get(self.txt_files[self.selected_index], -1)
+
+    def _update_view(self):
+        """根据搜索条件重新计算显示的文件，保持当前排序"""
+        results = None
+        message = ''
+        if self.search_query.strip():
+            try:
+                results = self.tag_index.search(self.search_query)
+            except ValueError as e:
+                message = self.t('search_invalid').format(e)
+        batch = self.store.leases.batch_of(self.session_id) if self.review_mode else None
+        if batch:
+            results = batch if results is None else results & batch
+        if results is None:
+            self.view_files = None
+            self.view_positions = {}
+        else:
+            if len(results) * 8 < len(self.txt_files):
+                # 结果较少时按位置排序，避免遍历整个列表
+                self.view_files = sorted(
+                    (file_path for file_path in results if file_path in self.file_positions),
+                    key=self.file_positions.__getitem__
+                )
+            else:
+                self.view_files = [file_path for file_path in self.txt_files if file_path in results]
+            self.view_positions = {file_path: i for i, file_path in enumerate(self.view_files)}
+            message = self.t('search_results').format(len(self.view_files))
+        if 'search_label' in self.ui_refs:
+            self.ui_refs['search_label'].set_text(message)
+
+    def _on_search_change(self, e):
+        """搜索框内容变化事件"""
+        self.search_query = e.value or ''
+        self._update_file_list()
+
+    def _on_row_select(self, index: int):
+        """文件列表行点击事件（index 为显示列表中的位置）"""
+        file_path = self._visible_files()[index]
+        self._on_file_click(file_path, self.file_positions[file_path])
+
+    def _file_row(self, index: int) -> Tuple[str, str]:
+        """返回文件列表第 index 行显示的 (文件名, 文件路径)"""
+        file_path = self._visible_files()[index]
+        file_name = self.file_table.name(file_path) if file_path in self.file_set else os.path.basename(file_path)
+        if file_path in self.reviewed:
+            file_name = '☑ ' + file_name
+        # 保存状态：⚡ 与外部修改冲突，⚠ 保存失败，● 有未保存的修改
+        conflict = self.saver.conflicts.get(file_path)
+        if conflict is not None:
+            return '⚡ ' + file_name, self.t(f'conflict_{conflict}')
+        error = self.saver.errors.get(file_path)
+        if error is not None:
+            return '⚠ ' + file_name, self.t('save_failed').format(error)
+        if self.file_contents.is_dirty(file_path):
+            file_name = '● ' + file_name
+        return file_name, file_path
+
+    @timed('file_click')
+    def _on_file_click(self, file_path, index: Optional[int] = None):
         """文件卡片点击事件"""
         # 保存上一次选中的文件
         self.last_selected_file = file_path
         
-        self.selected_index = self.txt_files.index(file_path)
-        # 显示文件内容
-        if file_path in self.file_contents:
-            self.ui_refs['editor'].value = self.file_contents[file_path]
+        # 列表点击时已知索引，否则通过位置映射查找
+        if index is None:
+            index = self.file_positions[file_path]
+        self.selected_index = index
+        # 显示文件内容（未缓存时从磁盘读取）
+        content = self._read_content(file_path)
+        self.ui_refs['editor'].value = content if content is not None else ''
         # 加载同名图片到图片预览区
         self._load_image_preview(file_path)
-        # 更新文件列表，显示选中标记
+        # 预读后续文件的文本
+        self._prefetch_captions()
+        # 原地更新选中标记
+        self._update_selection()
+        # 其他页面正在编辑时只读，并延长本页面领取的批次的租期
+        self._update_editor_lock()
+        self.store.leases.renew(self.session_id)
+
+    def _prefetch_captions(self):
+        """在后台预读显示顺序中后续几个文件的文本"""
+        import asyncio
+
+        files = self._visible_files()
+        center = self._selected_view_index()
+        if center < 0:
+            return
+        loop = asyncio.get_event_loop()
+        for i in range(center + 1, min(center + 1 + self.PREFETCH_COUNT, len(files))):
+            file_path = files[i]
+            if file_path in self.file_contents or file_path in self.caption_prefetching:
+                continue
+            self.caption_prefetching.add(file_path)
+            future = loop.run_in_executor(None, self.store.read_caption, file_path)
+            future.add_done_callback(functools.partial(self._on_caption_prefetched, file_path))
+
+    def _on_caption_prefetched(self, file_path: str, future):
+        """预读完成：放入缓存（读取失败时忽略，选中时会重新读取并提示）"""
+        self.caption_prefetching.discard(file_path)
+        if future.cancelled() or future.exception() is not None or file_path not in self.file_set:
+            return
+        content = future.result()
+        self.file_contents.put(file_path, content)
+        self.tag_index.update(file_path, content)
+
+    def _on_review_mode_change(self, e):
+        """审阅模式开关"""
+        self.review_mode = bool(e.value)
+        self.ui_refs['review_bar'].set_visibility(self.review_mode)
+        # 审阅模式下只显示领取的批次
         self._update_file_list()
 
-    def _sort_files(self):
-        """排序文件列表"""
-        if self.sort_by == 'time_desc':
-            # 按创建时间排序，最新的在前
-            self.txt_files.sort(key=lambda x: self.file_info.get(x, {}).get('created_time', 0), reverse=True)
-        elif self.sort_by == 'time_asc':
-            # 按创建时间排序，最旧的在前
-            self.txt_files.sort(key=lambda x: self.file_info.get(x, {}).get('created_time', 0))
-        elif self.sort_by == 'name_asc':
-            # 按文件名排序，A-Z
-            self.txt_files.sort(key=lambda x: self.file_info.get(x, {}).get('name', ''))
-        elif self.sort_by == 'name_desc':
-            # 按文件名排序，Z-A
-            self.txt_files.sort(key=lambda x: self.file_info.get(x, {}).get('name', ''), reverse=True)
-        # 重置选中索引
-        self.selected_index = -1
+    async def _on_key(self, e):
+        """审阅模式快捷键"""
+        if not self.review_mode or not e.action.keydown:
+            return
+        # 字母键使用物理按键码，避免 Alt 组合在部分系统上产生其他字符
+        if e.modifiers.alt and (e.key.arrow_down or e.key.code == 'KeyJ'):
+            self._step_selection(1)
+        elif e.modifiers.alt and (e.key.arrow_up or e.key.code == 'KeyK'):
+            self._step_selection(-1)
+        elif e.modifiers.ctrl and e.key.enter and not e.action.repeat:
+            await self._save_and_next()
+        elif e.modifiers.alt and e.key.code == 'KeyR' and not e.action.repeat:
+            self._toggle_reviewed()
+
+    def _step_selection(self, offset: int):
+        """在当前显示顺序中前后移动选中文件（不重建文件列表）"""
+        files = self._visible_files()
+        if not files:
+            return
+        current = self._selected_view_index()
+        target = 0 if current < 0 else max(0, min(len(files) - 1, current + offset))
+        if target == current:
+            return
+        file_path = files[target]
+        self._on_file_click(file_path, self.file_positions[file_path])
+        self.ui_refs['file_cards'].scroll_to_index(target)
+
+    async def _save_and_next(self):
+        """保存当前文件、标记为已审阅并跳到下一个"""
+        if await self._save_changes():
+            self._set_reviewed(self.txt_files[self.selected_index], True)
+            self._step_selection(1)
+
+    def _toggle_reviewed(self):
+        """切换当前文件的已审阅标记"""
+        if self.selected_index >= 0 and self.selected_index < len(self.txt_files):
+            file_path = self.txt_files[self.selected_index]
+            self._set_reviewed(file_path, file_path not in self.reviewed)
+
+    def _set_reviewed(self, file_path: str, reviewed: bool):
+        """设置已审阅标记并持久化"""
+        self.store.set_reviewed([file_path], reviewed)
+        self.store.emit('_on_store_files_updated', [file_path], self)
+
+    def _refresh_file_row(self, file_path: str):
+        """重绘文件列表中某个文件所在的行（不可见时不做任何事）"""
+        if 'file_cards' not in self.ui_refs:
+            return
+        view_index = self.view_positions.get(file_path, -1) if self.view_files is not None \
+            else self.file_positions.get(file_path, -1)
+        self.ui_refs['file_cards'].refresh_row(view_index)
+
+    def _update_review_progress(self):
+        """更新审阅进度"""
+        if 'review_progress' in self.ui_refs:
+            text = self.t('review_progress').format(len(self.reviewed), len(self.txt_files))
+            batch = self.store.leases.batch_of(self.session_id)
+            if batch:
+                done = sum(1 for file_path in batch if file_path in self.reviewed)
+                text += '　' + self.t('batch_progress').format(done, len(batch))
+            self.ui_refs['review_progress'].set_text(text)
+
+    def _lease_batch(self):
+        """归还当前批次并领取下一批未审阅的文件"""
+        count = int(self.ui_refs['lease_size'].value or 50)
+        granted = self.store.lease_batch(self.session_id, count)
+        self._update_file_list()
+        if not granted:
+            ui.notify(self.t('lease_empty'), type='info')
+            return
+        ui.notify(self.t('lease_granted').format(len(granted)), type='positive')
+        self._on_file_click(granted[0])
+        self.ui_refs['file_cards'].scroll_to_index(max(0, self._selected_view_index()))
+
+    def _release_batch(self):
+        """归还当前批次"""
+        self.store.leases.release(self.session_id)
+        self._update_file_list()
+
+    def _on_reconnect(self):
+        """页面重新连接：恢复接收数据集的变化并刷新（断开期间可能已有变化）"""
+        self.store.attach(self)
+        self._on_store_files_changed()
+
+    def _on_store_files_changed(self):
+        """数据集的文件列表发生变化（加载、移除、清空）"""
+        self.txt_files, self.file_positions = self.store.ordering(self.sort_by)
+        if self.selected_file is not None and self.selected_file not in self.file_set:
+            # 选中的文件已被移除
+            self.selected_file = None
+            self.ui_refs['editor'].value = ''
+            self.ui_refs['gallery'].set_source('')
+        self._update_file_list()
+        self._update_editor_lock()
+
+    def _on_store_files_updated(self, paths, origin):
+        """
+        一批文件的内容或状态（未保存、已审阅、冲突、编辑锁）发生变化
+
+        Args:
+            paths: 变化的文件
+            origin: 发起变化的页面，None 表示来自磁盘或后台
+        """
+        for file_path in paths:
+            self._refresh_file_row(file_path)
+        selected_file = self._selected_file()
+        if selected_file is not None and origin is not self and selected_file in paths:
+            content = self.file_contents.get(selected_file)
+            if content is not None:
+                self.ui_refs['editor'].value = content
+        self._update_editor_lock()
+        self._update_dirty_status()
+        self._update_review_progress()
+
+    def _on_store_notice(self, key: str, args: tuple, kind: str):
+        """显示数据集发出的提示"""
+        with self.client:
+            ui.notify(self.t(key).format(*args), type=kind)
+
+    def _update_editor_lock(self):
+        """其他页面正在编辑选中的文件时，编辑框设为只读"""
+        if 'editor' not in self.ui_refs:
+            return
+        selected_file = self._selected_file()
+        holder = self.store.locks.get(selected_file) if selected_file is not None else None
+        locked = holder is not None and holder != self.session_id
+        if locked:
+            self.ui_refs['editor'].props('readonly')
+        else:
+            self.ui_refs['editor'].props(remove='readonly')
+        self.ui_refs['lock_label'].set_text(self.t('locked_by_other') if locked else '')
+
+    def _read_content(self, file_path: str) -> Optional[str]:
+        """获取文件内容，优先使用缓存，未命中时从磁盘读取并缓存"""
+        content = self.file_contents.get(file_path)
+        if content is None:
+            try:
+                content = self.store.read_caption(file_path)
+            except Exception as e:
+                ui.notify(self.t('read_failed').format(e), type='negative')
+                return None
+            self.file_contents.put(file_path, content)
+            self.tag_index.update(file_path, content)
+        return content
 
     def _on_content_change(self, e):
         """内容变化事件"""
         if self.selected_index >= 0 and self.selected_index < len(self.txt_files):
             file_path = self.txt_files[self.selected_index]
-            self.file_contents[file_path] = e.value
+            # 切换文件时编辑器赋值也会触发此事件，内容未变化时不标记为未保存
+            previous = self.file_contents.get(file_path)
+            if e.value != previous:
+                if not self.store.lock(file_path, self.session_id):
+                    # 其他页面正在编辑这个文件
+                    self.ui_refs['editor'].value = self.file_contents.get(file_path)
+                    self._update_editor_lock()
+                    return
+                self.file_contents.set_dirty(file_path, e.value)
+                self.tag_index.update(file_path, e.value)
+                self.store.emit('_on_store_files_updated', [file_path], self)
+                self._schedule_autosave()
+                self._update_tag_suggestions(file_path, previous or '', e.value or '')
+            else:
+                self._clear_tag_suggestions()
+
+    @timed('tag_complete')
+    def _update_tag_suggestions(self, file_path: str, previous: str, content: str):
+        """按正在输入的标签显示补全候选（按包含该标签的文件数排序）"""
+        edited = edited_tag(previous, content)
+        suggestions = []
+        if edited is not None:
+            typed = edited[2].lower()
+            suggestions = [(tag, count) for tag, count in self.tag_index.complete(typed, self.TAG_SUGGESTIONS + 1)
+                           if tag != typed][:self.TAG_SUGGESTIONS]
+        if not suggestions:
+            self._clear_tag_suggestions()
+            return
+        self._tag_segment = (file_path, edited[0], edited[1])
+        container = self.ui_refs['tag_suggestions']
+        container.clear()
+        with container:
+            for tag, count in suggestions:
+                ui.button(f'{tag} ({count})', on_click=functools.partial(self._accept_tag_suggestion, tag)) \
+                    .props('flat dense no-caps size=sm color=primary')
+
+    def _clear_tag_suggestions(self):
+        """隐藏补全候选"""
+        self._tag_segment = None
+        if 'tag_suggestions' in self.ui_refs:
+            self.ui_refs['tag_suggestions'].clear()
+
+    def _accept_tag_suggestion(self, tag: str):
+        """用选中的候选替换正在输入的标签"""
+        segment = self._tag_segment
+        if segment is None or segment[0] != self.selected_file:
+            self._clear_tag_suggestions()
+            return
+        _, start, end = segment
+        content = self.ui_refs['editor'].value or ''
+        # 逗号后保留一个空格，与常见的标注格式一致
+        lead = ' ' if start > 0 and content[start - 1] == ',' else ''
+        self.ui_refs['editor'].value = content[:start] + lead + tag + content[end:]
+        self._clear_tag_suggestions()
 
-    def _save_changes(self):
-        """保存修改"""
+    async def _save_changes(self) -> bool:
+        """保存修改，返回是否保存成功"""
         if self.selected_index >= 0 and self.selected_index < len(self.txt_files):
             file_path = self.txt_files[self.selected_index]
-            try:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(self.file_contents[file_path])
-                ui.notify(self.t('file_saved'), type='positive')
-            except Exception as e:
-                ui.notify(self.t('save_failed').format(e), type='negative')
+            if self._read_content(file_path) is None:
+                return False
+            if not self.store.lock(file_path, self.session_id):
+                ui.notify(self.t('locked_by_other'), type='warning')
+                return False
+            force = False
+            if file_path in self.saver.conflicts:
+                # 磁盘上的文件已被其他程序修改或删除，由用户决定覆盖还是重新加载
+                choice = await self._ask_conflict(file_path)
+                if choice == 'reload':
+                    await self._reload_from_disk(file_path)
+                    return False
+                if choice != 'overwrite':
+                    return False
+                force = True
+            _, errors = await self._save_files([file_path], force=force)
+            if errors:
+                ui.notify(self.t('save_failed').format(errors[0][1]), type='negative')
+                return False
+            ui.notify(self.t('file_saved'), type='positive')
+            return True
         else:
             ui.notify(self.t('select_first'), type='warning')
+        return False
+
+    async def _save_all(self):
+        """一次性保存所有未保存的修改（其他页面正在编辑的文件除外）"""
+        paths = self._own_dirty_paths()
+        if not paths:
+            ui.notify(self.t('nothing_to_save'), type='info')
+            return
+        saved, errors = await self._save_files(paths)
+        if errors:
+            ui.notify(self.t('save_failed_count').format(len(errors), errors[0][1]), type='negative')
+        ui.notify(self.t('saved_count').format(len(saved)), type='positive')
+
+    def _locked_by_other(self, file_path: str) -> bool:
+        """文件是否正由其他页面编辑"""
+        holder = self.store.locks.get(file_path)
+        return holder is not None and holder != self.session_id
+
+    def _own_dirty_paths(self) -> List[str]:
+        """本页面编辑的（或编辑它的页面已断开的）未保存文件"""
+        return [
+            file_path for file_path in self.file_contents.dirty_paths()
+            if self.store.locks.get(file_path, self.session_id) == self.session_id
+        ]
+
+    @timed('save')
+    async def _save_files(self, paths, force: bool = False):
+        """保存一批文件（见 DatasetStore.save_files），冲突的错误信息转换为界面语言"""
+        saved, errors = await self.store.save_files(paths, origin=self, force=force)
+        errors = [
+            (file_path, self.t(f'conflict_{self.saver.conflicts[file_path]}') if file_path in self.saver.conflicts else error)
+            for file_path, error in errors
+        ]
+        return saved, errors
+
+    def _on_autosave_change(self, e):
+        """自动保存开关"""
+        self.autosave = bool(e.value)
+        if self.autosave:
+            self._schedule_autosave()
+        elif self._autosave_handle is not None:
+            self._autosave_handle.cancel()
+            self._autosave_handle = None
+
+    def _schedule_autosave(self):
+        """停止输入一段时间后自动保存（防抖）"""
+        import asyncio
+
+        if not self.autosave:
+            return
+        if self._autosave_handle is not None:
+            self._autosave_handle.cancel()
+        self._autosave_handle = asyncio.get_event_loop().call_later(
+            self.AUTOSAVE_DELAY, lambda: background_tasks.create(self._autosave())
+        )
+
+    async def _autosave(self):
+        """保存所有未保存的修改，只在失败时提示"""
+        self._autosave_handle = None
+        # 有冲突的文件需要用户确认，不自动保存
+        paths = [file_path for file_path in self._own_dirty_paths() if file_path not in self.saver.conflicts]
+        if not paths:
+            return
+        _, errors = await self._save_files(paths)
+        if errors:
+            with self.client:
+                ui.notify(self.t('save_failed_count').format(len(errors), errors[0][1]), type='negative')
+
+    def _update_dirty_status(self):
+        """更新未保存文件数量"""
+        if 'dirty_label' in self.ui_refs:
+            count = self.file_contents.dirty_count
+            self.ui_refs['dirty_label'].set_text(self.t('dirty_count').format(count) if count else '')
+
+    def _selected_file(self) -> Optional[str]:
+        """返回当前选中的文件路径（不在当前文件列表中时为 None）"""
+        return self.selected_file if self.selected_index >= 0 else None
+
+    async def _ask_conflict(self, file_path: str) -> Optional[str]:
+        """询问如何处理保存冲突，返回 'overwrite'、'reload' 或 None（取消）"""
+        reason = self.t(f'conflict_{self.saver.conflicts[file_path]}')
+        with ui.dialog() as dialog, ui.card():
+            ui.label(self.t('conflict_title')).classes('text-lg font-semibold')
+            ui.label(self.t('conflict_message').format(os.path.basename(file_path), reason)).classes('text-sm')
+            with ui.row().classes('w-full justify-end gap-2'):
+                ui.button(self.t('conflict_overwrite'), on_click=lambda: dialog.submit('overwrite')).props('color=negative')
+                ui.button(self.t('conflict_reload'), on_click=lambda: dialog.submit('reload')).props('color=primary')
+                ui.button(self.t('cancel'), on_click=lambda: dialog.submit(None)).props('flat')
+        choice = await dialog
+        dialog.delete()
+        return choice
+
+    async def _reload_from_disk(self, file_path: str):
+        """放弃未保存的修改，重新读取磁盘上的文件（已被删除时从列表移除）"""
+        import asyncio
+
+        loop = asyncio.get_event_loop()
+        self.saver.resolve_conflict(file_path)
+        self.file_contents.discard(file_path)
+        self.store.locks.pop(file_path, None)
+        entries = await loop.run_in_executor(None, self.store.read_changed_entries, [file_path])
+        if not entries or 'content' not in entries[0]:
+            self.store.remove_files([file_path])
+            if self.index:
+                self.index.remove([file_path])
+            self.store.emit('_on_store_files_changed')
+            return
+        content = entries[0]['content']
+        self.store.apply_entries(entries)
+        self.file_contents.put(file_path, content)
+        self.tag_index.update(file_path, content)
+        self.store.emit('_on_store_files_updated', [file_path], None)
+
+    def _open_bulk_dialog(self):
+        """打开批量编辑对话框"""
+        import asyncio
+
+        state = {'editor': None, 'plan': None, 'overrides': None}
+
+        def invalidate():
+            state['plan'] = None
+            apply_btn.disable()
+
+        async def preview():
+            try:
+                editor = BulkEditor([build_operation(
+                    kind.value, find_input.value or '', replace_input.value or '', position.value
+                )])
+            except ValueError as e:
+                ui.notify(self.t('bulk_invalid').format(e), type='negative')
+                return
+            paths = list(self._visible_files() if scope.value == 'view' else self.txt_files)
+            # 批量编辑直接改写磁盘上的 TXT 文件，清单中的行和压缩包中的标注不在其中
+            if self.store.sources:
+                files = [file_path for file_path in paths if self.store.source_of(file_path) is None]
+                if len(files) < len(paths):
+                    ui.notify(self.t('bulk_sources_skipped').format(len(paths) - len(files)), type='warning')
+                paths = files
+            # 其他页面正在编辑的文件不处理，避免把别人未保存的修改写入磁盘
+            locked = [file_path for file_path in paths if self._locked_by_other(file_path)]
+            if locked:
+                locked_set = set(locked)
+                paths = [file_path for file_path in paths if file_path not in locked_set]
+                ui.notify(self.t('bulk_locked').format(len(locked)), type='warning')
+            # 本页面未保存的修改作为处理的基础内容
+            overrides = {file_path: self.file_contents.get(file_path) for file_path in self._own_dirty_paths()}
+            preview_btn.props('loading')
+            try:
+                plan = await asyncio.get_event_loop().run_in_executor(None, editor.plan, paths, overrides)
+            finally:
+                preview_btn.props(remove='loading')
+            state.update(editor=editor, plan=plan, overrides=overrides)
+
+            added, removed = plan.tag_delta()
+            summary.set_text(self.t('bulk_summary').format(len(plan.changes), plan.scanned, len(plan.errors)))
+            tag_delta.set_text(self.t('bulk_tag_delta').format(
+                ', '.join(f'{tag} ({count})' for tag, count in added.most_common(10)) or '-',
+                ', '.join(f'{tag} ({count})' for tag, count in removed.most_common(10)) or '-'
+            ))
+            preview_area.clear()
+            with preview_area:
+                for file_path, old, new in plan.changes[:50]:
+                    ui.label(os.path.basename(file_path)).classes('text-xs font-semibold')
+                    ui.label('- ' + old).classes('text-xs text-red-600 whitespace-pre-wrap')
+                    ui.label('+ ' + new).classes('text-xs text-green-700 whitespace-pre-wrap')
+            apply_btn.set_enabled(bool(plan.changes))
+
+        async def apply():
+            plan = state['plan']
+            if plan is None:
+                return
+            loop = asyncio.get_event_loop()
+            # 预览之后才被其他页面开始编辑的文件同样跳过
+            locked = [change for change in plan.changes if self._locked_by_other(change[0])]
+            if locked:
+                plan.changes = [change for change in plan.changes if not self._locked_by_other(change[0])]
+                ui.notify(self.t('bulk_locked').format(len(locked)), type='warning')
+            apply_btn.props('loading')
+            try:
+                # 写入前记录原内容，写入后记录修改，误操作后可以在版本历史中整体回滚
+                await loop.run_in_executor(None, self.store.record_baseline, [p for p, _, _ in plan.changes])
+                written, errors = await loop.run_in_executor(None, state['editor'].apply, plan, state['overrides'])
+                await loop.run_in_executor(None, self.store.record_history, written, 'bulk_edit')
+                self._apply_written_contents(written)
+                entries = await loop.run_in_executor(None, self.store.refresh_entries, [p for p, _ in written])
+                self.store.apply_entries(entries)
+            finally:
+                apply_btn.props(remove='loading')
+            invalidate()
+            preview_area.clear()
+            self.store.emit('_on_store_files_changed')
+            ui.notify(self.t('bulk_done').format(len(written), len(errors)),
+                      type='positive' if not errors else 'warning')
+
+        with ui.dialog() as dialog, ui.card().classes('w-[720px] max-w-full'):
+            ui.label(self.t('bulk_edit')).classes('text-lg font-semibold')
+            scope = ui.select(
+                {'all': self.t('bulk_scope_all'), 'view': self.t('bulk_scope_view')},
+                value='view' if self.view_files is not None else 'all',
+                label=self.t('bulk_scope'), on_change=invalidate
+            ).classes('w-full')
+            kind = ui.select(
+                {op: self.t(f'bulk_op_{op}') for op in OPERATIONS},
+                value='replace', label=self.t('bulk_operation'), on_change=invalidate
+            ).classes('w-full')
+            find_input = ui.input(self.t('bulk_find'), on_change=invalidate).classes('w-full')
+            replace_input = ui.input(self.t('bulk_replace'), on_change=invalidate).classes('w-full')
+            position = ui.select(
+                {'start': self.t('bulk_position_start'), 'end': self.t('bulk_position_end')},
+                value='start', label=self.t('bulk_position'), on_change=invalidate
+            ).classes('w-full')
+            summary = ui.label('').classes('text-sm font-medium')
+            tag_delta = ui.label('').classes('text-xs text-gray-600')
+            preview_area = ui.scroll_area().classes('w-full h-64 border rounded')
+            with ui.row().classes('w-full justify-end gap-2'):
+                preview_btn = ui.button(self.t('bulk_preview'), on_click=preview).props('color=primary')
+                apply_btn = ui.button(self.t('bulk_apply'), on_click=apply).props('color=negative')
+                ui.button(self.t('close'), on_click=dialog.close).props('flat')
+            apply_btn.disable()
+        dialog.open()
+
+    def _open_history_dialog(self):
+        """打开版本历史对话框：创建快照、比较两个版本、把选中文件或所有文件恢复到某个版本"""
+        import asyncio
+
+        history = self.store.history
+        if history is None:
+            ui.notify(self.t('history_unavailable'), type='warning')
+            return
+
+        def revision_options() -> dict:
+            options = {}
+            for revision in history.revisions():
+                text = '#{} {} {}'.format(
+                    revision['revision'],
+                    time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(revision['time'])),
+                    self.t(f"history_kind_{revision['kind']}") if revision['kind'] in HISTORY_KINDS else revision['kind']
+                )
+                if revision['label']:
+                    text += f" · {revision['label']}"
+                options[revision['revision']] = f"{text} ({self.t('history_files').format(revision['files'])})"
+            return options
+
+        def refresh_options():
+            options = revision_options()
+            base.options = options
+            if base.value not in options:
+                base.value = next(iter(options), None)
+            base.update()
+            target.options = {0: self.t('history_latest'), **options}
+            if target.value not in target.options:
+                target.value = 0
+            target.update()
+            empty.set_visibility(not options)
+            for button in (compare_btn, restore_file_btn, restore_all_btn):
+                button.set_enabled(bool(options))
+
+        async def snapshot():
+            snapshot_btn.props('loading')
+            try:
+                revision = await self.store.create_snapshot(label_input.value or '')
+            finally:
+                snapshot_btn.props(remove='loading')
+            if revision is None:
+                ui.notify(self.t('history_unavailable'), type='negative')
+                return
+            files = next((item['files'] for item in history.revisions(limit=1) if item['revision'] == revision), 0)
+            label_input.value = ''
+            refresh_options()
+            base.value = revision
+            ui.notify(self.t('history_snapshot_done').format(revision, files), type='positive')
+
+        async def compare():
+            if base.value is None:
+                return
+            compare_btn.props('loading')
+            try:
+                changes = await self.store.history_diff(base.value, target.value or None)
+            finally:
+                compare_btn.props(remove='loading')
+            summary.set_text(self.t('history_diff_summary').format(len(changes)))
+            diff_area.clear()
+            with diff_area:
+                for file_path, old, new in changes[:50]:
+                    ui.label(os.path.basename(file_path)).classes('text-xs font-semibold')
+                    ui.label('- ' + (self.t('history_missing') if old is None else old)).classes('text-xs text-red-600 whitespace-pre-wrap')
+                    ui.label('+ ' + (self.t('history_missing') if new is None else new)).classes('text-xs text-green-700 whitespace-pre-wrap')
+
+        async def restore(paths):
+            if base.value is None:
+                return
+            for button in (restore_file_btn, restore_all_btn):
+                button.props('loading')
+            try:
+                saved, errors, skipped = await self.store.rollback(base.value, paths, owner=self.session_id)
+            finally:
+                for button in (restore_file_btn, restore_all_btn):
+                    button.props(remove='loading')
+            refresh_options()
+            ui.notify(self.t('history_restored').format(len(saved), len(errors), len(skipped)),
+                      type='positive' if not errors and not skipped else 'warning')
+
+        async def restore_file():
+            selected_file = self._selected_file()
+            if selected_file is None:
+                ui.notify(self.t('select_first'), type='warning')
+                return
+            await restore([selected_file])
+
+        with ui.dialog() as dialog, ui.card().classes('w-[720px] max-w-full'):
+            ui.label(self.t('history')).classes('text-lg font-semibold')
+            with ui.row().classes('w-full items-center gap-2'):
+                label_input = ui.input(self.t('history_label')).classes('flex-grow')
+                snapshot_btn = ui.button(self.t('history_snapshot'), on_click=snapshot).props('color=primary')
+            base = ui.select({}, label=self.t('history_from')).classes('w-full')
+            target = ui.select({}, label=self.t('history_to')).classes('w-full')
+            empty = ui.label(self.t('history_empty')).classes('text-sm text-gray-500')
+            summary = ui.label('').classes('text-sm font-medium')
+            diff_area = ui.scroll_area().classes('w-full h-64 border rounded')
+            with ui.row().classes('w-full justify-end gap-2'):
+                compare_btn = ui.button(self.t('history_compare'), on_click=compare).props('color=primary')
+                restore_file_btn = ui.button(self.t('history_restore_file'), on_click=restore_file).props('outline')
+                restore_all_btn = ui.button(self.t('history_restore_all'), on_click=lambda: restore(None)).props('color=negative')
+                ui.button(self.t('close'), on_click=dialog.close).props('flat')
+        refresh_options()
+        dialog.on('hide', dialog.delete)
+        dialog.open()
+
+    def _open_export_dialog(self):
+        """打开导出清单对话框（按当前排序导出，包括未保存的修改）"""
+        import asyncio
+
+        def default_path():
+            root = next(iter(sorted(self.dataset_roots)), None) or os.getcwd()
+            return os.path.join(root, f'manifest.{fmt.value}')
+
+        def on_format_change():
+            # 路径仍是默认文件名时跟随格式修改扩展名
+            base, ext = os.path.splitext(path_input.value or '')
+            if ext.lower() in ('.jsonl', '.parquet'):
+                path_input.set_value(f'{base}.{fmt.value}')
+
+        async def browse():
+            path = await asyncio.get_event_loop().run_in_executor(None, self._open_save_manifest_dialog, fmt.value)
+            if path:
+                path_input.set_value(path)
+
+        async def export():
+            path = (path_input.value or '').strip()
+            if not path:
+                ui.notify(self.t('manifest_path_required'), type='warning')
+                return
+            paths = list(self._visible_files() if scope.value == 'view' else self.txt_files)
+            export_btn.props('loading')
+            try:
+                rows, errors = await self.store.export_manifest(
+                    os.path.abspath(path), paths, fmt.value,
+                    on_progress=lambda done, total: progress.set_text(
+                        self.t('manifest_export_progress').format(done, total))
+                )
+            except (OSError, ValueError, RuntimeError) as e:
+                ui.notify(self.t('manifest_failed').format(e), type='negative')
+                return
+            finally:
+                export_btn.props(remove='loading')
+            ui.notify(self.t('manifest_exported').format(rows, len(errors)),
+                      type='positive' if not errors else 'warning')
+            dialog.close()
+
+        formats = [name for name in MANIFEST_FORMATS if name != 'parquet' or PARQUET_AVAILABLE]
+        with ui.dialog() as dialog, ui.card().classes('w-[560px] max-w-full'):
+            ui.label(self.t('export_manifest')).classes('text-lg font-semibold')
+            scope = ui.select(
+                {'all': self.t('bulk_scope_all'), 'view': self.t('bulk_scope_view')},
+                value='view' if self.view_files is not None else 'all',
+                label=self.t('bulk_scope')
+            ).classes('w-full')
+            fmt = ui.select(
+                {name: name.upper() if name == 'jsonl' else name.capitalize() for name in formats},
+                value=formats[0], label=self.t('manifest_format'), on_change=on_format_change
+            ).classes('w-full')
+            if not PARQUET_AVAILABLE:
+                ui.label(self.t('manifest_no_pyarrow')).classes('text-xs text-gray-600')
+            with ui.row().classes('w-full items-center gap-2 no-wrap'):
+                path_input = ui.input(self.t('manifest_path'), value=default_path()).classes('flex-grow')
+                ui.button(self.t('manifest_browse'), on_click=browse).props('outline dense')
+            progress = ui.label('').classes('text-xs text-gray-600')
+            with ui.row().classes('w-full justify-end gap-2'):
+                export_btn = ui.button(self.t('manifest_export'), on_click=export).props('color=primary')
+                ui.button(self.t('close'), on_click=dialog.close).props('flat')
+        dialog.on('hide', dialog.delete)
+        dialog.open()
+
+    def _open_stats_dialog(self):
+        """打开标签统计面板（统计随编辑和保存增量更新，面板每秒检查一次是否需要刷新）"""
+        import asyncio
+
+        stats = self.tag_stats
+        state = {'version': None}
+
+        def histogram_options(column):
+            bins = stats.histogram(column)
+            return {
+                'grid': {'left': 40, 'right': 10, 'top': 10, 'bottom': 30},
+                'tooltip': {},
+                'xAxis': {'type': 'category', 'data': [
+                    str(low) if low == high else f'{low}-{high}' for low, high, _ in bins
+                ]},
+                'yAxis': {'type': 'value'},
+                'series': [{'type': 'bar', 'data': [count for _, _, count in bins]}],
+            }
+
+        def refresh():
+            if not dialog.value or state['version'] == stats.version:
+                return
+            state['version'] = stats.version
+            count = len(stats)
+            coverage.set_text(self.t('stats_coverage').format(count, len(self.txt_files)))
+            summary.set_text(self.t('stats_summary').format(
+                len(stats.tag_counts),
+                sum(stats.lengths) / count if count else 0,
+                sum(stats.tag_totals) / count if count else 0
+            ))
+            top_tags.set_text(', '.join(f'{tag} ({n})' for tag, n in stats.top_tags(30)) or '-')
+            rare_tags.set_text(', '.join(f'{tag} ({n})' for tag, n in stats.rare_tags(30)) or '-')
+            length_chart.options.update(histogram_options(stats.lengths))
+            length_chart.update()
+            tag_count_chart.options.update(histogram_options(stats.tag_totals))
+            tag_count_chart.update()
+            untagged_label.set_text(self.t('stats_untagged').format(len(stats.untagged)))
+            untagged_area.clear()
+            with untagged_area:
+                for file_path in sorted(stats.untagged, key=lambda p: self.file_positions.get(p, 0))[:50]:
+                    if file_path in self.file_positions:
+                        ui.label(os.path.basename(file_path)).classes('text-xs cursor-pointer text-blue-600').on(
+                            'click', lambda file_path=file_path: self._on_file_click(file_path)
+                        )
+
+        async def read_all():
+            # 没有索引时文本按需读取，这里在后台读取尚未统计的文件
+            paths = [file_path for file_path in self.txt_files if file_path not in self.tag_index]
+            loop = asyncio.get_event_loop()
+            failed = []
+            read_btn.props('loading')
+            try:
+                for start in range(0, len(paths), 512):
+                    chunk = paths[start:start + 512]
+                    contents, errors = await loop.run_in_executor(None, self._read_contents, chunk)
+                    failed.extend(errors)
+                    for file_path, content in contents:
+                        if file_path in self.file_set and file_path not in self.tag_index:
+                            self.file_contents.put(file_path, content)
+                            self.tag_index.update(file_path, content)
+            finally:
+                read_btn.props(remove='loading')
+            if failed:
+                file_path, error = failed[0]
+                ui.notify(self.t('stats_read_failed').format(len(failed), f'{os.path.basename(file_path)}: {error}'),
+                          type='warning')
+            refresh()
+
+        with ui.dialog() as dialog, ui.card().classes('w-[900px] max-w-full'):
+            with ui.row().classes('w-full items-center justify-between'):
+                ui.label(self.t('tag_stats')).classes('text-lg font-semibold')
+                with ui.row().classes('items-center gap-2'):
+                    coverage = ui.label('').classes('text-xs text-gray-600')
+                    read_btn = ui.button(self.t('stats_read_all'), on_click=read_all).props('outline dense')
+            summary = ui.label('').classes('text-sm font-medium')
+            ui.label(self.t('stats_top_tags')).classes('text-sm font-semibold')
+            top_tags = ui.label('').classes('text-xs')
+            ui.label(self.t('stats_rare_tags')).classes('text-sm font-semibold')
+            rare_tags = ui.label('').classes('text-xs')
+            with ui.row().classes('w-full no-wrap gap-4'):
+                with ui.column().classes('w-1/2'):
+                    ui.label(self.t('stats_length_hist')).classes('text-sm font-semibold')
+                    length_chart = ui.echart({}).classes('w-full h-48')
+                with ui.column().classes('w-1/2'):
+                    ui.label(self.t('stats_tag_count_hist')).classes('text-sm font-semibold')
+                    tag_count_chart = ui.echart({}).classes('w-full h-48')
+            untagged_label = ui.label('').classes('text-sm font-semibold')
+            untagged_area = ui.scroll_area().classes('w-full h-32 border rounded')
+            with ui.row().classes('w-full justify-end'):
+                ui.button(self.t('close'), on_click=dialog.close).props('flat')
+            ui.timer(1.0, refresh)
+        dialog.on('hide', dialog.delete)
+        dialog.open()
+        refresh()
+
+    def _open_duplicates_dialog(self):
+        """打开重复检测面板（检测在后台进行，面板按进度刷新；勾选的组可以一次从列表中移除重复项）"""
+        detector = self.store.duplicates
+        state = {'version': None, 'selected': set()}
+
+        def start():
+            if not self.store.find_duplicates(float(similarity.value or DEFAULT_SIMILARITY),
+                                              int(distance.value if distance.value is not None else DEFAULT_IMAGE_DISTANCE)):
+                ui.notify(self.t('dup_running'), type='info')
+            refresh()
+
+        def toggle(index, value):
+            if value:
+                state['selected'].add(index)
+            else:
+                state['selected'].discard(index)
+            remove_btn.set_enabled(bool(state['selected']))
+
+        def select_all():
+            state['selected'] = set(range(len(detector.clusters)))
+            state['version'] = None
+            refresh()
+
+        def remove():
+            removed, kept = self.store.remove_duplicates(
+                [detector.clusters[index] for index in sorted(state['selected'])]
+            )
+            state['selected'].clear()
+            state['version'] = None
+            refresh()
+            ui.notify(self.t('dup_removed').format(len(removed), len(kept)), type='positive' if not kept else 'warning')
+
+        def refresh():
+            if not dialog.value or state['version'] == (detector.version, len(self.file_set)):
+                return
+            state['version'] = (detector.version, len(self.file_set))
+            done, total = detector.progress
+            progress.set_visibility(detector.running)
+            progress.value = done / total if total else 0
+            progress_label.set_text(self.t('dup_progress').format(done, total) if detector.running else '')
+            if detector.running:
+                detect_btn.props('loading')
+            else:
+                detect_btn.props(remove='loading')
+            # 检测后已被移除的文件不再显示，只剩一个文件的组不再列出
+            clusters = [
+                (index, [file_path for file_path in cluster['paths'] if file_path in self.file_set], cluster)
+                for index, cluster in enumerate(detector.clusters)
+            ]
+            clusters = [(index, paths, cluster) for index, paths, cluster in clusters if len(paths) > 1]
+            state['selected'] &= {index for index, _, _ in clusters}
+            if clusters:
+                summary.set_text(self.t('dup_summary').format(
+                    len(clusters), len({file_path for _, paths, _ in clusters for file_path in paths})
+                ))
+            else:
+                summary.set_text('' if detector.running or not detector.records else self.t('dup_empty'))
+            remove_btn.set_enabled(bool(state['selected']))
+            cluster_area.clear()
+            with cluster_area:
+                for index, paths, cluster in clusters[:200]:
+                    with ui.row().classes('w-full items-center gap-2'):
+                        ui.checkbox(value=index in state['selected'],
+                                    on_change=lambda e, index=index: toggle(index, e.value)).props('dense')
+                        kind = cluster['kind']
+                        text = f"{self.t(f'dup_kind_{kind}')} · {len(paths)}"
+                        if cluster['score'] is not None:
+                            text += ' · ' + self.t(f'dup_score_{kind}').format(cluster['score'])
+                        ui.label(text).classes('text-sm font-semibold')
+                    for position, file_path in enumerate(paths[:20]):
+                        name = os.path.basename(file_path)
+                        ui.label(f"{name} ({self.t('dup_keep')})" if position == 0 else name).classes(
+                            'text-xs cursor-pointer text-blue-600 ml-8'
+                        ).on('click', lambda file_path=file_path: self._on_file_click(file_path))
+
+        with ui.dialog() as dialog, ui.card().classes('w-[900px] max-w-full'):
+            with ui.row().classes('w-full items-center justify-between'):
+                ui.label(self.t('dup_panel')).classes('text-lg font-semibold')
+                with ui.row().classes('items-center gap-2'):
+                    similarity = ui.number(self.t('dup_similarity'), value=DEFAULT_SIMILARITY,
+                                           min=0.3, max=1.0, step=0.05).props('dense').classes('w-40')
+                    distance = ui.number(self.t('dup_distance'), value=DEFAULT_IMAGE_DISTANCE,
+                                         min=0, max=16, step=1, format='%d').props('dense').classes('w-40')
+                    detect_btn = ui.button(self.t('dup_detect'), on_click=start).props('color=primary')
+            # 感知哈希与缩略图同样依赖 Pillow
+            if not self.thumbnails.available:
+                ui.label(self.t('dup_no_pillow')).classes('text-xs text-orange-600')
+            progress = ui.linear_progress(value=0, show_value=False).classes('w-full')
+            progress_label = ui.label('').classes('text-xs text-gray-600')
+            summary = ui.label('').classes('text-sm font-medium')
+            cluster_area = ui.scroll_area().classes('w-full h-96 border rounded')
+            with ui.row().classes('w-full justify-end gap-2'):
+                ui.button(self.t('dup_select_all'), on_click=select_all).props('outline')
+                remove_btn = ui.button(self.t('dup_remove'), on_click=remove).props('color=negative')
+                ui.button(self.t('close'), on_click=dialog.close).props('flat')
+            remove_btn.disable()
+            ui.timer(0.5, refresh)
+        dialog.on('hide', dialog.delete)
+        dialog.open()
+        refresh()
+
+    def _open_perf_dialog(self):
+        """打开性能指标面板（各项操作的耗时分位数，每秒检查一次是否有新的记录）"""
+        state = {'version': None}
+        columns = [
+            {'name': 'operation', 'label': self.t('perf_operation'), 'field': 'operation', 'align': 'left'},
+            {'name': 'count', 'label': self.t('perf_count'), 'field': 'count'},
+        ] + [
+            {'name': field, 'label': label, 'field': field}
+            for field, label in (('mean_ms', 'mean (ms)'), ('p50_ms', 'p50 (ms)'), ('p95_ms', 'p95 (ms)'),
+                                 ('p99_ms', 'p99 (ms)'), ('max_ms', 'max (ms)'), ('last_ms', 'last (ms)'))
+        ]
+
+        def refresh():
+            if not dialog.value:
+                return
+            status = self.store.status()
+            summary.set_text(self.t('perf_summary').format(
+                status['files'], status['cached'], status['cache_bytes'] / (1 << 20),
+                status['dirty'], status['sessions']
+            ))
+            if state['version'] == metrics.version:
+                return
+            state['version'] = metrics.version
+            snapshot = metrics.snapshot()
+            table.rows = [dict(operation=name, **values) for name, values in snapshot.items()]
+            table.update()
+            empty.set_visibility(not snapshot)
+
+        def reset():
+            metrics.reset()
+            refresh()
+
+        with ui.dialog() as dialog, ui.card().classes('w-[900px] max-w-full'):
+            with ui.row().classes('w-full items-center justify-between'):
+                ui.label(self.t('perf_panel')).classes('text-lg font-semibold')
+                ui.button(self.t('perf_reset'), on_click=reset).props('outline dense')
+            summary = ui.label('').classes('text-xs text-gray-600')
+            table = ui.table(columns=columns, rows=[], row_key='operation').props('dense flat').classes('w-full')
+            empty = ui.label(self.t('perf_empty')).classes('text-sm text-gray-500')
+            with ui.row().classes('w-full justify-end'):
+                ui.button(self.t('close'), on_click=dialog.close).props('flat')
+            ui.timer(1.0, refresh)
+        dialog.on('hide', dialog.delete)
+        dialog.open()
+        refresh()
+
+    def _read_contents(self, paths) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+        """读取一批文件的文本（可在后台线程调用），返回 (成功的 [(路径, 内容)], 失败的 [(路径, 错误信息)])"""
+        contents, errors = [], []
+        for file_path in paths:
+            try:
+                contents.append((file_path, self.store.read_caption(file_path)))
+            except Exception as e:
+                errors.append((file_path, str(e)))
+        return contents, errors
+
+    def _apply_written_contents(self, written):
+        """外部写入（批量编辑等）后同步缓存、搜索索引和所有页面的编辑器；其他页面的编辑锁和未保存修改保持不变"""
+        for file_path, content in written:
+            if self._locked_by_other(file_path):
+                continue
+            self.saver.discard(file_path)
+            self.file_contents.discard(file_path)
+            self.file_contents.put(file_path, content)
+            self.tag_index.update(file_path, content)
+            self.store.locks.pop(file_path, None)
+        self.store.emit('_on_store_files_updated', [file_path for file_path, _ in written], None)
 
     def _delete_file(self):
         """删除文件"""
         if self.selected_index >= 0 and self.selected_index < len(self.txt_files):
             file_path = self.txt_files[self.selected_index]
-            # 从列表中移除
-            self.txt_files.pop(self.selected_index)
-            self.file_contents.pop(file_path, None)
-            self.file_info.pop(file_path, None)
-            # 排序文件列表
-            self._sort_files()
-            # 更新文件列表
-            self._update_file_list()
-            # 清空预览
-            self.ui_refs['editor'].value = ''
-            self.selected_index = -1
+            # 从列表中移除（所有页面同步更新，选中该文件的页面会清空预览）
+            self.store.remove_files([file_path])
+            self.store.emit('_on_store_files_changed')
             ui.notify(self.t('file_removed'), type='positive')
         else:
             ui.notify(self.t('select_first'), type='warning')
 
     def _clear_preview(self):
         """清空预览"""
-        self.ui_refs['editor'].value = ''
+        # 先取消选中，避免清空编辑框被当作对文件的修改
         self.selected_index = -1
+        self.ui_refs['editor'].value = ''
+        self._update_selection()
+        self._update_editor_lock()
+
+    def _sort_options(self) -> dict:
+        """排序方式 -> 当前语言的名称"""
+        return {sort_by: self.t(f'sort_{sort_by}') for sort_by in SORT_OPTIONS}
 
+    @timed('sort')
     def _on_sort_change(self, e):
         """排序方式变化事件"""
-        # 根据当前语言判断排序方式
-        sort_map = {
-            'zh': {
-                '按创建时间（最新在前）': 'time_desc',
-                '按创建时间（最旧在前）': 'time_asc',
-                '按文件名（A-Z）': 'name_asc',
-                '按文件名（Z-A）': 'name_desc'
-            },
-            'en': {
-                'By Time (Newest First)': 'time_desc',
-                'By Time (Oldest First)': 'time_asc',
-                'By Name (A-Z)': 'name_asc',
-                'By Name (Z-A)': 'name_desc'
-            }
-        }
-        self.sort_by = sort_map[self.current_lang].get(e.value, 'time_desc')
-        # 排序文件列表
-        self._sort_files()
+        if e.value not in SORT_OPTIONS or e.value == self.sort_by:
+            return
+        self.sort_by = e.value
+        # 切换到该排序方式的文件列表（已有页面使用时直接共用），选中的文件保持不变
+        self.txt_files, self.file_positions = self.store.ordering(self.sort_by)
         # 更新文件列表
         self._update_file_list()
-        ui.notify(self.t('sorted_by').format(e.value), type='info')
+        ui.notify(self.t('sorted_by').format(self.t(f'sort_{self.sort_by}')), type='info')
 
+    @timed('image_preview')
     def _load_image_preview(self, file_path):
-        """加载同名图片到图片预览区"""
-        # 获取 TXT 文件的基础路径（不含扩展名）
-        base_path = os.path.splitext(file_path)[0]
-        
-        # 检查是否存在同名的 jpg 或 png 文件
-        image_extensions = ['.jpg', '.png']
-        found_image = None
-        
-        for ext in image_extensions:
-            image_path = base_path + ext
-            if os.path.exists(image_path):
-                found_image = image_path
-                break
-        
-        if found_image:
-            # 加载图片
-            try:
-                # 更新图片显示
-                self.ui_refs['gallery'].set_source(found_image)
-                self.ui_refs['gallery'].style('object-fit: contain;')
-            except Exception as e:
-                # 图片加载失败
-                self.ui_refs['gallery'].set_source('')
-                print(f"图片加载失败: {e}")
+        """加载同名图片到图片预览区（优先使用缩略图），并预取相邻文件的预览图"""
+        import asyncio
+
+        future = self._request_preview(file_path)
+        if future.done():
+            self._show_preview(file_path, future)
         else:
-            # 无图片
+            # 等待生成期间先清空，避免显示上一张图片
             self.ui_refs['gallery'].set_source('')
+            loop = asyncio.get_event_loop()
+            requested = time.perf_counter()
 
-    def _clear_file_list(self):
-        """清空文件列表"""
-        # 清空所有文件相关数据
-        self.txt_files.clear()
-        self.file_contents.clear()
-        self.file_info.clear()
-        self.selected_index = -1
-        # 清空预览
-        self.ui_refs['editor'].value = ''
-        # 清空图片预览
-        if 'gallery' in self.ui_refs:
+            def on_ready(f):
+                # 从点击到缩略图就绪的等待时间
+                metrics.record('image_preview_wait', time.perf_counter() - requested)
+                loop.call_soon_threadsafe(self._show_preview, file_path, f)
+
+            future.add_done_callback(on_ready)
+        self._prefetch_previews()
+
+    def _request_preview(self, file_path: str) -> Future:
+        """获取文件预览图来源的 Future，未请求过时提交到缩略图线程池"""
+        future = self.preview_sources.get(file_path)
+        if future is not None:
+            self.preview_sources.move_to_end(file_path)
+            return future
+        # 索引中已记录配对图片（包括"没有图片"）时不再探测磁盘
+        known_image = self.file_table.image_path(file_path) if file_path in self.file_set else None
+        future = self.thumbnails.executor.submit(self._resolve_preview_source, file_path, known_image)
+        self.preview_sources[file_path] = future
+        if len(self.preview_sources) > self.PREVIEW_MEMO_SIZE:
+            self.preview_sources.popitem(last=False)
+        return future
+
+    @timed('image_thumbnail')
+    def _resolve_preview_source(self, file_path: str, image_path: Optional[str]) -> str:
+        """在后台线程中查找配对图片并生成缩略图，返回图片来源（无图片时为空字符串）"""
+        if image_path is None:
+            image_path = find_paired_image(file_path)
+        if image_path:
+            image_path = self.store.resolve_image(image_path)
+        if not image_path:
+            return ''
+        # 没有 Pillow 或生成失败时回退为原图
+        return self.thumbnails.url_for(image_path) or image_path
+
+    def _show_preview(self, file_path: str, future: Future):
+        """显示预览图（若期间已切换到其他文件则忽略）"""
+        if self.selected_index < 0 or self.selected_index >= len(self.txt_files) \
+                or self.txt_files[self.selected_index] != file_path:
+            return
+        try:
+            # 更新图片显示
+            self.ui_refs['gallery'].set_source(future.result())
+            self.ui_refs['gallery'].style('object-fit: contain;')
+        except Exception as e:
+            # 图片加载失败
             self.ui_refs['gallery'].set_source('')
-        # 更新文件列表
-        self._update_file_list()
+            logger.warning('图片加载失败: %s', e)
+
+    def _prefetch_previews(self):
+        """预取当前显示顺序中相邻文件的预览图"""
+        files = self._visible_files()
+        center = self._selected_view_index()
+        if center < 0:
+            return
+        for offset in range(1, self.PREFETCH_COUNT + 1):
+            for i in (center + offset, center - offset):
+                if 0 <= i < len(files):
+                    self._request_preview(files[i])
+
+    def _clear_file_list(self):
+        """清空文件列表（共享同一数据集的所有页面同时清空）"""
+        # 取消正在进行的加载、停止监视并清空所有文件相关数据
+        self.store.clear()
+        self.preview_sources.clear()
+        # 清空预览并更新文件列表
+        self.store.emit('_on_store_files_changed')
         ui.notify(self.t('file_list_cleared'), type='positive')
 
 
@@ -524,7 +2306,7 @@ class TxtManager:
 def main():
     """主页面"""
     # 创建 TXT 管理工具
-    txt_manager = TxtManager()
+    txt_manager = TxtManager(store=dataset_store)
     txt_manager.create()
 
 